@@ -179,6 +179,15 @@ CONNECTIONS_SIGN_IMAGE_URLS = bool(
 )
 # Presigned URL lifetime (seconds). Kept well under Tigris's 7-day SigV4 max.
 CONNECTIONS_SIGNED_URL_TTL = int(os.getenv("CONNECTIONS_SIGNED_URL_TTL", "86400"))
+# Rebuild the popular connections graph and watch-order caches in a background
+# thread after each edit, instead of leaving that to the next visitor.
+CONNECTIONS_PREWARM_ON_INVALIDATE = os.getenv("CONNECTIONS_PREWARM_ON_INVALIDATE", "0") == "1"
+# Warm each web worker's cache in a background thread as gunicorn starts it
+# (see gunicorn.conf.py). The cache is per process, so nothing else can.
+CONNECTIONS_PREWARM_ON_START = os.getenv("CONNECTIONS_PREWARM_ON_START", "1") == "1"
+# Settle a missing graph layout on one background worker. Requests never run the
+# simulation themselves; with this off, only the warmer computes layouts.
+CONNECTIONS_LAYOUT_IN_BACKGROUND = os.getenv("CONNECTIONS_LAYOUT_IN_BACKGROUND", "1") == "1"
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -205,7 +214,9 @@ TMDB_API_KEY = os.getenv("TMDB_API_KEY", "")
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "OPTIONS": {"MAX_ENTRIES": 2000},
+        # Room for the per-character connections entries (detail payloads and
+        # shortest-path trees) next to the verse and graph caches.
+        "OPTIONS": {"MAX_ENTRIES": 5000},
     }
 }
 
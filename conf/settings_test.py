@@ -14,6 +14,10 @@ DEBUG = False
 # network); keep the plain base-URL form instead.
 CONNECTIONS_SIGN_IMAGE_URLS = False
 
+# A layout thread outliving its test would write into the next test's cache.
+# Tests that want positions compute them through the warmer.
+CONNECTIONS_LAYOUT_IN_BACKGROUND = False
+
 SECURE_SSL_REDIRECT = False
 SESSION_COOKIE_SECURE = False
 CSRF_COOKIE_SECURE = False
@@ -28,11 +28,22 @@ from django.conf import settings
 from unfold.admin import ModelAdmin, TabularInline
 
 from . import tmdb
+from .admin_index import RelationshipAdminIndex, character_label
 from .forms import WatchEntryAdminForm
+from .graph_service import MCUGraphService
+from .invalidation import deferred_invalidation
 from .models import (
 	AlterEgo, Character, Movie, Relationship, Team, TeamMembership, Earth, BulkAddConfig,
 	WatchCollection, WatchEntry, WatchOrderConfig, WatchProgress, WatchTrack, renormalize_track,
 )
+from .relationship_writes import (
+	CREATED,
+	EXISTS,
+	MISSING_CHARACTER,
+	SELF_RELATIONSHIP,
+	RelationshipRow,
+	write_relationships,
+)
 from .watch_order_service import WatchOrderService
 
 
@@ -89,6 +100,27 @@ class OrderedChoiceAdminMixin:
 		return form_field
 
 
+class DeferredInvalidationAdminMixin:
+	"""Invalidate each cache once per admin submission.
+
+	A change form saves the object, its inlines and its m2m links, and a
+	changelist POST saves every list_editable row or runs an action over the
+	selection; each save would otherwise bump the caches on its own.
+	"""
+
+	def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+		with deferred_invalidation():
+			return super().changeform_view(request, object_id, form_url, extra_context)
+
+	def changelist_view(self, request, extra_context=None):
+		with deferred_invalidation():
+			return super().changelist_view(request, extra_context)
+
+	def delete_view(self, request, object_id, extra_context=None):
+		with deferred_invalidation():
+			return super().delete_view(request, object_id, extra_context)
+
+
 class GroupedCheckboxSelectMultiple(forms.CheckboxSelectMultiple):
 	template_name = "connections/widgets/grouped_checkbox_select.html"
 
@@ -224,7 +256,7 @@ class TeamMembershipInline(TabularInline):
 
 
 @admin.register(Character)
-class CharacterAdmin(OrderedChoiceAdminMixin, ModelAdmin):
+class CharacterAdmin(DeferredInvalidationAdminMixin, OrderedChoiceAdminMixin, ModelAdmin):
 	"""Admin configuration for Character."""
 	form = CharacterAdminForm
 	list_display = ("name", "phase_introduced", "earth_number", "alignment", "status")
@@ -238,21 +270,21 @@ class CharacterAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 
 
 @admin.register(AlterEgo)
-class AlterEgoAdmin(ModelAdmin):
+class AlterEgoAdmin(DeferredInvalidationAdminMixin, ModelAdmin):
 	"""Admin configuration for AlterEgo."""
 	list_display = ("name", "character")
 	search_fields = ("name", "character__name")
 
 
 @admin.register(Team)
-class TeamAdmin(ModelAdmin):
+class TeamAdmin(DeferredInvalidationAdminMixin, ModelAdmin):
 	"""Admin configuration for Team."""
 	list_display = ("name",)
 	search_fields = ("name",)
 
 
 @admin.register(TeamMembership)
-class TeamMembershipAdmin(ModelAdmin):
+class TeamMembershipAdmin(DeferredInvalidationAdminMixin, ModelAdmin):
 	"""Admin configuration for TeamMembership."""
 	list_display = ("character", "team", "is_current_member")
 	list_filter = ("is_current_member", "team")
@@ -260,7 +292,7 @@ class TeamMembershipAdmin(ModelAdmin):
 
 
 @admin.register(Movie)
-class MovieAdmin(OrderedChoiceAdminMixin, ModelAdmin):
+class MovieAdmin(DeferredInvalidationAdminMixin, OrderedChoiceAdminMixin, ModelAdmin):
 	"""Admin configuration for Movie."""
 	list_display = ("title", "release_date")
 	search_fields = ("title",)
@@ -281,7 +313,7 @@ class MovieAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 
 
 @admin.register(Relationship)
-class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
+class RelationshipAdmin(DeferredInvalidationAdminMixin, OrderedChoiceAdminMixin, ModelAdmin):
 	"""Admin configuration for Relationship."""
 	form = RelationshipAdminForm
 	change_list_template = "connections/admin/relationship_change_list.html"
@@ -292,12 +324,7 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 	def _relationship_character_label(self, character):
 		earth = character.earth_number.number if character.earth_number else None
 		aliases = [alter_ego.name for alter_ego in character.alter_egos.all() if alter_ego.name]
-		label = character.name
-		if aliases:
-			label = f"{label} — {', '.join(aliases)}"
-		if earth:
-			label = f"{label} ({earth})"
-		return label
+		return character_label(character.name, earth, aliases)
 
 	def _relationship_character_choices(self, queryset):
 		grouped_choices = {}
@@ -358,19 +385,16 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 			return form_field
 		return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
-	def _relationship_adjacency(self):
+	def _relationship_adjacency(self, index=None):
 		"""Map each character to the characters it already has any relationship with.
 
 		Relationships are treated as undirected here so a target is hidden from a
-		source regardless of which side it was stored on.
+		source regardless of which side it was stored on. Read from the cached
+		RelationshipAdminIndex; pass `index` to reuse one already loaded.
 		"""
-		adjacency = {}
-		for char1_id, char2_id in Relationship.objects.values_list("character1_id", "character2_id"):
-			adjacency.setdefault(char1_id, set()).add(char2_id)
-			adjacency.setdefault(char2_id, set()).add(char1_id)
-		return {character_id: sorted(related) for character_id, related in adjacency.items()}
+		return (index or RelationshipAdminIndex.current()).adjacency()
 
-	def _movie_variant_data(self):
+	def _movie_variant_data(self, index=None):
 		"""Compute variant relationships used by the bulk picker's Variants section.
 
 		A "variant" is a different character that shares a name or an alias with a
@@ -385,60 +409,7 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 		- variant_options: [(character_id, label), ...] — the de-duplicated union of
 		  every character that is some character's variant, rendered once per picker.
 		"""
-		characters = list(
-			Character.objects.select_related("earth_number", "movie_introduced")
-			.prefetch_related("alter_egos", "movies")
-		)
-
-		# Identity tokens (name + aliases) per character, and a reverse index.
-		tokens_by_character = {}
-		characters_by_token = {}
-		characters_by_id = {}
-		for character in characters:
-			characters_by_id[character.pk] = character
-			tokens = set()
-			if character.name:
-				tokens.add(character.name.strip().lower())
-			for alter_ego in character.alter_egos.all():
-				if alter_ego.name:
-					tokens.add(alter_ego.name.strip().lower())
-			tokens_by_character[character.pk] = tokens
-			for token in tokens:
-				characters_by_token.setdefault(token, set()).add(character.pk)
-
-		# Characters sharing any token with the given character (excluding itself).
-		variant_adjacency = {}
-		variant_union = set()
-		for character in characters:
-			related = set()
-			for token in tokens_by_character[character.pk]:
-				related |= characters_by_token.get(token, set())
-			related.discard(character.pk)
-			if related:
-				variant_adjacency[character.pk] = sorted(related)
-				variant_union |= related
-
-		# Which characters belong to each movie (matching the picker's grouping).
-		members_by_movie = {}
-		for character in characters:
-			titles = {movie.title for movie in character.movies.all()}
-			if character.movie_introduced:
-				titles.add(character.movie_introduced.title)
-			for title in titles:
-				members_by_movie.setdefault(title, set()).add(character.pk)
-		movie_members = {title: sorted(members) for title, members in members_by_movie.items()}
-
-		variant_options = [
-			(pk, self._relationship_character_label(characters_by_id[pk]))
-			for pk in sorted(
-				variant_union,
-				key=lambda pk: (
-					characters_by_id[pk].earth_number.number if characters_by_id[pk].earth_number else "",
-					characters_by_id[pk].name,
-				),
-			)
-		]
-		return variant_adjacency, movie_members, variant_options
+		return (index or RelationshipAdminIndex.current()).variant_data()
 
 	change_form_template = "connections/admin/relationship_change_form.html"
 
@@ -500,6 +471,8 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 						if key.startswith("rows-") and key.endswith("-character2") and key.split("-")[1].isdigit()
 					})
 
+					rows = []
+					row_numbers = []
 					for idx in row_indices:
 						char2_id = request.POST.get(f"rows-{idx}-character2", "").strip()
 						rel_type = request.POST.get(f"rows-{idx}-relationship_type", "").strip()
@@ -509,37 +482,34 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 
 						if not char2_id or not rel_type:
 							continue
-
-						try:
-							char2 = Character.objects.get(pk=char2_id)
-						except Character.DoesNotExist:
+						if not char2_id.isdigit():
 							messages.error(request, f"Row {idx + 1}: target character not found.")
 							continue
 
-						if char2.pk == source_character.pk:
-							messages.error(request, f"Row {idx + 1}: a character can't be related to themself.")
-							continue
-
-						char1, char2_final = source_character, char2
+						char1_id, char2_final_id = source_character.pk, int(char2_id)
 						if directional and direction == "reverse":
-							char1, char2_final = char2, source_character
-
-						try:
-							_, created = Relationship.objects.get_or_create(
-								character1=char1,
-								character2=char2_final,
-								relationship_type=rel_type,
-								defaults={"directional": directional, "notes": notes},
+							char1_id, char2_final_id = char2_final_id, source_character.pk
+						rows.append(RelationshipRow(char1_id, char2_final_id, rel_type, directional, notes))
+						row_numbers.append(idx + 1)
+
+					# Every row is checked and written together: a fixed handful of
+					# queries and one cache invalidation however many rows there are.
+					result = write_relationships(rows)
+					for row, row_number, outcome in zip(rows, row_numbers, result.outcomes):
+						if outcome == CREATED:
+							created_count += 1
+						elif outcome == EXISTS:
+							messages.warning(
+								request,
+								f"Already exists: {result.names[row.character1_id]} ↔ "
+								f"{result.names[row.character2_id]} ({row.relationship_type})",
 							)
-							if created:
-								created_count += 1
-							else:
-								messages.warning(
-									request,
-									f"Already exists: {char1.name} ↔ {char2_final.name} ({rel_type})",
-								)
-						except Exception as e:
-							messages.error(request, f"Row {idx + 1}: {e}")
+						elif outcome == MISSING_CHARACTER:
+							messages.error(request, f"Row {row_number}: target character not found.")
+						elif outcome == SELF_RELATIONSHIP:
+							messages.error(request, f"Row {row_number}: a character can't be related to themself.")
+						else:
+							messages.error(request, f"Row {row_number}: unknown relationship type \"{row.relationship_type}\".")
 
 			if created_count:
 				messages.success(request, f"Created {created_count} relationship(s).")
@@ -553,15 +523,10 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 				return HttpResponseRedirect(request.path)
 
 		selected_movie = request.POST.get("movie", "") if request.method == "POST" else request.GET.get("movie", "")
-		variant_adjacency, movie_members, variant_options = self._movie_variant_data()
+		index = RelationshipAdminIndex.current()
+		variant_adjacency, movie_members, variant_options = self._movie_variant_data(index)
 
-		# {character_id: "alias1 alias2 ..."} so the picker can match on aliases,
-		# the same way the public graph search does.
-		character_aliases = {}
-		for character_id, alias_name in AlterEgo.objects.values_list("character_id", "name"):
-			if alias_name:
-				character_aliases.setdefault(str(character_id), []).append(alias_name)
-		character_aliases = {cid: " ".join(names) for cid, names in character_aliases.items()}
+		character_aliases = self._character_aliases()
 
 		# Determine initial rows: prefer DB config, fallback to settings/env default.
 		initial_rows = int(getattr(settings, "CONNECTIONS_BULK_ADD_DEFAULT_ROWS", 15))
@@ -578,7 +543,7 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 			"title": "Bulk Add Relationships",
 			"character_choices": character_choices,
 			"relationship_choices": Relationship.RELATIONSHIP_CHOICES,
-			"relationship_adjacency": self._relationship_adjacency(),
+			"relationship_adjacency": self._relationship_adjacency(index),
 			"movie_choices": Movie.objects.order_by("release_date", "title"),
 			"selected_movie": selected_movie,
 			"variant_adjacency": variant_adjacency,
@@ -592,12 +557,12 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 		return TemplateResponse(request, "connections/admin/bulk_add_relationships.html", context)
 
 	def _character_aliases(self):
-		"""{character_id (str): "alias1 alias2 ..."} so the picker can match aliases."""
-		character_aliases = {}
-		for character_id, alias_name in AlterEgo.objects.values_list("character_id", "name"):
-			if alias_name:
-				character_aliases.setdefault(str(character_id), []).append(alias_name)
-		return {cid: " ".join(names) for cid, names in character_aliases.items()}
+		"""{character_id (str): "alias1 alias2 ..."} so the picker can match aliases.
+
+		Read from the graph's cached search index rather than queried per page.
+		"""
+		aliases = MCUGraphService().search_index().aliases_by_character()
+		return {str(character_id): " ".join(names) for character_id, names in aliases.items()}
 
 	def clique_add_view(self, request):
 		queryset = (
@@ -634,6 +599,9 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 					proceed = False
 
 			if proceed and form.is_valid():
+				# Build every (character1_id, character2_id, type, directional) row
+				# across all types, then check and write them in one go.
+				rows = []
 				for rel_type, _label in Relationship.RELATIONSHIP_CHOICES:
 					selected_ids = sorted({
 						int(pk) for pk in form.cleaned_data.get(f"clique_{rel_type}", []) if str(pk).isdigit()
@@ -641,18 +609,6 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 					if not selected_ids:
 						continue
 
-					# Order-independent record of pairs that already exist for this
-					# type, so a pair stored either way (incl. by the per-row tool)
-					# is treated as existing.
-					existing = {
-						frozenset((c1, c2))
-						for c1, c2 in Relationship.objects.filter(
-							relationship_type=rel_type
-						).values_list("character1_id", "character2_id")
-					}
-
-					# Build (character1_id, character2_id, directional) tuples.
-					pairs = []
 					if mode == "source":
 						directional = bool(request.POST.get(f"directional_{rel_type}"))
 						direction = request.POST.get(f"direction_{rel_type}", "forward")
@@ -664,32 +620,22 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 								if target_id in source_set:
 									continue
 								if directional and direction == "reverse":
-									pairs.append((target_id, source_id, True))
+									rows.append(RelationshipRow(target_id, source_id, rel_type, True))
 								elif directional:
-									pairs.append((source_id, target_id, True))
+									rows.append(RelationshipRow(source_id, target_id, rel_type, True))
 								else:
 									lo, hi = sorted((source_id, target_id))
-									pairs.append((lo, hi, False))
+									rows.append(RelationshipRow(lo, hi, rel_type))
 					else:
 						for lo, hi in itertools.combinations(selected_ids, 2):
-							pairs.append((lo, hi, False))
+							rows.append(RelationshipRow(lo, hi, rel_type))
 
-					for char1_id, char2_id, directional in pairs:
-						key = frozenset((char1_id, char2_id))
-						if key in existing:
-							skipped_count += 1
-							continue
-						_, created = Relationship.objects.get_or_create(
-							character1_id=char1_id,
-							character2_id=char2_id,
-							relationship_type=rel_type,
-							defaults={"directional": directional},
-						)
-						existing.add(key)
-						if created:
-							created_count += 1
-						else:
-							skipped_count += 1
+				# A pair stored either way (incl. by the per-row tool) counts as
+				# existing, directional or not, as does a pair repeated across
+				# the submission.
+				result = write_relationships(rows, unordered=True)
+				created_count = result.count(CREATED)
+				skipped_count = len(rows) - created_count
 
 				if created_count:
 					messages.success(request, f"Created {created_count} relationship(s).")
@@ -728,6 +674,7 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 			"variant_adjacency": variant_adjacency,
 			"movie_members": movie_members,
 			"character_aliases": self._character_aliases(),
+			# Re-read: a POST above may have just added relationships.
 			"relationship_adjacency": self._relationship_adjacency(),
 			"opts": self.model._meta,
 			"app_label": self.model._meta.app_label,
@@ -755,7 +702,8 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 					Q(character1=selected_character) | Q(character2=selected_character)
 				)
 				deleted_count = to_delete.count()
-				to_delete.delete()
+				with deferred_invalidation():
+					to_delete.delete()
 				if deleted_count:
 					messages.success(
 						request,
@@ -809,7 +757,7 @@ class RelationshipAdmin(OrderedChoiceAdminMixin, ModelAdmin):
 
 
 @admin.register(Earth)
-class EarthAdmin(ModelAdmin):
+class EarthAdmin(DeferredInvalidationAdminMixin, ModelAdmin):
 	"""Admin configuration for Earth."""
 	list_display = ("number",)
 	search_fields = ("number",)
@@ -830,13 +778,13 @@ class BulkAddConfigAdmin(ModelAdmin):
 
 
 @admin.action(description="Renormalize positions in the selected columns")
+@deferred_invalidation()
 def renormalize_positions(modeladmin, request, queryset):
 	"""Spread a column's positions back out to 10, 20, 30... preserving order.
 
-	Needed in two cases: after repeated inserts between the same two entries have
-	used up the decimal places between them, and once after pointing one track's
-	'continues from' at another, to merge their two independent numberings into
-	one sequence that can interleave.
+	Inserts make their own room, so this is only needed once after pointing one
+	track's 'continues from' at another, to merge their two independent
+	numberings into one sequence that can interleave.
 	"""
 	if queryset.model is WatchEntry:
 		tracks = WatchTrack.objects.filter(pk__in=queryset.values_list("track_id", flat=True))
@@ -853,7 +801,7 @@ def renormalize_positions(modeladmin, request, queryset):
 
 
 @admin.register(WatchTrack)
-class WatchTrackAdmin(ModelAdmin):
+class WatchTrackAdmin(DeferredInvalidationAdminMixin, ModelAdmin):
 	"""A lane in the watch-order chart."""
 
 	list_display = ("name", "slug", "lane_order", "continues_from", "entry_count", "swatch", "is_active")
@@ -888,6 +836,7 @@ class WatchTrackAdmin(ModelAdmin):
 		)
 
 
+@deferred_invalidation()
 def _run_tmdb_lookup(request, queryset, overwrite):
 	if not tmdb.is_configured():
 		messages.error(
@@ -934,7 +883,7 @@ def refetch_tmdb_metadata(modeladmin, request, queryset):
 
 
 @admin.register(WatchEntry)
-class WatchEntryAdmin(ModelAdmin):
+class WatchEntryAdmin(DeferredInvalidationAdminMixin, ModelAdmin):
 	"""Watch-order entries. Ordering is handled by the form's "insert after" chooser."""
 
 	form = WatchEntryAdminForm
@@ -1058,7 +1007,7 @@ class WatchEntryAdmin(ModelAdmin):
 
 
 @admin.register(WatchCollection)
-class WatchCollectionAdmin(ModelAdmin):
+class WatchCollectionAdmin(DeferredInvalidationAdminMixin, ModelAdmin):
 	"""Curated cross-track lists, e.g. "Doomsday Prep"."""
 
 	list_display = ("name", "slug", "entry_count", "display_order", "is_active")
@@ -1075,7 +1024,7 @@ class WatchCollectionAdmin(ModelAdmin):
 
 
 @admin.register(WatchOrderConfig)
-class WatchOrderConfigAdmin(ModelAdmin):
+class WatchOrderConfigAdmin(DeferredInvalidationAdminMixin, ModelAdmin):
 	"""Display settings for the chart."""
 
 	list_display = ("__str__", "items_per_row")
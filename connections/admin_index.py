@@ -0,0 +1,247 @@
+"""Lookup tables behind the relationship admin's character pickers.
+
+The add, change, bulk-add and clique-add pages all need two roster-wide
+structures: which characters are already related (so a picker can hide them)
+and which characters are variants of each other (a different character that
+shares a name or an alias, like the same hero on another Earth). Building them
+meant scanning every relationship and loading every character with its aliases
+and movies on each page render.
+
+`RelationshipAdminIndex` keeps the raw material for both in one versioned
+cache entry. Signals patch it for just the relationships and characters an
+edit touches and store the result under the next version, the same way
+MCUGraphService patches the graph, so cataloguing a movie one relationship at
+a time never forces a full rebuild.
+"""
+
+import threading
+from collections import Counter
+from dataclasses import dataclass, field, replace
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .cache_versions import bump_version, get_version
+from .invalidation import defer
+from .models import AlterEgo, Character, Relationship
+from .single_flight import single_flight
+
+# Serializes patches from this process so two edits cannot both start from the
+# same version and lose one of the changes.
+_patch_lock = threading.Lock()
+
+
+def character_label(name, earth, aliases):
+	"""Picker label: "Name — Alias, Alias (Earth)"."""
+	label = name
+	if aliases:
+		label = f"{label} — {', '.join(aliases)}"
+	if earth:
+		label = f"{label} ({earth})"
+	return label
+
+
+@dataclass(frozen=True)
+class CharacterEntry:
+	"""What the pickers need to know about one character."""
+
+	# Lowercased name and aliases; sharing one makes two characters variants.
+	tokens: frozenset
+	label: str
+	earth: str
+	name: str
+	# Titles of the movies the character appears or is introduced in.
+	titles: frozenset
+
+
+def _character_entry(character):
+	aliases = [alter_ego.name for alter_ego in character.alter_egos.all() if alter_ego.name]
+	earth = character.earth_number.number if character.earth_number else ""
+	titles = {movie.title for movie in character.movies.all()}
+	if character.movie_introduced:
+		titles.add(character.movie_introduced.title)
+	return CharacterEntry(
+		tokens=frozenset(token.strip().lower() for token in [character.name, *aliases] if token),
+		label=character_label(character.name, earth, aliases),
+		earth=earth,
+		name=character.name,
+		titles=frozenset(titles),
+	)
+
+
+def _character_entries(queryset):
+	characters = queryset.select_related("earth_number", "movie_introduced").prefetch_related(
+		Prefetch("alter_egos", queryset=AlterEgo.objects.order_by("pk")),
+		"movies",
+	)
+	return {character.pk: _character_entry(character) for character in characters}
+
+
+@dataclass(frozen=True)
+class RelationshipAdminIndex:
+	"""Relationship pairs and per-character picker data. Use `current()`."""
+
+	CACHE_PREFIX = "connections:admin-index"
+	CACHE_TIMEOUT = 60 * 60
+	VERSION_KEY = f"{CACHE_PREFIX}:version"
+
+	# relationship id -> (smaller character id, larger character id)
+	relationship_pairs: dict = field(default_factory=dict)
+	# How many relationships join each pair, so deleting one of several keeps
+	# the pair related.
+	pair_counts: Counter = field(default_factory=Counter)
+	# character id -> CharacterEntry
+	characters: dict = field(default_factory=dict)
+
+	@classmethod
+	def build(cls):
+		relationship_pairs = {
+			relationship_id: tuple(sorted((character1_id, character2_id)))
+			for relationship_id, character1_id, character2_id in Relationship.objects.values_list(
+				"id", "character1_id", "character2_id"
+			)
+		}
+		return cls(
+			relationship_pairs=relationship_pairs,
+			pair_counts=Counter(relationship_pairs.values()),
+			characters=_character_entries(Character.objects.all()),
+		)
+
+	@classmethod
+	def _cache_key(cls, version):
+		return f"{cls.CACHE_PREFIX}:v{version}"
+
+	@classmethod
+	def _get_cache_version(cls):
+		return get_version(cls.VERSION_KEY)
+
+	@classmethod
+	def invalidate_cache(cls):
+		"""Move to a new version without carrying the index; the next read rebuilds it.
+
+		Returns the new version, or None when held by deferred_invalidation().
+		"""
+		if defer(cls.VERSION_KEY, lambda _items: cls.invalidate_cache()):
+			return None
+		new_version = bump_version(cls.VERSION_KEY)
+		return new_version
+
+	@classmethod
+	def current(cls):
+		"""The index for the current version, built once on a miss."""
+		cache_key = cls._cache_key(cls._get_cache_version())
+
+		def build():
+			index = cls.build()
+			cache.set(cache_key, index, cls.CACHE_TIMEOUT)
+			return index
+
+		return single_flight(f"{cache_key}:lock", lambda: cache.get(cache_key), build)
+
+	@classmethod
+	def _apply_patch(cls, patch):
+		"""Store `patch(index)` under the next version, if this version is cached.
+
+		Held by deferred_invalidation() and run once the surrounding transaction
+		commits, like MCUGraphService._apply_graph_patch: patched from inside a
+		save that then rolls back, the index would keep a pair that never existed.
+		"""
+		if defer(cls.VERSION_KEY, lambda _items: cls.invalidate_cache(), action=lambda: cls._apply_patch(patch)):
+			return
+		transaction.on_commit(lambda: cls._apply_patch_now(patch))
+
+	@classmethod
+	def _apply_patch_now(cls, patch):
+		with _patch_lock:
+			index = cache.get(cls._cache_key(cls._get_cache_version()))
+			new_version = cls.invalidate_cache()
+			if index is not None:
+				cache.set(cls._cache_key(new_version), patch(index), cls.CACHE_TIMEOUT)
+
+	@classmethod
+	def apply_relationship_change(cls, relationship, removed=False):
+		relationship_id = relationship.id
+		pair = None if removed else tuple(sorted((relationship.character1_id, relationship.character2_id)))
+		cls._apply_patch(lambda index: index.with_relationship(relationship_id, pair))
+
+	@classmethod
+	def apply_character_change(cls, character_ids):
+		"""Re-read the given characters (dropping any that no longer exist)."""
+		character_ids = set(character_ids)
+		if not character_ids:
+			return
+
+		def patch(index):
+			entries = _character_entries(Character.objects.filter(pk__in=character_ids))
+			return index.with_characters({character_id: entries.get(character_id) for character_id in character_ids})
+
+		cls._apply_patch(patch)
+
+	def with_relationship(self, relationship_id, pair):
+		"""A copy with `relationship_id` joining `pair`, or removed when `pair` is None."""
+		relationship_pairs = dict(self.relationship_pairs)
+		pair_counts = Counter(self.pair_counts)
+		previous = relationship_pairs.pop(relationship_id, None)
+		if previous is not None:
+			pair_counts[previous] -= 1
+			if pair_counts[previous] <= 0:
+				del pair_counts[previous]
+		if pair is not None:
+			relationship_pairs[relationship_id] = pair
+			pair_counts[pair] += 1
+		return replace(self, relationship_pairs=relationship_pairs, pair_counts=pair_counts)
+
+	def with_characters(self, entries):
+		"""A copy with each {character id: CharacterEntry or None} applied."""
+		characters = dict(self.characters)
+		for character_id, entry in entries.items():
+			if entry is None:
+				characters.pop(character_id, None)
+			else:
+				characters[character_id] = entry
+		return replace(self, characters=characters)
+
+	def adjacency(self):
+		"""{character_id: [related character ids]}, treating relationships as undirected."""
+		adjacency = {}
+		for first, second in self.pair_counts:
+			adjacency.setdefault(first, set()).add(second)
+			adjacency.setdefault(second, set()).add(first)
+		return {character_id: sorted(related) for character_id, related in adjacency.items()}
+
+	def variant_data(self):
+		"""(variant_adjacency, movie_members, variant_options) for the bulk pickers.
+
+		See RelationshipAdmin._movie_variant_data for what each one drives.
+		"""
+		characters_by_token = {}
+		for character_id, entry in self.characters.items():
+			for token in entry.tokens:
+				characters_by_token.setdefault(token, set()).add(character_id)
+
+		variant_adjacency = {}
+		variant_union = set()
+		for character_id, entry in self.characters.items():
+			related = set()
+			for token in entry.tokens:
+				related |= characters_by_token[token]
+			related.discard(character_id)
+			if related:
+				variant_adjacency[character_id] = sorted(related)
+				variant_union |= related
+
+		members_by_movie = {}
+		for character_id, entry in self.characters.items():
+			for title in entry.titles:
+				members_by_movie.setdefault(title, set()).add(character_id)
+		movie_members = {title: sorted(members) for title, members in members_by_movie.items()}
+
+		variant_options = [
+			(character_id, self.characters[character_id].label)
+			for character_id in sorted(
+				variant_union,
+				key=lambda character_id: (self.characters[character_id].earth, self.characters[character_id].name),
+			)
+		]
+		return variant_adjacency, movie_members, variant_options
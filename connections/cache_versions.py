@@ -0,0 +1,31 @@
+"""Version counters for the connections caches.
+
+Each cache namespace keys its entries by a version number stored under its
+own VERSION_KEY. An edit moves the namespace to a new version, so everything
+cached under the old one is simply never read again.
+"""
+
+from django.core.cache import cache
+
+
+def get_version(key):
+	"""The version stored under `key`, starting it at 1 on a miss."""
+	version = cache.get(key)
+	if version is None:
+		version = 1
+		cache.set(key, version)
+	return int(version)
+
+
+def bump_version(key):
+	"""Move the version stored under `key` on by one and return the new one."""
+	version = cache.get(key)
+	if version is None:
+		cache.set(key, 2)
+		return 2
+	try:
+		return cache.incr(key)
+	except (ValueError, NotImplementedError):
+		new_version = int(version) + 1
+		cache.set(key, new_version)
+		return new_version
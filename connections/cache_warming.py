@@ -0,0 +1,109 @@
+"""Prebuild the connections caches before visitors ask for them.
+
+Every edit bumps a cache version and a deploy starts with an empty cache, so
+without this the first visitors pay for rebuilding the graph, its layout and
+the payloads. `warm_connections_cache` builds the entries visitors are most
+likely to want: the full graph payload, the watch-order payload, and the filter
+combinations and path queries the services' hit counters rank highest.
+
+The default cache is per-process locmem, which another process can't fill, so
+the warmer runs inside each web worker: once when gunicorn starts the worker
+(`warm_on_startup`, from gunicorn.conf.py, on unless CONNECTIONS_PREWARM_ON_START
+is off) and, with CONNECTIONS_PREWARM_ON_INVALIDATE set, after every version
+bump. Both run in a background thread so the worker serves meanwhile. The
+`warm_connections_cache` management command only helps with a shared cache
+backend.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from networkx.exception import NetworkXNoPath, NodeNotFound
+
+from .graph_payloads import cached_payload, filter_payload_source, full_graph_payload, graph_service
+from .watch_order_service import WatchOrderService
+
+logger = logging.getLogger(__name__)
+
+watch_order_service = WatchOrderService()
+
+TOP_FILTERS = 10
+TOP_PATHS = 20
+# How long the background warmer waits after an edit before building, so a
+# burst of admin saves is warmed once at the end instead of after each save.
+PREWARM_DELAY = 2
+
+_prewarm_lock = threading.Lock()
+_prewarm_pending = threading.Event()
+
+
+def warm_connections_cache(filter_limit=TOP_FILTERS, path_limit=TOP_PATHS):
+	"""Build the popular connections cache entries for the current version.
+
+	Entries that are already cached are left alone. Returns how many filter
+	payloads and path queries were warmed.
+	"""
+	# Layouts first: requests never run the simulation, so a payload built
+	# without one would go out unpositioned.
+	graph_service.compute_layout(graph_service.build_graph())
+	cached_payload("full-payload", full_graph_payload)
+	watch_order_service.build_payload()
+
+	filters = graph_service.top_hits("filter", filter_limit)
+	for query in filters:
+		graph, _ = graph_service.filtered_subgraph(**query)
+		graph_service.compute_layout(graph, filter_key=graph_service.filter_key(**query))
+		cached_payload(*filter_payload_source(query))
+
+	paths = 0
+	for from_id, to_id in graph_service.top_hits("path", path_limit):
+		try:
+			graph_service.shortest_path(from_id, to_id)
+		except (NodeNotFound, NetworkXNoPath):
+			# The pair was split or deleted since it was counted.
+			continue
+		paths += 1
+
+	graph_service.prune_hits()
+	return {"filters": len(filters), "paths": paths}
+
+
+def warm_on_startup():
+	"""Warm this process's caches in the background, if enabled. For gunicorn's post_worker_init."""
+	if settings.CONNECTIONS_PREWARM_ON_START:
+		_start_prewarm()
+
+
+def schedule_prewarm():
+	"""Warm the caches in the background once the current transaction commits, if enabled."""
+	if settings.CONNECTIONS_PREWARM_ON_INVALIDATE:
+		transaction.on_commit(_start_prewarm)
+
+
+def _start_prewarm():
+	_prewarm_pending.set()
+	if _prewarm_lock.acquire(blocking=False):
+		threading.Thread(target=_prewarm, name="connections-prewarm", daemon=True).start()
+
+
+def _prewarm():
+	try:
+		# A bump that lands mid-warm sets the flag again, so the loop makes one
+		# more pass for it rather than starting a second thread.
+		while _prewarm_pending.is_set():
+			time.sleep(PREWARM_DELAY)
+			_prewarm_pending.clear()
+			try:
+				warm_connections_cache()
+			except Exception:
+				logger.exception("Background connections cache warm-up failed")
+	finally:
+		close_old_connections()
+		_prewarm_lock.release()
+
+	# Catch a bump that arrived between the last check and releasing the lock.
+	if _prewarm_pending.is_set():
+		_start_prewarm()
@@ -0,0 +1,132 @@
+"""Typeahead search over character names and aliases.
+
+The graph page and the relationship admin used to inline the whole roster so
+the browser could filter it. `CharacterSearchIndex` answers those lookups on
+the server instead: every word of every name and alias goes into one sorted
+token list, and each word of the query is matched as a prefix with a bisect.
+
+Matches rank by how well one name or alias covers the whole query: exact, then
+prefix of the full text, then word prefixes. The character's own name beats an
+alias, and a match spread across several of them comes last.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+WORD_RE = re.compile(r"\w+")
+ALIAS_PENALTY = 3
+SPLIT_MATCH = 2 * ALIAS_PENALTY
+
+
+def normalize(text):
+	"""Case-, accent- and apostrophe-insensitive form used on both sides of a match."""
+	decomposed = unicodedata.normalize("NFKD", text or "")
+	stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+	return stripped.casefold().replace("'", "").replace("’", "")
+
+
+def words(text):
+	return WORD_RE.findall(normalize(text))
+
+
+@dataclass(frozen=True)
+class CharacterSearchIndex:
+	"""Prefix index over the roster's names and aliases. Build with `build()`."""
+
+	# (id, name, earth) per character, in roster order.
+	characters: tuple = ()
+	# Alias names per character, parallel to `characters`.
+	aliases: tuple = ()
+	# Sorted (word, character position, field) triples; field 0 is the name,
+	# field n the nth alias.
+	tokens: list = field(default_factory=list)
+
+	@classmethod
+	def build(cls, rows):
+		"""Index `rows` of (id, name, earth, aliases)."""
+		characters = []
+		aliases = []
+		tokens = []
+		for position, (character_id, name, earth, alias_names) in enumerate(rows):
+			alias_names = tuple(alias for alias in alias_names if alias)
+			characters.append((character_id, name, earth))
+			aliases.append(alias_names)
+			for field_number, text in enumerate((name, *alias_names)):
+				for word in set(words(text)):
+					tokens.append((word, position, field_number))
+		tokens.sort()
+		return cls(characters=tuple(characters), aliases=tuple(aliases), tokens=tokens)
+
+	def aliases_by_character(self):
+		"""{character_id: (alias, ...)} for characters that have aliases."""
+		return {
+			character_id: alias_names
+			for (character_id, _, _), alias_names in zip(self.characters, self.aliases)
+			if alias_names
+		}
+
+	def _prefix_matches(self, prefix):
+		"""{character position: {field, ...}} for every word starting with `prefix`."""
+		matches = {}
+		start = bisect_left(self.tokens, (prefix,))
+		for word, position, field_number in self.tokens[start:]:
+			if not word.startswith(prefix):
+				break
+			matches.setdefault(position, set()).add(field_number)
+		return matches
+
+	def _rank(self, position, fields, query):
+		"""Lower is better; see the module docstring."""
+		if not fields:
+			return SPLIT_MATCH, None
+		# The name is field 0, so it is preferred whenever it covers the query.
+		field_number = min(fields)
+		text = self.characters[position][1] if field_number == 0 else self.aliases[position][field_number - 1]
+		text = " ".join(words(text))
+		rank = 0 if text == query else 1 if text.startswith(query) else 2
+		return rank + (ALIAS_PENALTY if field_number else 0), field_number
+
+	def search(self, query, limit=20):
+		"""The best `limit` matches for `query`, as JSON-ready dicts."""
+		query_words = words(query)
+		if not query_words or limit < 1:
+			return []
+
+		# Longest word first: it has the fewest matches to intersect.
+		query_words.sort(key=len, reverse=True)
+		candidates = self._prefix_matches(query_words[0])
+		for word in query_words[1:]:
+			if not candidates:
+				break
+			matches = self._prefix_matches(word)
+			candidates = {
+				position: fields & matches[position]
+				for position, fields in candidates.items()
+				if position in matches
+			}
+		if not candidates:
+			return []
+
+		normalized_query = " ".join(words(query))
+		ranked = []
+		for position, fields in candidates.items():
+			rank, field_number = self._rank(position, fields, normalized_query)
+			character_id, name, _ = self.characters[position]
+			ranked.append((rank, normalize(name), character_id, position, field_number))
+		ranked.sort()
+
+		results = []
+		for _, _, character_id, position, field_number in ranked[:limit]:
+			_, name, earth = self.characters[position]
+			results.append(
+				{
+					"id": character_id,
+					"name": name,
+					"display_name": f"{name} ({earth})" if earth else name,
+					"earth": earth,
+					"matched_alias": self.aliases[position][field_number - 1] if field_number else None,
+				}
+			)
+		return results
@@ -8,7 +8,7 @@ between two others never renumbers its neighbours.
 from django import forms
 from django.core.exceptions import ValidationError
 
-from .models import WatchEntry, append_position, next_position_after
+from .models import WatchEntry, append_position, next_position_after, track_columns
 from .poster_matching import find_poster
 from .watch_order_service import would_create_cycle
 
@@ -63,12 +63,14 @@ class WatchEntryAdminForm(forms.ModelForm):
 		track = cleaned_data.get("track")
 		anchor = cleaned_data.get("insert_after")
 
+		# One column map for every lookup below.
+		columns = track_columns() if track else None
+
 		# Same column, not necessarily the same track: sagas that continue one
 		# another share a column, and an entry from one can be slotted between
 		# two from the other.
 		if anchor and track and anchor.track_id != track.pk:
-			column = {chain_track.pk for chain_track in track.column_tracks()}
-			if anchor.track_id not in column:
+			if anchor.track_id not in track.column_track_ids(columns):
 				raise ValidationError(
 					{"insert_after": f"'{anchor}' is in the {anchor.track} column, not {track}'s. "
 					                 f"Pick an entry from the same column."}
@@ -78,15 +80,14 @@ class WatchEntryAdminForm(forms.ModelForm):
 			submitted = cleaned_data.get("position")
 			if anchor:
 				# An explicit "put it after this" beats anything else on the form.
-				try:
-					cleaned_data["position"] = next_position_after(anchor)
-				except ValidationError as error:
-					raise ValidationError({"insert_after": error.messages})
+				# Only previewed here: save() makes the room, so a rejected form
+				# never moves the neighbours.
+				cleaned_data["position"] = next_position_after(anchor, columns)
 			elif submitted is not None:
 				cleaned_data["position"] = submitted
 			elif self.instance.position is None or self.instance.track_id != track.pk:
 				# New entry, or moved to a different track: append to the end.
-				cleaned_data["position"] = append_position(track)
+				cleaned_data["position"] = append_position(track, columns)
 			else:
 				cleaned_data["position"] = self.instance.position
 
@@ -94,6 +95,10 @@ class WatchEntryAdminForm(forms.ModelForm):
 		self._validate_prerequisites(cleaned_data)
 		return cleaned_data
 
+	def save(self, commit=True):
+		self.instance.place_after = self.cleaned_data.get("insert_after")
+		return super().save(commit=commit)
+
 	def _autofill_poster(self, cleaned_data):
 		"""Find the committed poster for this title so nobody types a path.
 
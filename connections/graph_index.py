@@ -0,0 +1,226 @@
+"""In-memory attribute index for filtering the MCU graph without the database.
+
+Every filter click used to run a character query with `Exists` subqueries for
+team and movie, then a relationship query, then build a fresh graph. The index
+answers the same question with set intersections. Characters get a position
+in `character_ids` (sorted ids, lone characters included, since a filter shows
+a matching character even with no relationships), and each filterable value -
+an alignment, a status, an earth, a phase, a team, a movie - maps to a bitset of
+the positions that have it. Python ints are the bitsets: `|` is "any of these
+values", `&` is "and this other filter too".
+
+Relationship rows come from the full graph snapshot, with one bitset per
+relationship type over the row positions, so restricting edges to a set of
+types is the same kind of intersection.
+"""
+
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from .graph_snapshot import NODE_FIELDS, GraphSnapshot
+
+# Filter name -> the node attribute it matches against. Team and movie are
+# memberships rather than attributes and are indexed separately.
+ATTRIBUTE_DIMENSIONS = {
+	"alignment": "alignment",
+	"status": "status",
+	"earth": "earth",
+	"phase": "phase_introduced",
+}
+
+
+@dataclass(frozen=True)
+class CharacterSummary:
+	"""The light fields of a character, as carried by the graph nodes."""
+
+	id: int
+	name: str
+	alignment: str | None
+	status: str | None
+	earth: str | None
+	phase_introduced: int | None
+	movie_introduced_id: int | None
+	photo_url: str
+
+
+def character_summaries(graph):
+	"""CharacterSummary for every node in `graph`, ordered by name."""
+	summaries = []
+	for node_id in graph.nodes:
+		data = graph.nodes[node_id]
+		summaries.append(CharacterSummary(id=node_id, **{field: data.get(field) for field in NODE_FIELDS}))
+	return sorted(summaries, key=lambda summary: (summary.name or "", summary.id))
+
+
+def _positions(bits):
+	"""Set bit positions of an int, lowest first."""
+	while bits:
+		lowest = bits & -bits
+		yield lowest.bit_length() - 1
+		bits ^= lowest
+
+
+def _as_int(value):
+	try:
+		return int(value)
+	except (TypeError, ValueError):
+		return None
+
+
+class AttributeIndex:
+	"""Bitsets over characters and relationship rows for one graph version."""
+
+	__slots__ = ("character_ids", "attributes", "bitsets", "rows", "row_ends", "type_bits")
+
+	def __getstate__(self):
+		return {name: getattr(self, name) for name in self.__slots__}
+
+	def __setstate__(self, state):
+		for name, value in state.items():
+			setattr(self, name, value)
+
+	@classmethod
+	def build(cls, nodes, team_memberships, movie_memberships, rows):
+		"""Index every character in `nodes` and the relationship `rows`.
+
+		`nodes` maps character id to its light attribute dict, the memberships
+		are (character_id, team_id) / (character_id, movie_id) pairs, and `rows`
+		are GraphSnapshot.rows() of the full graph.
+		"""
+		index = cls()
+		index.character_ids = array("i", sorted(nodes))
+		index.attributes = tuple(
+			tuple(nodes[character_id].get(field) for field in NODE_FIELDS)
+			for character_id in index.character_ids
+		)
+		positions = {character_id: position for position, character_id in enumerate(index.character_ids)}
+
+		index.bitsets = {dimension: {} for dimension in (*ATTRIBUTE_DIMENSIONS, "team", "movie")}
+		for position, character_id in enumerate(index.character_ids):
+			for dimension, field in ATTRIBUTE_DIMENSIONS.items():
+				value = nodes[character_id].get(field)
+				if value is not None:
+					index.bitsets[dimension][value] = index.bitsets[dimension].get(value, 0) | (1 << position)
+		for dimension, memberships in (("team", team_memberships), ("movie", movie_memberships)):
+			for character_id, value in memberships:
+				if character_id in positions:
+					index.bitsets[dimension][value] = index.bitsets[dimension].get(value, 0) | (1 << positions[character_id])
+
+		index._index_rows(rows, positions)
+		return index
+
+	def _index_rows(self, rows, positions):
+		self.rows = tuple(rows)
+		self.row_ends = array("i")
+		self.type_bits = {}
+		for row_position, row in enumerate(self.rows):
+			self.row_ends.append(positions[row[1]])
+			self.row_ends.append(positions[row[2]])
+			self.type_bits[row[3]] = self.type_bits.get(row[3], 0) | (1 << row_position)
+
+	def _copy(self):
+		index = AttributeIndex()
+		for name in self.__slots__:
+			setattr(index, name, getattr(self, name))
+		return index
+
+	def _position(self, character_id):
+		position = bisect_left(self.character_ids, character_id)
+		if position < len(self.character_ids) and self.character_ids[position] == character_id:
+			return position
+		return None
+
+	def node(self, character_id):
+		"""Light attribute dict for one character, or None if it is not indexed."""
+		position = self._position(character_id)
+		if position is None:
+			return None
+		return dict(zip(NODE_FIELDS, self.attributes[position]))
+
+	def with_rows(self, rows):
+		"""Same characters, new relationship rows. None if a row names an unknown character."""
+		rows = tuple(rows)
+		positions = {}
+		for row in rows:
+			for character_id in (row[1], row[2]):
+				if character_id not in positions:
+					position = self._position(character_id)
+					if position is None:
+						return None
+					positions[character_id] = position
+
+		index = self._copy()
+		index._index_rows(rows, positions)
+		return index
+
+	def with_character(self, character_id, attributes):
+		"""Same index with one character's attributes replaced. None if it is not indexed."""
+		position = self._position(character_id)
+		if position is None:
+			return None
+
+		index = self._copy()
+		previous = dict(zip(NODE_FIELDS, self.attributes[position]))
+		index.attributes = (
+			self.attributes[:position]
+			+ (tuple(attributes.get(field) for field in NODE_FIELDS),)
+			+ self.attributes[position + 1:]
+		)
+		index.bitsets = dict(self.bitsets)
+		bit = 1 << position
+		for dimension, field in ATTRIBUTE_DIMENSIONS.items():
+			old_value, new_value = previous.get(field), attributes.get(field)
+			if old_value == new_value:
+				continue
+			values = dict(self.bitsets[dimension])
+			if old_value is not None:
+				values[old_value] = values.get(old_value, 0) & ~bit
+			if new_value is not None:
+				values[new_value] = values.get(new_value, 0) | bit
+			index.bitsets[dimension] = values
+		return index
+
+	def match(self, alignment=(), phase=None, status=(), earth=(), team=(), movie=()):
+		"""Bitset of the characters passing every given filter.
+
+		Values inside one filter are alternatives, filters combine with "and",
+		and an empty filter does not restrict anything.
+		"""
+		selected = (1 << len(self.character_ids)) - 1
+		requested = {
+			"alignment": alignment,
+			"status": status,
+			"earth": earth,
+			"phase": [phase] if phase is not None else [],
+			"team": [_as_int(value) for value in team],
+			"movie": [_as_int(value) for value in movie],
+		}
+		for dimension, values in requested.items():
+			if not values:
+				continue
+			bits = 0
+			for value in values:
+				bits |= self.bitsets[dimension].get(value, 0)
+			selected &= bits
+		return selected
+
+	def subgraph(self, relationship_types=(), **filters):
+		"""GraphSnapshot of the matching characters and the relationships among them."""
+		selected = self.match(**filters)
+
+		if relationship_types:
+			candidates = 0
+			for relationship_type in relationship_types:
+				candidates |= self.type_bits.get(relationship_type, 0)
+		else:
+			candidates = (1 << len(self.rows)) - 1
+
+		rows = [
+			self.rows[row_position]
+			for row_position in _positions(candidates)
+			if selected >> self.row_ends[2 * row_position] & 1
+			and selected >> self.row_ends[2 * row_position + 1] & 1
+		]
+		nodes = {self.character_ids[position]: self.node(self.character_ids[position]) for position in _positions(selected)}
+		return GraphSnapshot.build(nodes, rows)
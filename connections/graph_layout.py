@@ -0,0 +1,270 @@
+"""Server-side force-directed layout for the MCU graph.
+
+`static/src/graph.js` used to settle a d3 force simulation in the browser on
+every load and filter change, which takes seconds on a phone. The same
+simulation runs here instead, once per graph version, and the positions ride
+along in the Cytoscape payload so the client only has to paint a `preset`
+layout.
+
+The forces and tuning mirror `initD3Sim` in graph.js (link, many-body charge,
+collision, and a gentle pull toward each large Earth's cluster center) so the
+result looks like what the browser would have produced. Charge uses a grid
+approximation in place of d3's quadtree: nodes in neighbouring cells repel
+exactly, and farther cells within range act through their centroid.
+
+Layouts can be warm-started from earlier positions. Seeded nodes keep their
+place and the simulation starts cool, so an edit only nudges the picture
+around the change instead of reshuffling it.
+"""
+
+import math
+from collections import defaultdict
+
+NODE_RADIUS = 46
+BASE_CHARGE = -5200
+BASE_LINK_DISTANCE = 600
+ALPHA_START = 1.0
+# Starting heat when most nodes already have a position from a previous layout.
+ALPHA_WARM = 0.05
+ALPHA_MIN = 0.001
+VELOCITY_DECAY = 0.4
+SETTLE_TICK_CAP = 400
+COLLIDE_STRENGTH = 0.9
+# Earths with fewer nodes than this float at the origin instead of getting a
+# region of their own; see the cluster notes in graph.js.
+MIN_CLUSTER = 5
+CLUSTER_PULL = 0.07
+PHI = (1 + math.sqrt(5)) / 2
+
+
+def _tuning(node_count):
+	"""Force parameters scaled smoothly with graph size, as graph.js does."""
+	density = min(1, 120 / node_count)
+	collide_radius = NODE_RADIUS + 18
+	return {
+		"charge": BASE_CHARGE * (0.55 + 0.45 * density),
+		"link_distance": BASE_LINK_DISTANCE * (0.70 + 0.30 * density),
+		"collide_radius": collide_radius,
+		"alpha_decay": 0.04 + 0.05 * (1 - density),
+		"charge_max": 1200 + 2800 * density,
+		"room": collide_radius * 2.2,
+	}
+
+
+def _cluster_centers(clusters, room):
+	"""Center point per node: a slot on a ring for each large Earth, else the origin."""
+	sizes = defaultdict(int)
+	for cluster in clusters:
+		sizes[cluster] += 1
+
+	anchored = sorted(
+		(cluster for cluster, size in sizes.items() if cluster not in (None, "Unknown") and size >= MIN_CLUSTER),
+		key=lambda cluster: (-sizes[cluster], str(cluster)),
+	)
+	spans = {cluster: math.sqrt(sizes[cluster]) for cluster in anchored}
+	total_span = sum(spans.values())
+	ring_radius = total_span * room / (2 * math.pi) if len(anchored) > 1 else 0
+
+	centers = {}
+	accumulated = 0
+	for cluster in anchored:
+		middle = accumulated + spans[cluster] / 2
+		accumulated += spans[cluster]
+		angle = 2 * math.pi * middle / total_span
+		centers[cluster] = (math.cos(angle) * ring_radius, math.sin(angle) * ring_radius)
+	return [centers.get(cluster, (0.0, 0.0)) for cluster in clusters]
+
+
+def _initial_positions(node_ids, neighbors, seed):
+	"""Seeded positions where known, otherwise next to seeded neighbours or on a spiral."""
+	count = len(node_ids)
+	base_radius = max(300, math.sqrt(count) * 130)
+	xs, ys = [0.0] * count, [0.0] * count
+	placed = [False] * count
+
+	for index, node_id in enumerate(node_ids):
+		if node_id in seed:
+			xs[index], ys[index] = seed[node_id]
+			placed[index] = True
+
+	for index in range(count):
+		if placed[index]:
+			continue
+		anchors = [neighbor for neighbor in neighbors[index] if placed[neighbor]]
+		if anchors:
+			# A new node starts just off its already-placed neighbours, on a
+			# per-node angle so several newcomers do not land on one point.
+			angle = index * 2 * math.pi / (PHI * PHI)
+			xs[index] = sum(xs[anchor] for anchor in anchors) / len(anchors) + NODE_RADIUS * math.cos(angle)
+			ys[index] = sum(ys[anchor] for anchor in anchors) / len(anchors) + NODE_RADIUS * math.sin(angle)
+		else:
+			radius = base_radius * math.sqrt((index + 0.5) / count)
+			angle = 2 * math.pi * index / (PHI * PHI)
+			xs[index] = radius * math.cos(angle)
+			ys[index] = radius * math.sin(angle)
+	return xs, ys
+
+
+def force_layout(graph, seed=None):
+	"""Settled {node_id: (x, y)} positions for every node in `graph`.
+
+	`graph` is a GraphSnapshot (or anything with its `nodes` / `edges()` read
+	API); nodes are clustered by their `earth`. `seed` maps node ids to earlier
+	positions to warm-start from.
+	"""
+	node_ids = list(graph.nodes)
+	count = len(node_ids)
+	if count == 0:
+		return {}
+
+	seed = seed or {}
+	tuning = _tuning(count)
+	position_of = {node_id: index for index, node_id in enumerate(node_ids)}
+
+	links = []
+	neighbors = [[] for _ in range(count)]
+	degree = [0] * count
+	for source_id, target_id in graph.edges():
+		source, target = position_of[source_id], position_of[target_id]
+		links.append((source, target))
+		neighbors[source].append(target)
+		neighbors[target].append(source)
+		degree[source] += 1
+		degree[target] += 1
+	# d3.forceLink defaults: weaker links on busy nodes, and the busier end
+	# moves less.
+	link_params = [
+		(source, target, 1 / min(degree[source], degree[target]), degree[source] / (degree[source] + degree[target]))
+		for source, target in links
+	]
+
+	centers = _cluster_centers([graph.nodes[node_id].get("earth") for node_id in node_ids], tuning["room"])
+	xs, ys = _initial_positions(node_ids, neighbors, seed)
+	vxs, vys = [0.0] * count, [0.0] * count
+
+	seeded = sum(1 for node_id in node_ids if node_id in seed)
+	alpha = ALPHA_WARM if seeded * 2 >= count else ALPHA_START
+	alpha_decay = tuning["alpha_decay"]
+	ticks = min(SETTLE_TICK_CAP, max(1, math.ceil(math.log(ALPHA_MIN / alpha) / math.log(1 - alpha_decay))))
+
+	link_distance = tuning["link_distance"]
+	charge = tuning["charge"]
+	charge_max = tuning["charge_max"]
+	charge_max_squared = charge_max * charge_max
+	collide_radius = tuning["collide_radius"]
+	collide_diameter = 2 * collide_radius
+	# Cells a third of the charge range wide: the 3x3 block around a node is
+	# handled exactly, anything farther (up to the range) through centroids.
+	cell_size = charge_max / 3
+	cell_reach = 4
+	far_offsets = [
+		(dx, dy)
+		for dx in range(-cell_reach, cell_reach + 1)
+		for dy in range(-cell_reach, cell_reach + 1)
+		if max(abs(dx), abs(dy)) > 1
+	]
+
+	for _ in range(ticks):
+		alpha += (0 - alpha) * alpha_decay
+
+		for source, target, strength, bias in link_params:
+			dx = xs[target] + vxs[target] - xs[source] - vxs[source] or 1e-6
+			dy = ys[target] + vys[target] - ys[source] - vys[source] or 1e-6
+			length = math.sqrt(dx * dx + dy * dy)
+			scale = (length - link_distance) / length * alpha * strength
+			dx *= scale
+			dy *= scale
+			vxs[target] -= dx * bias
+			vys[target] -= dy * bias
+			vxs[source] += dx * (1 - bias)
+			vys[source] += dy * (1 - bias)
+
+		cells = defaultdict(list)
+		for index in range(count):
+			cells[(math.floor(xs[index] / cell_size), math.floor(ys[index] / cell_size))].append(index)
+		centroids = {
+			cell: (len(members), sum(xs[m] for m in members) / len(members), sum(ys[m] for m in members) / len(members))
+			for cell, members in cells.items()
+		}
+		for (cell_x, cell_y), members in cells.items():
+			near = [
+				other
+				for dx in (-1, 0, 1)
+				for dy in (-1, 0, 1)
+				for other in cells.get((cell_x + dx, cell_y + dy), ())
+			]
+			far = [centroids[cell] for cell in ((cell_x + dx, cell_y + dy) for dx, dy in far_offsets) if cell in centroids]
+			for index in members:
+				x, y = xs[index], ys[index]
+				fx = fy = 0.0
+				for other in near:
+					if other == index:
+						continue
+					dx = xs[other] - x
+					dy = ys[other] - y
+					distance_squared = dx * dx + dy * dy
+					if distance_squared >= charge_max_squared:
+						continue
+					if distance_squared < 1:
+						distance_squared = 1
+					weight = charge * alpha / distance_squared
+					fx += dx * weight
+					fy += dy * weight
+				for mass, center_x, center_y in far:
+					dx = center_x - x
+					dy = center_y - y
+					distance_squared = dx * dx + dy * dy
+					if distance_squared >= charge_max_squared:
+						continue
+					weight = charge * alpha * mass / distance_squared
+					fx += dx * weight
+					fy += dy * weight
+				vxs[index] += fx
+				vys[index] += fy
+
+		collision_cells = defaultdict(list)
+		for index in range(count):
+			collision_cells[(math.floor(xs[index] / collide_diameter), math.floor(ys[index] / collide_diameter))].append(index)
+		for (cell_x, cell_y), members in collision_cells.items():
+			nearby = [
+				other
+				for dx in (-1, 0, 1)
+				for dy in (-1, 0, 1)
+				for other in collision_cells.get((cell_x + dx, cell_y + dy), ())
+			]
+			for index in members:
+				for other in nearby:
+					if other <= index:
+						continue
+					dx = xs[index] + vxs[index] - xs[other] - vxs[other]
+					dy = ys[index] + vys[index] - ys[other] - vys[other]
+					distance_squared = dx * dx + dy * dy
+					if distance_squared >= collide_diameter * collide_diameter:
+						continue
+					if distance_squared == 0:
+						# Coincident nodes: push apart along a fixed per-pair axis.
+						dx, dy, distance_squared = 1e-3 * (index - other), 1e-3, 1e-6 * ((index - other) ** 2 + 1)
+					distance = math.sqrt(distance_squared)
+					scale = (collide_diameter - distance) / distance * COLLIDE_STRENGTH * 0.5
+					vxs[index] += dx * scale
+					vys[index] += dy * scale
+					vxs[other] -= dx * scale
+					vys[other] -= dy * scale
+
+		for index in range(count):
+			center_x, center_y = centers[index]
+			vxs[index] += (center_x - xs[index]) * CLUSTER_PULL * alpha
+			vys[index] += (center_y - ys[index]) * CLUSTER_PULL * alpha
+			vxs[index] *= 1 - VELOCITY_DECAY
+			vys[index] *= 1 - VELOCITY_DECAY
+			xs[index] += vxs[index]
+			ys[index] += vys[index]
+
+		# forceCenter: keep the mean position at the origin.
+		shift_x = sum(xs) / count
+		shift_y = sum(ys) / count
+		for index in range(count):
+			xs[index] -= shift_x
+			ys[index] -= shift_y
+
+	return {node_id: (round(xs[index], 1), round(ys[index], 1)) for index, node_id in enumerate(node_ids)}
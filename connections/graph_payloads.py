@@ -0,0 +1,171 @@
+"""Graph API payloads stored as final, compressed JSON bytes.
+
+The Cytoscape payloads are identical for every visitor until the next edit, so
+they are serialized and compressed once, cached, and served as-is. Each one
+carries a strong ETag per encoding, letting a browser that already has it
+revalidate into a bodyless 304.
+
+`cached_payload` and the payload builders below are shared by the views and
+the cache warmer, so both fill exactly the same cache entries.
+"""
+
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from .graph_service import MCUGraphService
+from .single_flight import STALE_TIMEOUT, single_flight
+
+graph_service = MCUGraphService()
+
+
+@dataclass(frozen=True)
+class EncodedPayload:
+	"""A JSON payload in every encoding we serve, plus its ETag."""
+
+	etag: str
+	bodies: dict = field(default_factory=dict)
+
+	def etag_for(self, encoding):
+		"""The ETag of one encoding's body.
+
+		A strong ETag vouches for the exact bytes, so the gzip body gets its own
+		(`"<hash>-gzip"`) rather than sharing the identity body's.
+		"""
+		if encoding == "identity":
+			return self.etag
+		return f'{self.etag[:-1]}-{encoding}"'
+
+
+def encode_payload(payload, key):
+	"""Serialize and compress `payload` once.
+
+	The ETag comes from `key` (the versioned cache key the payload is stored
+	under) and the body itself. The body is included because a cleared cache
+	restarts the version count, and the same key must not then vouch for
+	different content.
+	"""
+	body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+	digest = hashlib.blake2b(key.encode(), digest_size=16)
+	digest.update(body)
+
+	bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+	return EncodedPayload(etag=f'"{digest.hexdigest()}"', bodies=bodies)
+
+
+def _accepted_encodings(header):
+	"""Content codings the client accepts, from an Accept-Encoding header."""
+	accepted = set()
+	for part in header.split(","):
+		coding, _, params = part.strip().partition(";")
+		quality = 1.0
+		params = params.strip()
+		if params.startswith("q="):
+			try:
+				quality = float(params[2:])
+			except ValueError:
+				quality = 0.0
+		if coding and quality > 0:
+			accepted.add(coding.strip().lower())
+	return accepted
+
+
+def payload_response(request, encoded):
+	"""The gzip body if the client accepts it, or a 304 if its copy is current."""
+	accepted = _accepted_encodings(request.headers.get("Accept-Encoding", ""))
+	encoding = "gzip" if "gzip" in accepted or "*" in accepted else "identity"
+	etag = encoded.etag_for(encoding)
+
+	response = HttpResponse(encoded.bodies[encoding], content_type="application/json")
+	if encoding != "identity":
+		response["Content-Encoding"] = encoding
+	response["ETag"] = etag
+	patch_vary_headers(response, ["Accept-Encoding"])
+	return get_conditional_response(request, etag=etag, response=response)
+
+
+def cached_payload(suffix, build_payload):
+	"""A graph payload's pre-encoded cache entry, building it on a miss.
+
+	Right after an edit, one caller rebuilds the payload while concurrent ones
+	get the previous version's bytes (with that version's ETag). A payload
+	built before its layout was ready is only kept briefly, so the positioned
+	one replaces it soon after the background layout lands.
+	"""
+	cache_key = graph_service._cache_key(suffix)
+	stale_key = graph_service._stale_key(suffix)
+
+	def build():
+		payload = build_payload()
+		settled = all("position" in node for node in payload.get("nodes", ()))
+		encoded = encode_payload(payload, cache_key)
+		cache.set(
+			cache_key,
+			encoded,
+			graph_service.CACHE_TIMEOUT if settled else graph_service.LAYOUT_PENDING_TIMEOUT,
+		)
+		cache.set(stale_key, encoded, STALE_TIMEOUT)
+		return encoded
+
+	return single_flight(
+		f"{cache_key}:lock",
+		lambda: cache.get(cache_key),
+		build,
+		stale=lambda: cache.get(stale_key),
+	)
+
+
+def full_graph_payload():
+	# Read first: the payload can then only be newer than the version it
+	# claims, and replaying a change it already holds is harmless.
+	version = graph_service._get_cache_version()
+	graph = graph_service.build_graph()
+	payload = graph_service.to_cytoscape_format(graph, include_details=False, positions=graph_service.graph_layout(graph))
+	# The version /api/graph/changes/ can bring this payload up to date from.
+	payload["version"] = version
+	return payload
+
+
+def as_of_payload_source(as_of):
+	"""Cache suffix and builder for the light payload of the graph as of a release date."""
+	cutoff = graph_service.timeline().cutoff(as_of)
+
+	def build_payload():
+		_, graph = graph_service.build_graph_as_of(as_of)
+		# Placed with the full graph's layout so characters keep their spot as
+		# the timeline moves.
+		full_graph = graph_service.build_graph()
+		return graph_service.to_cytoscape_format(
+			graph,
+			include_details=False,
+			positions=graph_service.graph_layout(full_graph),
+		)
+
+	return f"as-of-payload:{cutoff}", build_payload
+
+
+def filter_payload_source(filters):
+	"""Cache suffix and builder for the light payload of one filter combination.
+
+	Keyed like the service's own filter cache so an incremental graph patch can
+	carry the payload forward when the change cannot affect it.
+	"""
+	filter_key = graph_service.filter_key(**filters)
+
+	def build_payload():
+		graph, _ = graph_service.filtered_subgraph(**filters)
+		payload = graph_service.to_cytoscape_format(
+			graph,
+			include_details=False,
+			positions=graph_service.graph_layout(graph, filter_key=filter_key),
+		)
+		payload["filters"] = filters
+		return payload
+
+	return f"filter-payload:{filter_key}", build_payload
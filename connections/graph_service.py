@@ -11,16 +11,31 @@ Modified By: Reagan Zierke
 Description: 
 '''
 
+import logging
+import queue
 import threading
-from itertools import pairwise
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from itertools import chain, pairwise
 
 import networkx as nx
 from django.conf import settings
 from django.core.cache import cache
-from django.db.models import Exists, OuterRef, Prefetch
+from django.db import transaction
+from django.db.models import Prefetch
 from django.templatetags.static import static
 
+from .cache_versions import bump_version, get_version
+from .character_search import CharacterSearchIndex
+from .graph_index import AttributeIndex, character_summaries
+from .graph_layout import force_layout
+from .graph_snapshot import NODE_FIELDS, GraphSnapshot
+from .graph_timeline import GraphTimeline
+from .invalidation import defer
 from .models import AlterEgo, Character, Movie, Relationship, TeamMembership
+from .single_flight import single_flight
 
 # Lazily built so importing this module never requires boto3/credentials (e.g. in
 # tests or local dev without Tigris keys). Guarded by a lock for thread safety
@@ -28,6 +43,18 @@ from .models import AlterEgo, Character, Movie, Relationship, TeamMembership
 _s3_client = None
 _s3_client_lock = threading.Lock()
 
+# Layouts missing from the cache are computed one at a time by a single
+# background worker. The queue is bounded and keyed by cache key, so a crawl
+# through filter combinations can neither start more than one simulation per
+# process nor pile up work: past the limit a miss is simply not queued, and a
+# later request for it asks again.
+_layout_queue = queue.Queue(maxsize=8)
+_layouts_queued = set()
+_layouts_lock = threading.Lock()
+_layout_worker = None
+
+logger = logging.getLogger(__name__)
+
 
 def _get_s3_client():
 	global _s3_client
@@ -46,12 +73,68 @@ def _get_s3_client():
 	return _s3_client
 
 
+# Per-worker copies of large cache entries, keyed by cache suffix. Each value is
+# (token, structure); see MCUGraphService._local_cached.
+_local_memo = {}
+
+# Serializes the read-modify-write of shared maintenance entries (the filter
+# registry, and carrying caches across an incremental patch) between threads.
+_maintenance_lock = threading.RLock()
+
+# Node fields that only affect how a character is drawn, never which filters it
+# matches, so changing them leaves filter results without that character intact.
+DISPLAY_ONLY_FIELDS = {"name", "photo_url"}
+
+
+def _element_diff(old, new):
+	"""Added, updated and removed Cytoscape elements between two {id: element} maps."""
+	return {
+		"added": [element for element_id, element in new.items() if element_id not in old],
+		"updated": [element for element_id, element in new.items() if element_id in old and old[element_id] != element],
+		"removed": [element_id for element_id in old if element_id not in new],
+	}
+
+
+def _run_layouts():
+	"""Body of the layout worker: compute queued layouts one at a time, for good."""
+	while True:
+		cache_key, compute = _layout_queue.get()
+		try:
+			compute()
+		except Exception:
+			logger.exception("Background graph layout failed")
+		finally:
+			with _layouts_lock:
+				_layouts_queued.discard(cache_key)
+
+
 class MCUGraphService:
 	"""Build and serialize the MCU relationship graph."""
 
 	CACHE_PREFIX = "connections:graph"
 	CACHE_TIMEOUT = 900
+	COMPONENT_MEMBER_LIMIT = 25
+	# Previous layouts are only warm-start seeds, so they may outlive the
+	# version they were computed for.
+	LAYOUT_SEED_TIMEOUT = 60 * 60 * 24
+	# How long a payload served without positions is cached while its layout
+	# is computed in the background.
+	LAYOUT_PENDING_TIMEOUT = 5
 	VERSION_KEY = f"{CACHE_PREFIX}:version"
+	# Request counts for filter and path queries, kept across versions so the
+	# cache warmer knows what is worth prebuilding after an edit. Each entry has
+	# its own counter; HITS_KEY lists the entries with the query to replay.
+	HITS_KEY = f"{CACHE_PREFIX}:hits"
+	HITS_TIMEOUT = 60 * 60 * 24 * 7
+	HITS_LIMIT = 200
+	# Per-character detail payloads are dropped explicitly when their data
+	# changes, so they can live much longer than the versioned entries.
+	CHARACTER_DETAILS_TIMEOUT = 60 * 60 * 24
+	# What each patched version changed in the full payload, so an open page
+	# can catch up without refetching it (see changes_since).
+	CHANGES_KEY = f"{CACHE_PREFIX}:changes"
+	CHANGES_TIMEOUT = 60 * 60 * 24
+	CHANGES_LIMIT = 100
 
 	# Path search prioritizes the fewest number of connections (hops). Each hop
 	# costs HOP_PENALTY, which dwarfs any single relationship weight, so a path
@@ -66,66 +149,167 @@ class MCUGraphService:
 			version = self._get_cache_version()
 		return f"{self.CACHE_PREFIX}:{suffix}:v{version}"
 
+	def _stale_key(self, suffix):
+		"""Unversioned key holding the last value built for `suffix`, for stale-while-revalidate."""
+		return f"{self.CACHE_PREFIX}:{suffix}:latest"
+
 	def _get_cache_version(self):
-		version = cache.get(self.VERSION_KEY)
-		if version is None:
-			version = 1
-			cache.set(self.VERSION_KEY, version)
-		return int(version)
+		return get_version(self.VERSION_KEY)
 
 	@classmethod
 	def invalidate_cache(cls):
-		version = cache.get(cls.VERSION_KEY)
-		if version is None:
-			cache.set(cls.VERSION_KEY, 2)
-			return 2
+		"""Bump the graph version; returns it, or None when held by deferred_invalidation()."""
+		if defer(cls.VERSION_KEY, lambda _items: cls.invalidate_cache()):
+			return None
+		new_version = bump_version(cls.VERSION_KEY)
 
-		try:
-			new_version = cache.incr(cls.VERSION_KEY)
-		except (ValueError, NotImplementedError):
-			new_version = int(version) + 1
-			cache.set(cls.VERSION_KEY, new_version)
+		# Imported here: the warmer builds payloads through graph_payloads, which imports this module.
+		from .cache_warming import schedule_prewarm
 
+		schedule_prewarm()
 		return new_version
 
+	@classmethod
+	def _hit_counter_key(cls, kind, key):
+		return f"{cls.HITS_KEY}:{kind}:{key}"
+
+	def record_hit(self, kind, key, query):
+		"""Count one request for `key` of `kind` ("filter" or "path").
+
+		`query` is what the cache warmer replays to rebuild that entry. A repeat
+		request is a single cache.incr on the entry's own counter. Only the first
+		one adds the entry to the HITS_KEY list, which stops taking new entries
+		at HITS_LIMIT until the warmer prunes it (see prune_hits).
+		"""
+		counter_key = self._hit_counter_key(kind, key)
+		try:
+			cache.incr(counter_key)
+			return
+		except ValueError:
+			pass
+		if not cache.add(counter_key, 1, self.HITS_TIMEOUT):
+			# Another request created the counter first and has listed the entry.
+			try:
+				cache.incr(counter_key)
+			except ValueError:
+				pass
+			return
+
+		with _maintenance_lock:
+			listed = cache.get(self.HITS_KEY) or {}
+			if (kind, key) in listed or len(listed) >= self.HITS_LIMIT:
+				return
+			listed[(kind, key)] = query
+			cache.set(self.HITS_KEY, listed, self.HITS_TIMEOUT)
+
+	def _hit_counts(self):
+		"""[(count, kind, key, query)] for every listed entry whose counter is still live."""
+		listed = cache.get(self.HITS_KEY) or {}
+		counts = cache.get_many([self._hit_counter_key(kind, key) for kind, key in listed])
+		return [
+			(counts[self._hit_counter_key(kind, key)], kind, key, query)
+			for (kind, key), query in listed.items()
+			if self._hit_counter_key(kind, key) in counts
+		]
+
+	def top_hits(self, kind, limit):
+		"""The `query` values of the `limit` most requested entries of `kind`, busiest first.
+
+		Reads every listed counter, so it is for the warmer, not for requests.
+		"""
+		ranked = sorted(
+			((count, key, query) for count, hit_kind, key, query in self._hit_counts() if hit_kind == kind),
+			key=lambda entry: (-entry[0], entry[1]),
+		)
+		return [query for _, _, query in ranked[:limit]]
+
+	def prune_hits(self):
+		"""Drop expired entries from the hit list, and the quieter half once it is full.
+
+		Run by the warmer after ranking, so one-off queries drop out and new
+		ones can be listed again.
+		"""
+		with _maintenance_lock:
+			live = sorted(self._hit_counts(), key=lambda entry: (-entry[0], entry[1], entry[2]))
+			if len(live) >= self.HITS_LIMIT:
+				dropped, live = live[self.HITS_LIMIT // 2:], live[: self.HITS_LIMIT // 2]
+				cache.delete_many([self._hit_counter_key(kind, key) for _, kind, key, _ in dropped])
+			cache.set(
+				self.HITS_KEY,
+				{(kind, key): query for _, kind, key, query in live},
+				self.HITS_TIMEOUT,
+			)
+
 	def _photo_url(self, photo_path):
-		if not photo_path:
-			return ""
-		if photo_path.startswith(("http://", "https://", "/")):
-			return photo_path
-		if settings.CONNECTIONS_SIGN_IMAGE_URLS:
-			signed = self._signed_photo_url(photo_path)
-			if signed:
-				return signed
+		return self._photo_urls([photo_path])[photo_path]
+
+	def _photo_urls(self, photo_paths):
+		"""{photo_path: url} for a whole payload's portraits, signing bucket objects in bulk."""
+		photo_paths = set(photo_paths)
+		in_bucket = {
+			photo_path
+			for photo_path in photo_paths
+			if photo_path and not photo_path.startswith(("http://", "https://", "/"))
+		}
+		signed = self._signed_photo_urls(in_bucket) if settings.CONNECTIONS_SIGN_IMAGE_URLS and in_bucket else {}
+
 		base = settings.CONNECTIONS_IMAGE_BASE_URL
-		if base:
-			return f"{base}/{photo_path}"
-		return static(photo_path)
-
-	def _signed_photo_url(self, photo_path):
-		"""Presigned GET URL for a bucket object, cached so we don't re-sign it
-		on every render. Returns None on any failure so _photo_url falls back to
-		the raw URL rather than breaking the graph."""
-		cache_key = f"{self.CACHE_PREFIX}:imgurl:{photo_path}"
-		url = cache.get(cache_key)
-		if url:
-			return url
-		ttl = settings.CONNECTIONS_SIGNED_URL_TTL
+		urls = {}
+		for photo_path in photo_paths:
+			if photo_path not in in_bucket:
+				urls[photo_path] = photo_path or ""
+			elif photo_path in signed:
+				urls[photo_path] = signed[photo_path]
+			elif base:
+				urls[photo_path] = f"{base}/{photo_path}"
+			else:
+				urls[photo_path] = static(photo_path)
+		return urls
+
+	def _signed_photo_urls(self, photo_paths):
+		"""Presigned GET URLs for bucket objects, cached so we don't re-sign them
+		on every render.
+
+		URLs are signed per window of half the signing TTL. Everything signed in
+		one window expires at the same instant, a window after it closes, and
+		stays cached only until it closes: a whole graph's portraits age out
+		together, and a cached URL always has a full window left when served.
+		Objects that fail to sign are left out so _photo_urls falls back to the
+		raw URL rather than breaking the graph."""
+		window = max(60, settings.CONNECTIONS_SIGNED_URL_TTL // 2)
+		now = time.time()
+		epoch = int(now // window)
+		keys = {f"{self.CACHE_PREFIX}:imgurl:{epoch}:{photo_path}": photo_path for photo_path in photo_paths}
+		urls = {keys[key]: url for key, url in cache.get_many(keys).items() if url}
+
+		missing = [photo_path for photo_path in photo_paths if photo_path not in urls]
+		if not missing:
+			return urls
 		try:
-			url = _get_s3_client().generate_presigned_url(
-				"get_object",
-				Params={
-					"Bucket": settings.CONNECTIONS_S3_BUCKET,
-					"Key": photo_path,
-				},
-				ExpiresIn=ttl,
-			)
+			client = _get_s3_client()
 		except Exception:
-			return None
-		# Cache a bit under the signing TTL so a cached URL is always still valid
-		# when it's served.
-		cache.set(cache_key, url, max(60, ttl - 300))
-		return url
+			return urls
+
+		expires_in = max(1, int((epoch + 2) * window - now))
+		signed = {}
+		for photo_path in missing:
+			try:
+				signed[photo_path] = client.generate_presigned_url(
+					"get_object",
+					Params={
+						"Bucket": settings.CONNECTIONS_S3_BUCKET,
+						"Key": photo_path,
+					},
+					ExpiresIn=expires_in,
+				)
+			except Exception:
+				continue
+		cache.set_many(
+			{key: signed[photo_path] for key, photo_path in keys.items() if photo_path in signed},
+			max(1, int((epoch + 1) * window - now)),
+		)
+		urls.update(signed)
+		return urls
 
 	def _character_base_queryset(self, queryset):
 		return queryset.select_related("movie_introduced", "earth_number")
@@ -166,7 +350,8 @@ class MCUGraphService:
 			],
 		}
 
-	def _character_node_data(self, character, include_details=True):
+	def _character_node_data(self, character, include_details=True, photo_urls=None):
+		"""Node attributes for one character; `photo_urls` is a prebuilt _photo_urls map."""
 		data = {
 			"id": character.id,
 			"label": character.name,
@@ -176,7 +361,9 @@ class MCUGraphService:
 			"earth": character.earth_number.number if character.earth_number else None,
 			"phase_introduced": character.phase_introduced,
 			"movie_introduced_id": character.movie_introduced_id,
-			"photo_url": self._photo_url(character.photo_path),
+			"photo_url": (
+				photo_urls[character.photo_path] if photo_urls is not None else self._photo_url(character.photo_path)
+			),
 		}
 
 		if include_details:
@@ -201,67 +388,16 @@ class MCUGraphService:
 			else f"edge-{edge_data['source']}-{edge_data['target']}-{edge_id_suffix}",
 		}
 
-	def _add_edge(self, graph, source_id, target_id, relationship, edge_directional):
-		graph.add_node(source_id)
-		graph.add_node(target_id)
-
-		relationship_type = relationship.relationship_type
-
-		# `relationship_segments` groups the relationships between this pair by
-		# type. Each distinct type becomes its own Cytoscape edge (its own line)
-		# in to_cytoscape_format, so e.g. Thor↔Hela (Enemy + Family) renders as
-		# two lines instead of one merged edge. The flat relationship_type /
-		# relationship_types / relationship_ids / weight / directional fields are
-		# kept for path-finding, which only needs a single representative edge.
-		if graph.has_edge(source_id, target_id):
-			existing = graph[source_id][target_id]
-			existing_types = list(existing.get("relationship_types", []))
-			if relationship_type not in existing_types:
-				existing_types.append(relationship_type)
-
-			existing_ids = list(existing.get("relationship_ids", []))
-			if relationship.id not in existing_ids:
-				existing_ids.append(relationship.id)
-
-			existing["relationship_types"] = existing_types
-			existing["relationship_ids"] = existing_ids
-			existing["relationship_type"] = existing.get("relationship_type") or relationship_type
-			existing["weight"] = min(existing.get("weight", relationship.weight), relationship.weight)
-			existing["directional"] = existing.get("directional", False) or edge_directional
-			existing["source"] = source_id
-			existing["target"] = target_id
-
-			segments = existing.setdefault("relationship_segments", {})
-			self._merge_segment(segments, relationship, relationship_type, edge_directional)
-			return
-
-		graph.add_edge(
-			source_id,
-			target_id,
-			source=source_id,
-			target=target_id,
-			relationship_type=relationship_type,
-			relationship_types=[relationship_type],
-			relationship_ids=[relationship.id],
-			weight=relationship.weight,
-			directional=edge_directional,
-			relationship_segments=self._merge_segment({}, relationship, relationship_type, edge_directional),
-		)
-
-	def _merge_segment(self, segments, relationship, relationship_type, edge_directional):
-		segment = segments.setdefault(
-			relationship_type,
-			{"relationship_ids": [], "weight": relationship.weight, "directional": False},
-		)
-		if relationship.id not in segment["relationship_ids"]:
-			segment["relationship_ids"].append(relationship.id)
-		segment["weight"] = min(segment["weight"], relationship.weight)
-		segment["directional"] = segment["directional"] or edge_directional
-		return segments
-
-	def _build_graph_from_relationships(self, relationships, include_details=True):
-		graph = nx.DiGraph()
+	def _build_graph_from_relationships(self, relationships, include_details=True, characters=()):
+		"""Snapshot of `relationships`, plus any extra `characters` as lone nodes.
 
+		Each pair of characters becomes one stored edge, in the orientation it was
+		first seen, and the relationships on it are grouped by type into
+		segments. Each segment is its own Cytoscape edge (its own line) in
+		to_cytoscape_format, so e.g. Thor<->Hela (Enemy + Family) renders as two
+		lines instead of one merged edge, while path-finding only needs the
+		single representative edge.
+		"""
 		relationships = relationships.select_related(
 			"character1", "character1__earth_number",
 			"character2", "character2__earth_number",
@@ -294,263 +430,838 @@ class MCUGraphService:
 				),
 			)
 
+		relationships = list(relationships)
+		characters = list(characters)
+		photo_urls = self._photo_urls(
+			[
+				character.photo_path
+				for relationship in relationships
+				for character in (relationship.character1, relationship.character2)
+			]
+			+ [character.photo_path for character in characters]
+		)
+
+		nodes = {}
+		rows = []
 		for relationship in relationships:
-			graph.add_node(
-				relationship.character1_id,
-				**self._character_node_data(relationship.character1, include_details=include_details),
-			)
-			graph.add_node(
-				relationship.character2_id,
-				**self._character_node_data(relationship.character2, include_details=include_details),
-			)
+			for character in (relationship.character1, relationship.character2):
+				if character.id not in nodes:
+					nodes[character.id] = self._character_node_data(
+						character, include_details=include_details, photo_urls=photo_urls
+					)
 
-			# For directional relationships, mark directional True.
-			# For non-directional relationships we create a single undirected edge
-			# (directional=False) between the two nodes so Cytoscape shows one
-			# edge with no arrowhead.
-			self._add_edge(
-				graph,
-				relationship.character1_id,
-				relationship.character2_id,
-				relationship,
-				relationship.directional,
+			# Directional relationships keep character1 -> character2 as their
+			# stored orientation so Cytoscape can draw the arrowhead; the rest
+			# render as a single edge with no arrowhead.
+			rows.append(
+				(
+					relationship.id,
+					relationship.character1_id,
+					relationship.character2_id,
+					relationship.relationship_type,
+					relationship.weight,
+					relationship.directional,
+				)
 			)
 
-		return graph
+		for character in characters:
+			nodes[character.id] = self._character_node_data(character, include_details=include_details, photo_urls=photo_urls)
+
+		return GraphSnapshot.build(nodes, rows)
 
 	def build_graph(self, queryset=None, include_details=False):
+		"""The relationship graph as a read-only GraphSnapshot.
+
+		The full graph is shared between requests rather than copied, so callers
+		must not try to modify it; use `to_networkx()` for a mutable copy.
+		"""
 		if queryset is None:
-			cache_key = self._cache_key("full")
-			cached_graph = cache.get(cache_key)
-			if cached_graph is not None:
-				return cached_graph.copy()
-
-			relationships = Relationship.objects.all()
-			graph = self._build_graph_from_relationships(relationships, include_details=include_details)
-			cache.set(cache_key, graph.copy(), self.CACHE_TIMEOUT)
-			return graph
+			return self._local_cached(
+				"full",
+				lambda: self._build_graph_from_relationships(Relationship.objects.all(), include_details=include_details),
+			)
 
 		return self._build_graph_from_relationships(queryset, include_details=include_details)
 
-	def _build_traversal_graph(self, graph):
-		"""Create a traversal graph where every edge is traversable both ways.
+	def _local_cached(self, suffix, build):
+		"""Process-local copy of a large versioned cache entry.
 
-		Relationship direction is only meaningful for display (arrowheads). For
-		connectivity/path-finding a directional edge (e.g. a Mentor edge stored
-		as Tony -> Peter) still connects the two characters, so the path search
-		must be able to walk it in either direction. We keep the original
-		directional metadata so display can still render the correct arrow.
+		The cache pickles on every set and unpickles on every get, so a structure
+		that is read on each request (like the path index) would cost a full
+		unpickle per hit. Each build is tagged with a token stored under its own
+		small key; a worker reuses its in-memory copy for as long as the token in
+		the shared cache still matches, and reloads or rebuilds when it does not.
+		Tokens rather than version numbers, because a cleared cache restarts the
+		version count and must never be served a stale local copy.
+
+		Rebuilds go through single_flight, so after a version bump one caller
+		builds and concurrent ones wait for its result instead of repeating it.
+		"""
+		cache_key = self._cache_key(suffix)
+		token_key = f"{cache_key}:token"
+		token = cache.get(token_key)
+
+		memo = _local_memo.get(suffix)
+		if token is not None and memo is not None and memo[0] == token:
+			return memo[1]
+
+		def load():
+			entry = cache.get(cache_key)
+			if entry is None:
+				return None
+			current = cache.get(token_key)
+			if current is not None and entry[0] != current:
+				return None
+			cache.set(token_key, entry[0], self.CACHE_TIMEOUT)
+			_local_memo[suffix] = entry
+			return entry
+
+		entry = single_flight(f"{cache_key}:lock", load, lambda: self._store_local(suffix, build()))
+		return entry[1]
+
+	def _store_local(self, suffix, value, version=None):
+		"""Publish a new value for _local_cached under a fresh token. Returns (token, value)."""
+		self._store_local_many({suffix: value}, version=version)
+		return _local_memo[suffix]
+
+	def _store_local_many(self, values, version=None):
+		"""_store_local for several suffixes in one cache round trip."""
+		if version is None:
+			version = self._get_cache_version()
+		entries = {}
+		for suffix, value in values.items():
+			cache_key = self._cache_key(suffix, version=version)
+			token = uuid.uuid4().hex
+			entries[cache_key] = (token, value)
+			entries[f"{cache_key}:token"] = token
+			_local_memo[suffix] = (token, value)
+		cache.set_many(entries, self.CACHE_TIMEOUT)
+
+	# ----------------------------------------------------------------------
+	# Incremental maintenance
+	# ----------------------------------------------------------------------
+
+	def _relationship_row(self, relationship):
+		return (
+			relationship.id,
+			relationship.character1_id,
+			relationship.character2_id,
+			relationship.relationship_type,
+			relationship.weight,
+			relationship.directional,
+		)
+
+	@classmethod
+	def apply_relationship_change(cls, relationship, removed=False):
+		"""Patch the cached graph for one saved or deleted relationship.
+
+		A save is handled as "remove whatever this relationship used to be, add
+		what it is now", which covers a new row and an edited one alike.
 		"""
-		traversal_graph = graph.copy()
+		service = cls()
+		# Read now: a delete clears the instance's pk, and the patch may be
+		# replayed later by deferred_invalidation().
+		relationship_id = relationship.id
+		added = [] if removed else [service._relationship_row(relationship)]
+
+		def patch(graph):
+			previous = [row for row in graph.rows() if row[0] == relationship_id]
+			nodes = {
+				character.id: service._character_node_data(character, include_details=False)
+				for character in (() if removed else (relationship.character1, relationship.character2))
+				if character.id not in graph
+			}
+			patched = graph.patched(remove_relationship_ids=[relationship_id], add_relationships=added, nodes=nodes)
+
+			def affects_filter(character_ids, relationship_types):
+				return any(
+					row[1] in character_ids
+					and row[2] in character_ids
+					and (not relationship_types or row[3] in relationship_types)
+					for row in previous + added
+				)
+
+			return (
+				patched,
+				{(row[1], row[2]) for row in previous},
+				{(row[1], row[2]) for row in added},
+				affects_filter,
+				lambda index: index.with_rows(patched.rows()),
+			)
+
+		service._apply_graph_patch(patch)
+
+	@classmethod
+	def apply_character_change(cls, character):
+		"""Patch the cached graph for one saved character.
 
-		for source_id, target_id, edge_data in graph.edges(data=True):
-			if traversal_graph.has_edge(target_id, source_id):
-				existing = traversal_graph[target_id][source_id]
-				existing["weight"] = min(existing.get("weight", edge_data.get("weight", 1)), edge_data.get("weight", 1))
+		A rename or new portrait only touches that node, so paths and every
+		filter result without the character survive. A change to a field filters
+		match on (alignment, status, earth...) can move the character in or out
+		of any filter, so those drop every filter result but still keep paths.
+		"""
+		service = cls()
+
+		def patch(graph):
+			attributes = service._character_node_data(character, include_details=False)
+
+			def update_index(index):
+				return index.with_character(character.id, attributes)
+
+			index = graph.index_of(character.id)
+			if index is None:
+				# Not in the full graph (no relationships yet), but it can still
+				# appear in any filter result as a lone node.
+				return graph, set(), set(), lambda character_ids, relationship_types: True, update_index
+
+			current = graph.node_data(index)
+			changed = {field for field in NODE_FIELDS if current.get(field) != attributes.get(field)}
+			if not changed:
+				return graph, set(), set(), lambda character_ids, relationship_types: False, update_index
+
+			patched = graph.patched(nodes={character.id: attributes})
+			if changed <= DISPLAY_ONLY_FIELDS:
+				return patched, set(), set(), lambda character_ids, relationship_types: character.id in character_ids, update_index
+			return patched, set(), set(), lambda character_ids, relationship_types: True, update_index
+
+		service._apply_graph_patch(patch)
+
+	def _apply_graph_patch(self, patch):
+		"""Move the caches to a new version through one small change.
+
+		The version is still bumped, so anything this does not explicitly carry
+		over (payloads, unregistered filters, entries written by an older build)
+		is simply a miss and can never be served stale. What is carried:
+
+		- the full snapshot, patched in memory by `patch` instead of rebuilt;
+		- every cached shortest-path tree the change cannot reach;
+		- the attribute index, with the changed rows or character swapped in;
+		- each registered filter result the change cannot affect.
+
+		The elements the change touched are also recorded in the change log
+		(see changes_since).
+
+		`patch(graph)` returns (patched graph, removed pairs, added pairs,
+		affects_filter, update_index), where the pairs are (source id, target id),
+		affects_filter(character_ids, relationship_types) says whether a cached
+		filter result covering those characters and types has to go, and
+		update_index(attribute_index) returns the patched attribute index or None
+		when it has to be rebuilt. With no cached snapshot there is nothing to
+		carry and this is a plain bump.
+
+		Inside deferred_invalidation() the patch is held; it still runs if it is
+		the only change to the graph in the block. Either way it waits for the
+		surrounding transaction to commit: patched from inside a save that then
+		rolls back, the new version would cache relationships that never existed
+		(or drop ones that still do) until the next edit.
+		"""
+		if defer(self.VERSION_KEY, lambda _items: self.invalidate_cache(), action=lambda: self._apply_graph_patch(patch)):
+			return
+		transaction.on_commit(lambda: self._apply_graph_patch_now(patch))
+
+	def _apply_graph_patch_now(self, patch):
+		with _maintenance_lock:
+			old_version = self._get_cache_version()
+			cached = cache.get(self._cache_key("full", version=old_version))
+			if cached is None:
+				self.invalidate_cache()
+				return
+
+			old_graph = cached[1]
+			graph, removed_pairs, added_pairs, affects_filter, update_index = patch(old_graph)
+			new_version = self.invalidate_cache()
+			self._store_local("full", graph, version=new_version)
+			self._record_changes(new_version, self._graph_changes(old_graph, graph, removed_pairs | added_pairs))
+
+			self._carry_path_trees(old_version, new_version, old_graph, graph, removed_pairs, added_pairs)
+
+			cached_attributes = cache.get(self._cache_key("attribute-index", version=old_version))
+			if cached_attributes is not None:
+				attribute_index = update_index(cached_attributes[1])
+				if attribute_index is not None:
+					self._store_local("attribute-index", attribute_index, version=new_version)
+
+			registry = cache.get(self._cache_key("filter-registry", version=old_version)) or {}
+			carried = {}
+			for filter_key, (character_ids, relationship_types) in registry.items():
+				if affects_filter(character_ids, relationship_types):
+					continue
+				for suffix in (f"filtered:{filter_key}", f"filter-payload:{filter_key}", f"layout:{filter_key}"):
+					value = cache.get(self._cache_key(suffix, version=old_version))
+					if value is not None:
+						cache.set(self._cache_key(suffix, version=new_version), value, self.CACHE_TIMEOUT)
+				carried[filter_key] = (character_ids, relationship_types)
+			if carried:
+				cache.set(self._cache_key("filter-registry", version=new_version), carried, self.CACHE_TIMEOUT)
+
+	def _payload_elements(self, graph, node_ids, pairs):
+		"""({id: node element}, {id: edge element}) for some nodes and pairs of `graph`.
+
+		Serialized the way the full payload serializes them, minus positions.
+		"""
+		rows = [row for source_id, target_id in pairs for row in graph.pair_rows(source_id, target_id)]
+		present = {node_id for node_id in node_ids if node_id in graph}
+		referenced = present | {row[1] for row in rows} | {row[2] for row in rows}
+		payload = self.to_cytoscape_format(
+			GraphSnapshot.build({node_id: graph.nodes[node_id] for node_id in referenced}, rows),
+			include_details=False,
+		)
+		nodes = {node["data"]["id"]: node for node in payload["nodes"] if int(node["data"]["id"]) in present}
+		edges = {edge["data"]["id"]: edge for edge in payload["edges"]}
+		return nodes, edges
+
+	def _graph_changes(self, old_graph, graph, pairs):
+		"""The node and edge elements a patch added, updated and removed."""
+		old_attrs = dict(zip(old_graph.node_ids, old_graph.node_attrs))
+		node_ids = set()
+		for node_id, attrs in zip(graph.node_ids, graph.node_attrs):
+			if old_attrs.pop(node_id, None) != attrs:
+				node_ids.add(node_id)
+		# Whatever is left was dropped from the graph.
+		node_ids.update(old_attrs)
+
+		old_nodes, old_edges = self._payload_elements(old_graph, node_ids, pairs)
+		nodes, edges = self._payload_elements(graph, node_ids, pairs)
+		return {"nodes": _element_diff(old_nodes, nodes), "edges": _element_diff(old_edges, edges)}
+
+	def _record_changes(self, version, changes):
+		with _maintenance_lock:
+			# Entries at or past `version` were logged before the cache was
+			# cleared and the version count restarted.
+			log = [entry for entry in cache.get(self.CHANGES_KEY) or [] if entry[0] < version]
+			log.append((version, changes))
+			cache.set(self.CHANGES_KEY, log[-self.CHANGES_LIMIT:], self.CHANGES_TIMEOUT)
+
+	def changes_since(self, since):
+		"""What changed in the full payload after version `since`.
+
+		{"version": current, "changes": [{"version", "nodes", "edges"}, ...]}
+		in version order, where nodes and edges each hold "added", "updated"
+		(whole elements) and "removed" (element ids). Only patched versions are
+		logged; when a version in between was a plain bump, or has fallen out of
+		the log, this is {"version": current, "resync": True} and the caller
+		has to refetch the payload.
+		"""
+		version = self._get_cache_version()
+		if since == version:
+			return {"version": version, "changes": []}
+		log = dict(cache.get(self.CHANGES_KEY) or [])
+		versions = range(since + 1, version + 1)
+		if since > version or any(logged not in log for logged in versions):
+			return {"version": version, "resync": True}
+		return {"version": version, "changes": [{"version": logged, **log[logged]} for logged in versions]}
+
+	def _carry_path_trees(self, old_version, new_version, old_graph, graph, removed_pairs, added_pairs):
+		"""Carry cached shortest-path trees across a patch.
+
+		Removing or weakening an edge only changes trees that walk it. Adding or
+		strengthening one can change any tree in the component it ends up in,
+		and no tree outside it. Affected trees are dropped and rebuilt on their
+		next query; the rest are kept, re-indexed if the set of characters
+		changed.
+		"""
+		old_ids = old_graph.node_ids
+		keys = {self._cache_key(f"path-tree:{node_id}", version=old_version): node_id for node_id in old_ids}
+		cached = {keys[key]: entry[1] for key, entry in cache.get_many(list(keys)).items()}
+
+		affected = set()
+		for source_id, target_id in removed_pairs:
+			source, target = old_graph.index_of(source_id), old_graph.index_of(target_id)
+			for tree_source_id, tree in cached.items():
+				predecessors = tree["predecessors"]
+				if predecessors[target] == source or predecessors[source] == target:
+					affected.add(tree_source_id)
+		for source_id, _target_id in added_pairs:
+			affected.update(graph.node_ids[node] for node in graph.component(graph.index_of(source_id)))
+
+		same_nodes = list(graph.node_ids) == list(old_ids)
+		carried = {}
+		for source_id, tree in cached.items():
+			if source_id in affected or graph.index_of(source_id) is None or list(tree["node_ids"]) != list(old_ids):
+				continue
+			if same_nodes:
+				carried[f"path-tree:{source_id}"] = {"node_ids": graph.node_ids, "predecessors": tree["predecessors"]}
 				continue
+			# An untouched tree never reaches an added or dropped character,
+			# since both sit in the component of a changed pair.
+			remapped = array("i", [-1]) * len(graph.node_ids)
+			for old_node, predecessor in enumerate(tree["predecessors"]):
+				if predecessor != -1:
+					remapped[graph.index_of(old_ids[old_node])] = graph.index_of(old_ids[predecessor])
+			carried[f"path-tree:{source_id}"] = {"node_ids": graph.node_ids, "predecessors": remapped}
 
-			reverse_edge = dict(edge_data)
-			reverse_edge["source"] = target_id
-			reverse_edge["target"] = source_id
-			traversal_graph.add_edge(target_id, source_id, **reverse_edge)
+		if carried:
+			self._store_local_many(carried, version=new_version)
 
-		return traversal_graph
+	def _path_tree(self, source_id, as_of=None):
+		"""Shortest-path tree from one character, built on its first query and cached per version.
 
-	def _path_edge_data(self, graph, source_node, target_node):
-		if graph.has_edge(source_node, target_node):
-			edge_data = graph[source_node][target_node]
-			return source_node, target_node, edge_data
+		Relationship direction is only meaningful for display (arrowheads). For
+		connectivity/path-finding a directional edge (e.g. a Mentor edge stored
+		as Tony -> Peter) still connects the two characters, so the tree walks
+		the snapshot's undirected adjacency. See GraphSnapshot.shortest_path_tree
+		for how hops and weights are ranked.
 
-		if graph.has_edge(target_node, source_node):
-			# Walked in reverse. Return the edge in its stored orientation so the
-			# correct relationship type and arrow direction are preserved for display.
-			reverse_edge = graph[target_node][source_node]
-			return target_node, source_node, reverse_edge
+		The tree holds node indices, so it carries the id order it was built
+		against rather than relying on a snapshot loaded separately. Returns
+		None when the character is not in the graph.
 
-		raise nx.NetworkXNoPath(f"No traversable edge between {source_node} and {target_node}.")
+		With `as_of` (a date) the tree is walked over build_graph_as_of's
+		snapshot and cached alongside it. Those trees stay in the shared cache
+		only, since every cutoff date has its own set.
+		"""
+		cutoff, graph = self._path_graph(as_of)
+		source = graph.index_of(source_id)
+		if source is None:
+			return None
 
-	def shortest_path(self, from_id, to_id):
-		source_id = int(from_id)
-		target_id = int(to_id)
-		cache_key = self._cache_key(f"path:{source_id}:{target_id}")
-		cached_path = cache.get(cache_key)
-		if cached_path is not None:
-			return cached_path
+		def build():
+			return {"node_ids": graph.node_ids, "predecessors": graph.shortest_path_tree(source)}
 
-		graph = self.build_graph()
-		traversal_graph = self._build_traversal_graph(graph)
+		if as_of is None:
+			return self._local_cached(f"path-tree:{source_id}", build)
+		cache_key = self._cache_key(f"as-of:{cutoff}:path-tree:{source_id}")
+		tree = cache.get(cache_key)
+		if tree is None:
+			tree = build()
+			cache.set(cache_key, tree, self.CACHE_TIMEOUT)
+		return tree
 
-		def _hop_cost(_source, _target, edge_data):
-			# Fewest hops first; relationship weight breaks ties between paths of equal length.
-			return self.HOP_PENALTY + edge_data.get("weight", 1)
+	def _path_edge_data(self, graph, source_node, target_node):
+		source, target = graph.index_of(source_node), graph.index_of(target_node)
+		if source is not None and target is not None:
+			edge = graph.edge_index(source, target)
+			if edge is not None:
+				return source_node, target_node, graph.edge_data(edge, source)
+
+			edge = graph.edge_index(target, source)
+			if edge is not None:
+				# Walked in reverse. Return the edge in its stored orientation so the
+				# correct relationship type and arrow direction are preserved for display.
+				return target_node, source_node, graph.edge_data(edge, target)
+
+		raise nx.NetworkXNoPath(f"No traversable edge between {source_node} and {target_node}.")
 
-		path = nx.shortest_path(traversal_graph, source=source_id, target=target_id, weight=_hop_cost)
+	def _tree_path(self, graph, source_id, target_id, as_of=None):
+		"""Best path between two characters as a list of ids, read off a cached tree.
 
+		Paths are undirected, so (a, b) and (b, a) share the tree of the
+		smaller id, and the path is walked from that end. Returns
+		(path, reversed), where reversed says the path runs target to source.
+		`graph` is the snapshot for `as_of`, as from build_graph_as_of.
+		"""
+		root_id, leaf_id = sorted((source_id, target_id))
+		for node_id in (source_id, target_id):
+			if node_id not in graph:
+				raise nx.NodeNotFound(f"Character {node_id} is not in the graph.")
+
+		# Different components: reject before building or loading any tree.
+		if not graph.connected(graph.index_of(source_id), graph.index_of(target_id)):
+			raise nx.NetworkXNoPath(f"No path between {source_id} and {target_id}.")
+
+		tree = self._path_tree(root_id, as_of=as_of)
+		node_ids = tree["node_ids"]
+		predecessors = tree["predecessors"]
+		root = bisect_left(node_ids, root_id)
+		leaf = bisect_left(node_ids, leaf_id)
+		if leaf == len(node_ids) or node_ids[leaf] != leaf_id or predecessors[leaf] == -1:
+			raise nx.NetworkXNoPath(f"No path between {source_id} and {target_id}.")
+
+		path = [leaf]
+		while path[-1] != root:
+			path.append(predecessors[path[-1]])
+		return [node_ids[position] for position in reversed(path)], root_id != source_id
+
+	def _path_payload(self, graph, path):
 		edges = []
 		total_cost = 0
 		for source_node, target_node in pairwise(path):
 			edge_source, edge_target, edge_data = self._path_edge_data(graph, source_node, target_node)
-			total_cost += edge_data.get("weight", 1)
+			total_cost += edge_data["weight"]
 			edges.append(
 				{
 					"source": edge_source,
 					"target": edge_target,
-					"relationship_type": edge_data.get("relationship_type"),
-					"relationship_types": list(edge_data.get("relationship_types", [])),
-					"relationship_ids": list(edge_data.get("relationship_ids", [])),
-					"weight": edge_data.get("weight", 1),
-					"directional": edge_data.get("directional", False),
+					"relationship_type": edge_data["relationship_type"],
+					"relationship_types": edge_data["relationship_types"],
+					"relationship_ids": edge_data["relationship_ids"],
+					"weight": edge_data["weight"],
+					"directional": edge_data["directional"],
 				}
 			)
 
-		result = {
-			"character_ids": [int(character_id) for character_id in path],
+		return {
+			"character_ids": path,
 			"edges": edges,
 			"total_cost": total_cost,
 		}
-		cache.set(cache_key, result, self.CACHE_TIMEOUT)
-		return result
-
-	def filtered_subgraph(self, alignment=None, phase=None, status=None, earth=None, team=None, movie=None, relationship_types=None, include_details=False):
-		normalized_alignment = [
-			value.strip()
-			for value in (alignment or [])
-			if isinstance(value, str) and value.strip()
-		]
-		normalized_status = [
-			value.strip()
-			for value in (status or [])
-			if isinstance(value, str) and value.strip()
-		]
-		normalized_earth = [
-			value.strip()
-			for value in (earth or [])
-			if isinstance(value, str) and value.strip()
-		]
-		normalized_team = [
-			value.strip()
-			for value in (team or [])
-			if isinstance(value, str) and value.strip()
-		]
-		normalized_movie = [
-			value.strip()
-			for value in (movie or [])
-			if isinstance(value, str) and value.strip()
-		]
-		phase_value = int(phase) if phase not in (None, "") else None
-		normalized_relationship_types = [
-			relationship_type.strip()
-			for relationship_type in (relationship_types or [])
-			if isinstance(relationship_type, str) and relationship_type.strip()
-		]
 
-		cache_key = self._cache_key(
-			"filtered",
-			version=self._get_cache_version(),
+	def _path_graph(self, as_of):
+		"""(cutoff, snapshot) to search paths in: the full graph, or the graph as of a date."""
+		if as_of is None:
+			return None, self.build_graph()
+		return self.build_graph_as_of(as_of)
+
+	def shortest_path(self, from_id, to_id, as_of=None):
+		"""Best path between two characters, in the full graph or as of a release date."""
+		source_id = int(from_id)
+		target_id = int(to_id)
+
+		_, graph = self._path_graph(as_of)
+		path, reverse = self._tree_path(graph, source_id, target_id, as_of=as_of)
+		if reverse:
+			path.reverse()
+		return self._path_payload(graph, path)
+
+	def k_shortest_paths(self, from_id, to_id, k, as_of=None):
+		"""Up to k distinct loopless paths, ranked like shortest_path.
+
+		The first is always shortest_path's answer. The rest come from Yen's
+		algorithm over the snapshot's adjacency, and the id lists are cached
+		per version for the canonical (smaller id first) pair.
+		"""
+		source_id = int(from_id)
+		target_id = int(to_id)
+
+		cutoff, graph = self._path_graph(as_of)
+		best, reverse = self._tree_path(graph, source_id, target_id, as_of=as_of)
+		scope = f"as-of:{cutoff}:" if as_of is not None else ""
+		cache_key = self._cache_key(f"{scope}paths:{best[0]}:{best[-1]}:k{k}")
+		paths = cache.get(cache_key)
+		if paths is None:
+			first = [graph.index_of(node_id) for node_id in best]
+			paths = [
+				[graph.node_ids[node] for node in path]
+				for path in graph.k_shortest_paths(first[0], first[-1], k, first=first)
+			]
+			cache.set(cache_key, paths, self.CACHE_TIMEOUT)
+
+		return [self._path_payload(graph, path[::-1] if reverse else list(path)) for path in paths]
+
+	def _normalize_filters(self, alignment=None, phase=None, status=None, earth=None, team=None, movie=None, relationship_types=None):
+		def _clean(values):
+			return [
+				value.strip()
+				for value in (values or [])
+				if isinstance(value, str) and value.strip()
+			]
+
+		return {
+			"alignment": _clean(alignment),
+			"phase": int(phase) if phase not in (None, "") else None,
+			"status": _clean(status),
+			"earth": _clean(earth),
+			"team": _clean(team),
+			"movie": _clean(movie),
+			"relationship_types": _clean(relationship_types),
+		}
+
+	def filter_key(self, **filters):
+		"""Stable cache-key fragment for a filter combination, in any order."""
+		normalized = self._normalize_filters(**filters)
+		return (
+			f"alignment={','.join(sorted(normalized['alignment'])) or 'all'}"
+			f":phase={normalized['phase'] or 'all'}"
+			f":status={','.join(sorted(normalized['status'])) or 'all'}"
+			f":earth={','.join(sorted(normalized['earth'])) or 'all'}"
+			f":team={','.join(sorted(normalized['team'])) or 'all'}"
+			f":movie={','.join(sorted(normalized['movie'])) or 'all'}"
+			f":relationships={','.join(sorted(normalized['relationship_types'])) or 'all'}"
+		)
+
+	def _register_filter(self, filter_key, character_ids, relationship_types):
+		"""Record what a cached filter result covers, so a patch can tell whether it is affected.
+
+		See _apply_graph_patch. Losing an entry here (two workers writing at
+		once) only costs a cache miss later, never a stale result: filters are
+		carried to the next version only when they are listed.
+		"""
+		with _maintenance_lock:
+			registry_key = self._cache_key("filter-registry")
+			registry = cache.get(registry_key) or {}
+			registry[filter_key] = (frozenset(character_ids), tuple(sorted(relationship_types)))
+			cache.set(registry_key, registry, self.CACHE_TIMEOUT)
+
+	def _build_attribute_index(self):
+		characters = list(self._character_base_queryset(Character.objects.all()))
+		photo_urls = self._photo_urls(character.photo_path for character in characters)
+		return AttributeIndex.build(
+			{
+				character.id: self._character_node_data(character, include_details=False, photo_urls=photo_urls)
+				for character in characters
+			},
+			TeamMembership.objects.values_list("character_id", "team_id"),
+			Movie.characters.through.objects.values_list("character_id", "movie_id"),
+			self.build_graph().rows(),
 		)
-		cache_key = (
-			f"{cache_key}:alignment={','.join(sorted(normalized_alignment)) or 'all'}"
-			f":phase={phase_value or 'all'}"
-			f":status={','.join(sorted(normalized_status)) or 'all'}"
-			f":earth={','.join(sorted(normalized_earth)) or 'all'}"
-			f":team={','.join(sorted(normalized_team)) or 'all'}"
-			f":movie={','.join(sorted(normalized_movie)) or 'all'}"
-			f":relationships={','.join(sorted(normalized_relationship_types)) or 'all'}"
+
+	def _build_search_index(self):
+		characters = Character.objects.select_related("earth_number").prefetch_related(
+			Prefetch("alter_egos", queryset=AlterEgo.objects.order_by("name"))
 		)
-		cached_graph = cache.get(cache_key)
-		if cached_graph is not None:
-			characters = list(self._filtered_character_queryset(
-				normalized_alignment,
-				phase_value,
-				normalized_status,
-				normalized_earth,
-				normalized_team,
-				normalized_movie,
-			))
-			return cached_graph.copy(), characters
-
-		characters = list(self._filtered_character_queryset(
-			normalized_alignment,
-			phase_value,
-			normalized_status,
-			normalized_earth,
-			normalized_team,
-			normalized_movie,
-		))
-		character_ids = [c.id for c in characters]
-
-		graph = nx.DiGraph()
-		if character_ids:
-			relationships = Relationship.objects.filter(
-				character1_id__in=character_ids,
-				character2_id__in=character_ids,
+		return CharacterSearchIndex.build(
+			(
+				character.id,
+				character.name,
+				character.earth_number.number if character.earth_number else None,
+				[alter_ego.name for alter_ego in character.alter_egos.all()],
 			)
-			if normalized_relationship_types:
-				relationships = relationships.filter(relationship_type__in=normalized_relationship_types)
-			graph = self._build_graph_from_relationships(relationships, include_details=include_details)
+			for character in characters
+		)
 
-		for character in characters:
-			graph.add_node(character.id, **self._character_node_data(character, include_details=include_details))
+	def search_index(self):
+		"""Name and alias typeahead index, shared per worker like the graph."""
+		return self._local_cached("search-index", self._build_search_index)
+
+	@classmethod
+	def invalidate_search_index(cls):
+		"""Drop the search index after an alias or Earth edit, which leaves the graph version alone.
+
+		Dropped now and again on commit, like invalidate_character_details.
+		"""
+		if defer(f"{cls.CACHE_PREFIX}:search-index", lambda _items: cls.invalidate_search_index()):
+			return
+		cache_key = cls()._cache_key("search-index")
+		keys = [cache_key, f"{cache_key}:token"]
+		cache.delete_many(keys)
+		transaction.on_commit(lambda: cache.delete_many(keys))
+
+	def _attribute_index(self):
+		"""Filter bitsets for this version, built alongside the full graph."""
+		return self._local_cached("attribute-index", self._build_attribute_index)
+
+	def filtered_subgraph(self, alignment=None, phase=None, status=None, earth=None, team=None, movie=None, relationship_types=None):
+		"""Matching characters and the relationships among them, with no database queries.
+
+		Answered from the attribute index by set intersection, and cached per
+		filter combination. Returns (graph, characters), characters being a
+		CharacterSummary per node ordered by name; the graph's nodes already carry
+		everything the light Cytoscape payload needs.
+		"""
+		filters = {
+			"alignment": alignment,
+			"phase": phase,
+			"status": status,
+			"earth": earth,
+			"team": team,
+			"movie": movie,
+			"relationship_types": relationship_types,
+		}
+		filter_key = self.filter_key(**filters)
+		cache_key = self._cache_key(f"filtered:{filter_key}")
+
+		def build():
+			normalized = self._normalize_filters(**filters)
+			graph = self._attribute_index().subgraph(**normalized)
+			cache.set(cache_key, graph, self.CACHE_TIMEOUT)
+			self._register_filter(filter_key, graph.node_ids, normalized["relationship_types"])
+			return graph
+
+		graph = single_flight(f"{cache_key}:lock", lambda: cache.get(cache_key), build)
+		return graph, character_summaries(graph)
+
+	def neighborhood(self, character_id, radius, limit=None):
+		"""The subgraph within `radius` hops of one character, from the cached snapshot.
+
+		Returns (graph, truncated); see GraphSnapshot.neighborhood for how
+		`limit` picks which nodes to keep. A character with no relationships
+		is not in the full graph but still gets a one-node result. Raises
+		nx.NodeNotFound for an unknown character.
+		"""
+		character_id = int(character_id)
+		graph = self.build_graph()
+		index = graph.index_of(character_id)
+		if index is None:
+			attributes = self._attribute_index().node(character_id)
+			if attributes is None:
+				raise nx.NodeNotFound(f"Character {character_id} was not found.")
+			return GraphSnapshot.build({character_id: attributes}, []), False
+
+		indices, truncated = graph.neighborhood(index, radius, limit=limit)
+		return graph.subgraph(indices), truncated
+
+	def _build_timeline(self):
+		appearances = chain(
+			Character.objects.exclude(movie_introduced=None).values_list("id", "movie_introduced__release_date"),
+			Movie.characters.through.objects.values_list("character_id", "movie__release_date"),
+		)
+		return GraphTimeline.build(self.build_graph(), Movie.objects.values_list("id", "release_date"), appearances)
+
+	def timeline(self):
+		"""Release-order timeline of the current graph; see GraphTimeline."""
+		return self._local_cached("timeline", self._build_timeline)
+
+	def movie_release_date(self, movie_id):
+		"""Release date of a movie, or None when there is no such movie."""
+		release_date = self.timeline().movie_dates.get(movie_id)
+		if release_date is None:
+			# Added since the timeline was built.
+			release_date = Movie.objects.filter(pk=movie_id).values_list("release_date", flat=True).first()
+		return release_date
+
+	def build_graph_as_of(self, as_of):
+		"""(cutoff, snapshot) of the graph as of the date `as_of`.
+
+		Cached per version under the cutoff date (see GraphTimeline.cutoff), so
+		every release between two first appearances shares one snapshot and its
+		path trees.
+		"""
+		timeline = self.timeline()
+		cutoff = timeline.cutoff(as_of)
+		return cutoff, self._local_cached(f"as-of:{cutoff}", lambda: timeline.snapshot(cutoff))
 
-		cache.set(cache_key, graph.copy(), self.CACHE_TIMEOUT)
-		return graph, characters
+	def component_summary(self):
+		"""Connected components of the full graph, largest first, and the characters in none.
 
-	def _filtered_character_queryset(self, alignment=None, phase=None, status=None, earth=None, team=None, movie=None, include_details=False):
-		base_queryset = Character.objects.all()
-		queryset = self._character_detail_queryset(base_queryset) if include_details else self._character_base_queryset(base_queryset)
+		Each component lists up to COMPONENT_MEMBER_LIMIT of its characters by
+		name, enough for an editor to spot a stray cluster without shipping the
+		main component whole. `isolated` is every character with no
+		relationships at all.
+		"""
+		graph = self.build_graph()
+		members = {}
+		for index, label in enumerate(graph.component_ids):
+			members.setdefault(label, []).append(index)
+
+		components = []
+		for label, indices in members.items():
+			characters = sorted(
+				({"id": graph.node_ids[index], "name": graph.node_data(index)["name"]} for index in indices),
+				key=lambda character: (character["name"] or "", character["id"]),
+			)
+			components.append(
+				{
+					"id": label,
+					"size": len(indices),
+					"characters": characters[:self.COMPONENT_MEMBER_LIMIT],
+				}
+			)
+		components.sort(key=lambda component: (-component["size"], component["id"]))
+
+		index = self._attribute_index()
+		isolated = sorted(
+			(
+				{"id": character_id, "name": index.node(character_id)["name"]}
+				for character_id in index.character_ids
+				if character_id not in graph
+			),
+			key=lambda character: (character["name"] or "", character["id"]),
+		)
+		return {"components": components, "isolated": isolated}
 
-		if alignment:
-			queryset = queryset.filter(alignment__in=alignment)
+	def graph_layout(self, graph, filter_key=None):
+		"""Settled node positions for the full graph or one filter result, or None.
 
-		if phase is not None:
-			queryset = queryset.filter(phase_introduced=phase)
+		The simulation takes seconds on a large graph, so a request never runs
+		it. A miss queues it for the background worker and returns None; the caller
+		serves the payload unpositioned, which the browser settles itself as it
+		did before server layouts, and the next payload built once the layout
+		is cached carries it. The warmer computes layouts ahead of time.
+		"""
+		version = self._get_cache_version()
+		positions = cache.get(self._layout_key(filter_key, version))
+		if positions is None:
+			self._start_layout(graph, filter_key, version)
+		return positions
+
+	def compute_layout(self, graph, filter_key=None, version=None):
+		"""Settle and cache the layout of `graph` at `version` (the current one by default).
+
+		For the warmer and the background worker, never a request. Each layout
+		warm-starts from the positions it had at the previous version, so an
+		edit moves little beyond the change.
+		"""
+		if version is None:
+			version = self._get_cache_version()
+		cache_key = self._layout_key(filter_key, version)
+		positions = cache.get(cache_key)
+		if positions is None:
+			seed_key = f"{self.CACHE_PREFIX}:layout-seed:{self._layout_suffix(filter_key)}"
+			positions = force_layout(graph, seed=cache.get(seed_key))
+			cache.set(cache_key, positions, self.CACHE_TIMEOUT)
+			cache.set(seed_key, positions, self.LAYOUT_SEED_TIMEOUT)
+		return positions
+
+	@staticmethod
+	def _layout_suffix(filter_key):
+		return f"layout:{filter_key}" if filter_key is not None else "layout:full"
+
+	def _layout_key(self, filter_key, version):
+		return self._cache_key(self._layout_suffix(filter_key), version=version)
+
+	def _start_layout(self, graph, filter_key, version):
+		"""Queue one layout for the background worker, unless it is already queued.
+
+		Stored under the version the graph was read at, so a layout that
+		finishes after an edit can never be served for the newer graph.
+		"""
+		global _layout_worker
+		if not settings.CONNECTIONS_LAYOUT_IN_BACKGROUND:
+			return
+		cache_key = self._layout_key(filter_key, version)
+		with _layouts_lock:
+			if cache_key in _layouts_queued:
+				return
+			try:
+				_layout_queue.put_nowait((cache_key, lambda: self.compute_layout(graph, filter_key, version)))
+			except queue.Full:
+				return
+			_layouts_queued.add(cache_key)
+			if _layout_worker is None or not _layout_worker.is_alive():
+				_layout_worker = threading.Thread(target=_run_layouts, name="connections-layout", daemon=True)
+				_layout_worker.start()
 
-		if status:
-			queryset = queryset.filter(status__in=status)
+	@classmethod
+	def _character_details_key(cls, character_id):
+		return f"{cls.CACHE_PREFIX}:character-details:{character_id}"
 
-		if earth:
-			queryset = queryset.filter(earth_number__number__in=earth)
+	@classmethod
+	def invalidate_character_details(cls, character_ids):
+		"""Drop the cached detail payloads of `character_ids`.
 
-		if team:
-			team_memberships = TeamMembership.objects.filter(character_id=OuterRef("pk"), team_id__in=team)
-			queryset = queryset.filter(Exists(team_memberships))
+		They are dropped now and again once the transaction commits, since a
+		concurrent request can cache the old rows in between.
+		"""
+		character_ids = set(character_ids)
+		if not character_ids:
+			return
+		if defer(
+			f"{cls.CACHE_PREFIX}:character-details",
+			cls.invalidate_character_details,
+			items=character_ids,
+		):
+			return
+		keys = [cls._character_details_key(character_id) for character_id in character_ids]
+		cache.delete_many(keys)
+		transaction.on_commit(lambda: cache.delete_many(keys))
 
-		if movie:
-			movie_memberships = Movie.characters.through.objects.filter(character_id=OuterRef("pk"), movie_id__in=movie)
-			queryset = queryset.filter(Exists(movie_memberships))
+	def character_detail_payloads(self, character_ids):
+		"""{id: detail payload} for the existing characters among `character_ids`.
 
-		return queryset.order_by("name")
+		Payloads are cached per character outside the graph version, so an
+		edit only costs a rebuild for the characters it touched (see signals).
+		"""
+		keys = {character_id: self._character_details_key(character_id) for character_id in character_ids}
+		cached = cache.get_many(keys.values())
+		payloads = {character_id: cached[key] for character_id, key in keys.items() if key in cached}
+
+		missing = [character_id for character_id in keys if character_id not in payloads]
+		if missing:
+			built = {
+				character.id: {"id": character.id, "name": character.name, **self._character_detail_payload(character)}
+				for character in self._character_detail_queryset(Character.objects.filter(pk__in=missing))
+			}
+			cache.set_many(
+				{keys[character_id]: payload for character_id, payload in built.items()},
+				self.CHARACTER_DETAILS_TIMEOUT,
+			)
+			payloads.update(built)
+		return payloads
 
 	def character_detail_payload(self, character_id):
-		character = self._character_detail_queryset(Character.objects.filter(pk=character_id)).first()
-		if character is None:
-			return None
+		return self.character_detail_payloads([character_id]).get(character_id)
 
-		return {
-			"id": character.id,
-			"name": character.name,
-			"status": character.status or "Unknown",
-			"status_label": character.get_status_display() if character.status else "Unknown",
-			"earth": character.earth_number.number if character.earth_number else None,
-			"aliases": [alter_ego.name for alter_ego in character.alter_egos.all()],
-			"teams": [
-				{
-					"name": membership.team.name,
-					"status": "Current" if membership.is_current_member else "Former",
-				}
-				for membership in character.team_memberships.all()
-			],
-			"movies": [
-				{
-					"id": movie.id,
-					"title": movie.title,
-					"year": movie.release_date.year,
-				}
-				for movie in character.movies.all()
-			],
-		}
-
-	def to_cytoscape_format(self, graph, characters=None, include_details=True):
+	def to_cytoscape_format(self, graph, characters=None, include_details=True, positions=None):
 		character_lookup = {}
 		if characters is not None:
 			for character in characters:
@@ -561,6 +1272,10 @@ class MCUGraphService:
 			for character in self._character_detail_queryset(Character.objects.filter(pk__in=missing_ids)):
 				character_lookup[character.id] = character
 
+		photo_urls = self._photo_urls(
+			character_lookup[node_id].photo_path for node_id in graph.nodes if node_id in character_lookup
+		)
+
 		nodes = []
 		for node_id in sorted(graph.nodes):
 			node_data = dict(graph.nodes[node_id])
@@ -577,7 +1292,7 @@ class MCUGraphService:
 			if character is not None:
 				alignment = character.alignment
 				status = character.status
-				photo_url = self._photo_url(character.photo_path)
+				photo_url = photo_urls[character.photo_path]
 				details = self._character_detail_payload(character) if include_details else None
 			else:
 				details = node_data.get("details") if include_details else None
@@ -603,7 +1318,11 @@ class MCUGraphService:
 			if status:
 				classes.append(str(status).lower())
 
-			nodes.append({"data": node_payload, "classes": " ".join(classes)})
+			node_element = {"data": node_payload, "classes": " ".join(classes)}
+			if positions is not None and node_id in positions:
+				x, y = positions[node_id]
+				node_element["position"] = {"x": x, "y": y}
+			nodes.append(node_element)
 
 		edges = []
 		for source_id, target_id, edge_data in sorted(graph.edges(data=True)):
@@ -0,0 +1,562 @@
+"""Compact, read-only snapshot of the MCU relationship graph.
+
+The full graph used to be cached as a networkx DiGraph: a dict per node, a dict
+per edge and a dict per relationship segment, all of it pickled into the cache
+and copied again on every read. A snapshot keeps the same information in flat
+int32 arrays laid out CSR-style (compressed sparse rows):
+
+- `node_ids` is the sorted character ids. Everything else refers to a node by
+  its index into this array.
+- `out_offsets` / `out_targets` list each node's stored edges, in their stored
+  orientation, so `out_targets[out_offsets[i]:out_offsets[i + 1]]` are the
+  targets of node i. An edge is identified by its index into `out_targets`.
+- Per edge: its representative type code, lowest weight and directional flag,
+  plus `segment_offsets` into one row per relationship type on that pair (the
+  lines Cytoscape draws), each with its own weight, direction and relationship
+  ids.
+- `adjacency_offsets` / `adjacency` / `adjacency_weights` walk every edge both
+  ways. Direction only matters for display, so this is what paths search.
+- `node_attrs` is the side table of display fields, one tuple per node.
+- `component_ids` labels each node's connected component, so "is there any
+  path at all" is one comparison.
+
+It pickles to a few flat buffers, and since it is never mutated it can be
+shared between requests without copying. `nodes`, `edges()`, `has_edge()` and
+`graph[u][v]` behave like the DiGraph read API, so `to_cytoscape_format` and
+anything else written against a DiGraph can take either.
+"""
+
+from array import array
+from bisect import bisect_left
+from heapq import heappop, heappush
+from itertools import pairwise
+
+import networkx as nx
+
+from .models import Relationship
+
+RELATIONSHIP_TYPES = tuple(value for value, _label in Relationship.RELATIONSHIP_CHOICES)
+
+# Order of the values in each node_attrs tuple. "label" mirrors "name".
+NODE_FIELDS = (
+	"name",
+	"alignment",
+	"status",
+	"earth",
+	"phase_introduced",
+	"movie_introduced_id",
+	"photo_url",
+)
+
+
+class _NodeView:
+	"""`graph.nodes`: iterate ids, test membership, or index for attributes."""
+
+	__slots__ = ("_snapshot",)
+
+	def __init__(self, snapshot):
+		self._snapshot = snapshot
+
+	def __iter__(self):
+		return iter(self._snapshot.node_ids)
+
+	def __len__(self):
+		return len(self._snapshot.node_ids)
+
+	def __contains__(self, node_id):
+		return self._snapshot.index_of(node_id) is not None
+
+	def __getitem__(self, node_id):
+		index = self._snapshot.index_of(node_id)
+		if index is None:
+			raise KeyError(node_id)
+		return self._snapshot.node_data(index)
+
+
+class GraphSnapshot:
+	"""Immutable CSR graph of characters and their relationships."""
+
+	__slots__ = (
+		"type_names",
+		"node_ids",
+		"node_attrs",
+		"node_details",
+		"out_offsets",
+		"out_targets",
+		"edge_types",
+		"edge_weights",
+		"edge_directional",
+		"segment_offsets",
+		"segment_types",
+		"segment_weights",
+		"segment_directional",
+		"relationship_offsets",
+		"relationship_ids",
+		"adjacency_offsets",
+		"adjacency",
+		"adjacency_weights",
+		"component_ids",
+	)
+
+	def __getstate__(self):
+		return {name: getattr(self, name) for name in self.__slots__}
+
+	def __setstate__(self, state):
+		for name, value in state.items():
+			setattr(self, name, value)
+
+	@classmethod
+	def build(cls, nodes, relationships):
+		"""Build a snapshot from node attributes and relationship rows.
+
+		`nodes` maps character id to the attribute dict from
+		MCUGraphService._character_node_data. `relationships` yields
+		(relationship_id, source_id, target_id, relationship_type, weight,
+		directional) tuples; both ends must be in `nodes`.
+		"""
+		type_names = list(RELATIONSHIP_TYPES)
+		type_codes = {name: code for code, name in enumerate(type_names)}
+
+		node_ids = sorted(nodes)
+		position = {node_id: index for index, node_id in enumerate(node_ids)}
+
+		# (source index, target index) -> {type code: [relationship ids, weight, directional]},
+		# plus the type of the oldest relationship on the pair as its
+		# representative, so the result never depends on row order.
+		pairs = {}
+		for relationship_id, source_id, target_id, relationship_type, weight, directional in relationships:
+			if relationship_type not in type_codes:
+				type_codes[relationship_type] = len(type_names)
+				type_names.append(relationship_type)
+			code = type_codes[relationship_type]
+
+			pair = pairs.setdefault((position[source_id], position[target_id]), {"type": None, "segments": {}})
+			if pair["type"] is None or relationship_id < pair["type"][0]:
+				pair["type"] = (relationship_id, code)
+			segment = pair["segments"].setdefault(code, [set(), weight, False])
+			segment[0].add(relationship_id)
+			segment[1] = min(segment[1], weight)
+			segment[2] = segment[2] or bool(directional)
+
+		snapshot = cls()
+		snapshot.type_names = tuple(type_names)
+		snapshot.node_ids = array("i", node_ids)
+		snapshot.node_attrs = tuple(
+			tuple(nodes[node_id].get(field) for field in NODE_FIELDS)
+			for node_id in node_ids
+		)
+		details = tuple(nodes[node_id].get("details") for node_id in node_ids)
+		snapshot.node_details = details if any(detail is not None for detail in details) else None
+
+		snapshot.out_offsets = array("i", [0])
+		snapshot.out_targets = array("i")
+		snapshot.edge_types = array("b")
+		snapshot.edge_weights = array("i")
+		snapshot.edge_directional = array("b")
+		snapshot.segment_offsets = array("i", [0])
+		snapshot.segment_types = array("b")
+		snapshot.segment_weights = array("i")
+		snapshot.segment_directional = array("b")
+		snapshot.relationship_offsets = array("i", [0])
+		snapshot.relationship_ids = array("i")
+
+		undirected = [{} for _ in node_ids]
+		ordered_pairs = sorted(pairs.items())
+		next_pair = 0
+		for source in range(len(node_ids)):
+			while next_pair < len(ordered_pairs) and ordered_pairs[next_pair][0][0] == source:
+				(_, target), pair = ordered_pairs[next_pair]
+				next_pair += 1
+
+				segments = sorted(pair["segments"].items())
+				weight = min(segment[1] for _, segment in segments)
+				snapshot.out_targets.append(target)
+				snapshot.edge_types.append(pair["type"][1])
+				snapshot.edge_weights.append(weight)
+				snapshot.edge_directional.append(any(segment[2] for _, segment in segments))
+				for code, (relationship_ids, segment_weight, segment_directional) in segments:
+					snapshot.segment_types.append(code)
+					snapshot.segment_weights.append(segment_weight)
+					snapshot.segment_directional.append(segment_directional)
+					snapshot.relationship_ids.extend(sorted(relationship_ids))
+					snapshot.relationship_offsets.append(len(snapshot.relationship_ids))
+				snapshot.segment_offsets.append(len(snapshot.segment_types))
+
+				for node, neighbor in ((source, target), (target, source)):
+					undirected[node][neighbor] = min(undirected[node].get(neighbor, weight), weight)
+			snapshot.out_offsets.append(len(snapshot.out_targets))
+
+		snapshot.adjacency_offsets = array("i", [0])
+		snapshot.adjacency = array("i")
+		snapshot.adjacency_weights = array("i")
+		for linked in undirected:
+			for neighbor, weight in sorted(linked.items()):
+				snapshot.adjacency.append(neighbor)
+				snapshot.adjacency_weights.append(weight)
+			snapshot.adjacency_offsets.append(len(snapshot.adjacency))
+
+		snapshot.component_ids = snapshot._label_components()
+		return snapshot
+
+	def _label_components(self):
+		"""Connected component per node, numbered in order of each component's lowest index."""
+		labels = array("i", [-1]) * len(self.node_ids)
+		label = 0
+		for start in range(len(self.node_ids)):
+			if labels[start] != -1:
+				continue
+			labels[start] = label
+			stack = [start]
+			while stack:
+				node = stack.pop()
+				for position in range(self.adjacency_offsets[node], self.adjacency_offsets[node + 1]):
+					neighbor = self.adjacency[position]
+					if labels[neighbor] == -1:
+						labels[neighbor] = label
+						stack.append(neighbor)
+			label += 1
+		return labels
+
+	# ----------------------------------------------------------------------
+	# Index-level access
+	# ----------------------------------------------------------------------
+
+	def index_of(self, node_id):
+		"""Position of `node_id` in node_ids, or None when it is not in the graph."""
+		try:
+			node_id = int(node_id)
+		except (TypeError, ValueError):
+			return None
+		index = bisect_left(self.node_ids, node_id)
+		if index < len(self.node_ids) and self.node_ids[index] == node_id:
+			return index
+		return None
+
+	def node_data(self, index):
+		data = dict(zip(NODE_FIELDS, self.node_attrs[index]))
+		data["id"] = self.node_ids[index]
+		data["label"] = data["name"]
+		if self.node_details is not None and self.node_details[index] is not None:
+			data["details"] = self.node_details[index]
+		return data
+
+	def edge_index(self, source, target):
+		"""Index of the stored edge source -> target (node indices), or None."""
+		start, end = self.out_offsets[source], self.out_offsets[source + 1]
+		position = bisect_left(self.out_targets, target, start, end)
+		if position < end and self.out_targets[position] == target:
+			return position
+		return None
+
+	def edge_source(self, edge):
+		"""Node index an edge is stored from. Edges are grouped by source."""
+		return bisect_left(self.out_offsets, edge + 1) - 1
+
+	def edge_segments(self, edge):
+		"""(relationship_type, segment) pairs for one edge, sorted by type code."""
+		segments = []
+		for segment in range(self.segment_offsets[edge], self.segment_offsets[edge + 1]):
+			segments.append(
+				(
+					self.type_names[self.segment_types[segment]],
+					{
+						"relationship_ids": list(
+							self.relationship_ids[self.relationship_offsets[segment]:self.relationship_offsets[segment + 1]]
+						),
+						"weight": self.segment_weights[segment],
+						"directional": bool(self.segment_directional[segment]),
+					},
+				)
+			)
+		return segments
+
+	def edge_data(self, edge, source=None):
+		"""The edge's attributes in the same shape the DiGraph used to carry."""
+		if source is None:
+			source = self.edge_source(edge)
+		segments = self.edge_segments(edge)
+		relationship_ids = sorted(
+			relationship_id for _, segment in segments for relationship_id in segment["relationship_ids"]
+		)
+		return {
+			"source": self.node_ids[source],
+			"target": self.node_ids[self.out_targets[edge]],
+			"relationship_type": self.type_names[self.edge_types[edge]],
+			"relationship_types": [relationship_type for relationship_type, _ in segments],
+			"relationship_ids": relationship_ids,
+			"weight": self.edge_weights[edge],
+			"directional": bool(self.edge_directional[edge]),
+			"relationship_segments": dict(segments),
+		}
+
+	def neighbors(self, index):
+		"""(neighbor index, weight) pairs, walking edges in both directions."""
+		start, end = self.adjacency_offsets[index], self.adjacency_offsets[index + 1]
+		return zip(self.adjacency[start:end], self.adjacency_weights[start:end])
+
+	def shortest_path_tree(self, source):
+		"""Fewest-hops, then lowest-weight, shortest-path tree from one node.
+
+		Breadth-first, one layer per hop, so the first layer a node appears in is
+		its fewest-hops distance. Inside a layer the predecessor with the lowest
+		accumulated weight wins, ties going to the lower index. Returns an array
+		of predecessor indices: the source points at itself and unreachable nodes
+		hold -1.
+		"""
+		predecessors = array("i", [-1]) * len(self.node_ids)
+		costs = {source: 0}
+		predecessors[source] = source
+		frontier = [source]
+		while frontier:
+			layer = {}
+			for node in frontier:
+				cost = costs[node]
+				start, end = self.adjacency_offsets[node], self.adjacency_offsets[node + 1]
+				for position in range(start, end):
+					neighbor = self.adjacency[position]
+					if predecessors[neighbor] != -1:
+						continue
+					candidate = (cost + self.adjacency_weights[position], node)
+					if neighbor not in layer or candidate < layer[neighbor]:
+						layer[neighbor] = candidate
+			for neighbor, (cost, predecessor) in layer.items():
+				predecessors[neighbor] = predecessor
+				costs[neighbor] = cost
+			frontier = sorted(layer)
+		return predecessors
+
+	def link_weight(self, node, neighbor):
+		"""Traversal weight between two adjacent nodes, or None if they are not linked."""
+		start, end = self.adjacency_offsets[node], self.adjacency_offsets[node + 1]
+		position = bisect_left(self.adjacency, neighbor, start, end)
+		if position < end and self.adjacency[position] == neighbor:
+			return self.adjacency_weights[position]
+		return None
+
+	def path_cost(self, path):
+		"""(hops, weight) of a path of node indices."""
+		return len(path) - 1, sum(self.link_weight(node, neighbor) for node, neighbor in pairwise(path))
+
+	def cheapest_path(self, source, target, banned_nodes=(), banned_links=()):
+		"""Fewest-hops, then lowest-weight, path avoiding some nodes and links.
+
+		`banned_links` holds (node, neighbor) pairs, blocked in both directions.
+		Returns a list of node indices, or None when no such path exists.
+		"""
+		best = {source: (0, 0)}
+		predecessors = {source: source}
+		heap = [(0, 0, source)]
+		while heap:
+			hops, weight, node = heappop(heap)
+			if node == target:
+				path = [target]
+				while path[-1] != source:
+					path.append(predecessors[path[-1]])
+				return path[::-1]
+			if (hops, weight) > best[node]:
+				continue
+			start, end = self.adjacency_offsets[node], self.adjacency_offsets[node + 1]
+			for position in range(start, end):
+				neighbor = self.adjacency[position]
+				if neighbor in banned_nodes or (node, neighbor) in banned_links or (neighbor, node) in banned_links:
+					continue
+				candidate = (hops + 1, weight + self.adjacency_weights[position])
+				if neighbor not in best or candidate < best[neighbor]:
+					best[neighbor] = candidate
+					predecessors[neighbor] = node
+					heappush(heap, (*candidate, neighbor))
+		return None
+
+	def k_shortest_paths(self, source, target, k, first=None):
+		"""Up to k loopless paths from source to target, cheapest first (Yen's algorithm).
+
+		Costs rank like shortest_path_tree: fewest hops, then lowest weight.
+		`first` is the best path when the caller already has it (e.g. from a
+		cached tree), so the ranking starts from exactly that path.
+		"""
+		first = first or self.cheapest_path(source, target)
+		if first is None or k < 1:
+			return []
+
+		accepted = [list(first)]
+		seen = {tuple(first)}
+		candidates = []
+		while len(accepted) < k:
+			previous = accepted[-1]
+			for spur_position in range(len(previous) - 1):
+				root = previous[:spur_position + 1]
+				banned_links = {
+					(path[spur_position], path[spur_position + 1])
+					for path in accepted
+					if len(path) > spur_position + 1 and path[:spur_position + 1] == root
+				}
+				spur = self.cheapest_path(root[-1], target, banned_nodes=set(root[:-1]), banned_links=banned_links)
+				if spur is None:
+					continue
+				path = root[:-1] + spur
+				if tuple(path) not in seen:
+					seen.add(tuple(path))
+					heappush(candidates, (self.path_cost(path), path))
+			if not candidates:
+				break
+			accepted.append(heappop(candidates)[1])
+		return accepted
+
+	def _edge_rows(self, source, edge):
+		source_id = self.node_ids[source]
+		target_id = self.node_ids[self.out_targets[edge]]
+		for segment in range(self.segment_offsets[edge], self.segment_offsets[edge + 1]):
+			relationship_type = self.type_names[self.segment_types[segment]]
+			for position in range(self.relationship_offsets[segment], self.relationship_offsets[segment + 1]):
+				yield (
+					self.relationship_ids[position],
+					source_id,
+					target_id,
+					relationship_type,
+					self.segment_weights[segment],
+					bool(self.segment_directional[segment]),
+				)
+
+	def pair_rows(self, source_id, target_id):
+		"""Rows stored on the edge between two characters, in either direction."""
+		source, target = self.index_of(source_id), self.index_of(target_id)
+		if source is None or target is None:
+			return []
+		rows = []
+		for start, end in ((source, target), (target, source)):
+			edge = self.edge_index(start, end)
+			if edge is not None:
+				rows.extend(self._edge_rows(start, edge))
+		return rows
+
+	def rows(self):
+		"""The relationship rows this snapshot was built from, as passed to build()."""
+		for source in range(len(self.node_ids)):
+			for edge in range(self.out_offsets[source], self.out_offsets[source + 1]):
+				yield from self._edge_rows(source, edge)
+
+	def subgraph(self, indices):
+		"""A new snapshot of just these node indices and the edges among them."""
+		selected = set(indices)
+		rows = []
+		for source in sorted(selected):
+			for edge in range(self.out_offsets[source], self.out_offsets[source + 1]):
+				if self.out_targets[edge] in selected:
+					rows.extend(self._edge_rows(source, edge))
+		return GraphSnapshot.build({self.node_ids[index]: self.node_data(index) for index in selected}, rows)
+
+	def neighborhood(self, index, radius, limit=None):
+		"""Node indices within `radius` hops of `index`, nearest first.
+
+		Each hop layer is ordered by its lightest link back into the layer
+		before it, so with a `limit` the closest relationships are kept.
+		Returns (indices, truncated), truncated saying the limit cut off
+		nodes inside the radius.
+		"""
+		selected = [index]
+		seen = {index}
+		frontier = [index]
+		for _ in range(radius):
+			layer = {}
+			for node in frontier:
+				for neighbor, weight in self.neighbors(node):
+					if neighbor not in seen and weight < layer.get(neighbor, weight + 1):
+						layer[neighbor] = weight
+			if not layer:
+				break
+			frontier = sorted(layer, key=lambda neighbor: (layer[neighbor], neighbor))
+			seen.update(frontier)
+			selected.extend(frontier)
+			if limit is not None and len(selected) > limit:
+				return selected[:limit], True
+		return selected, False
+
+	def patched(self, remove_relationship_ids=(), add_relationships=(), nodes=None):
+		"""A new snapshot with relationships removed or added and node attributes replaced.
+
+		`nodes` maps character id to a replacement attribute dict, and must cover
+		any character that `add_relationships` brings into the graph. Characters
+		left with no relationships are dropped, as a fresh build of the full
+		graph would drop them. The unique (character1, character2, type)
+		constraint means each segment holds exactly one relationship, so the
+		rows read back out are exactly the ones the snapshot was built from.
+		"""
+		removed = set(remove_relationship_ids)
+		attributes = {node_id: self.node_data(index) for index, node_id in enumerate(self.node_ids)}
+		attributes.update(nodes or {})
+
+		rows = [row for row in self.rows() if row[0] not in removed]
+		rows.extend(add_relationships)
+		referenced = {row[1] for row in rows} | {row[2] for row in rows}
+		return GraphSnapshot.build({node_id: attributes[node_id] for node_id in referenced}, rows)
+
+	def component(self, index):
+		"""Indices of every node reachable from `index`, itself included."""
+		label = self.component_ids[index]
+		return {node for node, node_label in enumerate(self.component_ids) if node_label == label}
+
+	def connected(self, source, target):
+		"""Whether any path joins two nodes. Constant time, from the component labels."""
+		return self.component_ids[source] == self.component_ids[target]
+
+	# ----------------------------------------------------------------------
+	# DiGraph-compatible read API
+	# ----------------------------------------------------------------------
+
+	@property
+	def nodes(self):
+		return _NodeView(self)
+
+	def __iter__(self):
+		return iter(self.node_ids)
+
+	def __len__(self):
+		return len(self.node_ids)
+
+	def __contains__(self, node_id):
+		return self.index_of(node_id) is not None
+
+	def __getitem__(self, node_id):
+		"""`graph[u]`: {target id: edge data} for u's stored out-edges."""
+		source = self.index_of(node_id)
+		if source is None:
+			raise KeyError(node_id)
+		return {
+			self.node_ids[self.out_targets[edge]]: self.edge_data(edge, source)
+			for edge in range(self.out_offsets[source], self.out_offsets[source + 1])
+		}
+
+	def has_node(self, node_id):
+		return node_id in self
+
+	def has_edge(self, source_id, target_id):
+		source, target = self.index_of(source_id), self.index_of(target_id)
+		if source is None or target is None:
+			return False
+		return self.edge_index(source, target) is not None
+
+	def number_of_nodes(self):
+		return len(self.node_ids)
+
+	def number_of_edges(self):
+		return len(self.out_targets)
+
+	def edges(self, data=False):
+		"""Stored edges as (source id, target id[, data]), sorted by ids."""
+		for source in range(len(self.node_ids)):
+			source_id = self.node_ids[source]
+			for edge in range(self.out_offsets[source], self.out_offsets[source + 1]):
+				target_id = self.node_ids[self.out_targets[edge]]
+				if data:
+					yield source_id, target_id, self.edge_data(edge, source)
+				else:
+					yield source_id, target_id
+
+	def to_networkx(self):
+		"""A mutable DiGraph copy, for anything that needs to edit the graph."""
+		graph = nx.DiGraph()
+		for index, node_id in enumerate(self.node_ids):
+			graph.add_node(node_id, **self.node_data(index))
+		for source_id, target_id, edge_data in self.edges(data=True):
+			graph.add_edge(source_id, target_id, **edge_data)
+		return graph
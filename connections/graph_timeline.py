@@ -0,0 +1,88 @@
+"""Release-order timeline of the graph, for spoiler-free "as of" views.
+
+A character becomes known on the release date of their first appearance:
+the movie that introduced them or the earliest movie they appear in. As of a
+date, the graph holds the relationships whose two characters are both known by
+then. Characters with no dated appearance never show up in an as-of view.
+
+`GraphTimeline` lays the full graph's relationship rows out once, in the order
+they become visible, with an offset per first-appearance date. The graph as of
+a date is a prefix of that log: the graph as of the previous date plus the
+rows that date adds. Every date shares the one log, so a snapshot is built by
+slicing it, with no query and no filtering, and snapshots are only built for
+the dates someone asks about.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+
+from .graph_snapshot import GraphSnapshot
+
+
+@dataclass(frozen=True)
+class GraphTimeline:
+	"""Relationship rows in release order. Build with `build()`."""
+
+	# movie id -> release date
+	movie_dates: dict = field(default_factory=dict)
+	# Distinct first-appearance dates, ascending.
+	dates: tuple = ()
+	# rows[:row_offsets[i + 1]] are visible as of dates[i]; row_offsets[0] is 0.
+	row_offsets: tuple = (0,)
+	rows: tuple = ()
+	# character id -> node attributes, for every character in `rows`.
+	nodes: dict = field(default_factory=dict)
+
+	@classmethod
+	def build(cls, graph, movie_dates, appearances):
+		"""Lay out `graph`'s rows by when both of their characters are known.
+
+		`appearances` yields (character id, release date) for each movie a
+		character is introduced in or appears in; the earliest one counts.
+		"""
+		first_seen = {}
+		for character_id, release_date in appearances:
+			if release_date is not None and (character_id not in first_seen or release_date < first_seen[character_id]):
+				first_seen[character_id] = release_date
+
+		dated_rows = []
+		for row in graph.rows():
+			if row[1] in first_seen and row[2] in first_seen:
+				dated_rows.append((max(first_seen[row[1]], first_seen[row[2]]), row))
+		dated_rows.sort()
+
+		dates = sorted({release_date for release_date, _ in dated_rows})
+		row_offsets = [0]
+		position = 0
+		for release_date in dates:
+			while position < len(dated_rows) and dated_rows[position][0] == release_date:
+				position += 1
+			row_offsets.append(position)
+
+		rows = tuple(row for _, row in dated_rows)
+		node_ids = {row[1] for row in rows} | {row[2] for row in rows}
+		return cls(
+			movie_dates=dict(movie_dates),
+			dates=tuple(dates),
+			row_offsets=tuple(row_offsets),
+			rows=rows,
+			nodes={node_id: graph.nodes[node_id] for node_id in node_ids},
+		)
+
+	def cutoff(self, as_of):
+		"""The latest timeline date on or before `as_of`, or None when nothing is visible yet.
+
+		Every date between two cutoffs shows the same graph, so results are
+		keyed by the cutoff rather than by the date asked for.
+		"""
+		position = bisect_right(self.dates, as_of)
+		return self.dates[position - 1] if position else None
+
+	def rows_as_of(self, as_of):
+		return self.rows[:self.row_offsets[bisect_right(self.dates, as_of)]]
+
+	def snapshot(self, as_of):
+		"""The graph as of `as_of` (None for the empty graph before any release)."""
+		rows = self.rows_as_of(as_of) if as_of is not None else ()
+		node_ids = {row[1] for row in rows} | {row[2] for row in rows}
+		return GraphSnapshot.build({node_id: self.nodes[node_id] for node_id in node_ids}, rows)
@@ -0,0 +1,86 @@
+"""Batch the cache invalidations of a multi-row write into one per cache.
+
+Every save and m2m change fires a signal that bumps or patches a cache, so a
+command or admin action touching fifty rows moved each version fifty times,
+and a visitor arriving in between paid for a rebuild that was about to be
+thrown away.
+
+Inside `deferred_invalidation()` the services hold their invalidations and
+run them once the outermost block exits, one per cache namespace. A namespace
+touched by a single edit replays that edit unchanged, so one saved
+relationship is still patched into the cached graph instead of forcing a cold
+rebuild; a namespace touched more than once gets one plain invalidation.
+
+	with deferred_invalidation():
+		for entry in entries:
+			entry.save()
+
+It also works as a decorator, `@deferred_invalidation()`.
+"""
+
+import threading
+from contextlib import contextmanager
+
+_state = threading.local()
+
+
+class _Held:
+	"""What one namespace has been asked to do so far in the current block."""
+
+	def __init__(self, collapse):
+		self.collapse = collapse
+		self.actions = []
+		self.items = set()
+
+	def run(self):
+		if len(self.actions) == 1 and self.actions[0] is not None:
+			self.actions[0]()
+		else:
+			self.collapse(self.items)
+
+
+@contextmanager
+def deferred_invalidation():
+	"""Hold every cache invalidation in the block and run each namespace once at exit.
+
+	Nested blocks join the outermost one. Held invalidations run even when the
+	block raises, since some of its writes may already be saved.
+	"""
+	if getattr(_state, "held", None) is not None:
+		yield
+		return
+
+	_state.held = {}
+	try:
+		yield
+	finally:
+		held, _state.held = _state.held, None
+		for namespace in held.values():
+			namespace.run()
+
+
+def defer(namespace, collapse, action=None, items=()):
+	"""Hold one invalidation of `namespace`; False (nothing held) outside a block.
+
+	`action` replays this exact invalidation and is what runs when it turns
+	out to be the namespace's only one. Otherwise `collapse(items)` runs once
+	with the items of every call for the namespace. Leave `action` out when
+	collapsing is always right.
+	"""
+	held = getattr(_state, "held", None)
+	if held is None:
+		return False
+	entry = held.setdefault(namespace, _Held(collapse))
+	entry.actions.append(action)
+	entry.items.update(items)
+	return True
+
+
+def held(namespace):
+	"""Whether an invalidation of `namespace` is being held right now.
+
+	A cache read inside the block can be stale for such a namespace, so
+	readers that must see their own writes check this first.
+	"""
+	held_namespaces = getattr(_state, "held", None)
+	return held_namespaces is not None and namespace in held_namespaces
@@ -0,0 +1,98 @@
+'''
+File: benchmark_watch_order.py
+Project: rzierke-site
+Description: Time the watch-order payload build against a synthetic chart, so
+a change to the serializer can be measured at a realistic scale rather than on
+the handful of rows in a dev database. The chart is written inside a
+transaction that is rolled back, so nothing is left behind:
+
+	uv run python manage.py benchmark_watch_order
+	uv run python manage.py benchmark_watch_order --entries 2000 --collections 50 --repeat 10
+'''
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from connections.models import POSITION_GAP, WatchCollection, WatchEntry, WatchTrack
+from connections.watch_order_service import WatchOrderService
+
+
+class Command(BaseCommand):
+	help = "Time WatchOrderService payload builds over a synthetic chart (rolled back afterwards)."
+
+	def add_arguments(self, parser):
+		parser.add_argument("--entries", type=int, default=2000, help="Entries in the chart (default 2000).")
+		parser.add_argument("--collections", type=int, default=50, help="Collections (default 50).")
+		parser.add_argument("--tracks", type=int, default=12, help="Tracks the entries are spread over (default 12).")
+		parser.add_argument(
+			"--memberships",
+			type=int,
+			default=4,
+			help="Collections each entry belongs to (default 4).",
+		)
+		parser.add_argument("--repeat", type=int, default=5, help="Timed builds; the median is reported (default 5).")
+		parser.add_argument("--seed", type=int, default=0)
+
+	def handle(self, *args, **options):
+		with transaction.atomic():
+			self._populate(options)
+			service = WatchOrderService()
+			timings = []
+			for _ in range(options["repeat"]):
+				with CaptureQueriesContext(connection) as queries:
+					started = time.perf_counter()
+					service._serialize()
+					timings.append(time.perf_counter() - started)
+			transaction.set_rollback(True)
+
+		self.stdout.write(
+			f"{options['entries']} entries, {options['collections']} collections, "
+			f"{options['memberships']} memberships each: "
+			f"median {statistics.median(timings) * 1000:.1f} ms over {len(timings)} build(s), "
+			f"{len(queries)} queries per build."
+		)
+
+	def _populate(self, options):
+		rng = random.Random(options["seed"])
+		tracks = WatchTrack.objects.bulk_create(
+			WatchTrack(name=f"Benchmark track {index}", slug=f"benchmark-track-{index}", lane_order=1000 + index)
+			for index in range(options["tracks"])
+		)
+		collections = WatchCollection.objects.bulk_create(
+			WatchCollection(name=f"Benchmark collection {index}", slug=f"benchmark-collection-{index}")
+			for index in range(options["collections"])
+		)
+		entries = WatchEntry.objects.bulk_create(
+			WatchEntry(
+				track=tracks[index % len(tracks)],
+				title=f"Benchmark entry {index}",
+				slug=f"benchmark-entry-{index}",
+				position=POSITION_GAP * (index // len(tracks) + 1),
+			)
+			for index in range(options["entries"])
+		)
+
+		memberships = WatchEntry.collections.through
+		memberships.objects.bulk_create(
+			memberships(watchentry_id=entry.pk, watchcollection_id=collection.pk)
+			for entry in entries
+			for collection in rng.sample(collections, min(options["memberships"], len(collections)))
+		)
+
+		# About one merge per ten entries, always pointing forwards so the chart
+		# stays acyclic.
+		prerequisites = WatchEntry.prerequisites.through
+		links = {
+			(rng.randrange(index), index)
+			for index in range(1, len(entries))
+			if rng.random() < 0.1
+		}
+		prerequisites.objects.bulk_create(
+			prerequisites(from_watchentry_id=entries[entry].pk, to_watchentry_id=entries[prerequisite].pk)
+			for prerequisite, entry in links
+		)
@@ -12,6 +12,7 @@ anything entered by hand is safe. Needs TMDB_API_KEY in .env:
 from django.core.management.base import BaseCommand, CommandError
 
 from connections import tmdb
+from connections.invalidation import deferred_invalidation
 from connections.models import WatchEntry
 from connections.watch_order_service import WatchOrderService
 
@@ -35,6 +36,7 @@ class Command(BaseCommand):
 			help="Report what would change without saving.",
 		)
 
+	@deferred_invalidation()
 	def handle(self, *args, **options):
 		if not tmdb.is_configured():
 			raise CommandError(
@@ -14,6 +14,7 @@ pass --apply to write the unambiguous matches:
 
 from django.core.management.base import BaseCommand
 
+from connections.invalidation import deferred_invalidation
 from connections.models import WatchEntry
 from connections.poster_matching import (
 	POSTER_DIR,
@@ -35,6 +36,7 @@ class Command(BaseCommand):
 			help="Write the unambiguous matches to poster_path (default is a dry run).",
 		)
 
+	@deferred_invalidation()
 	def handle(self, *args, **options):
 		if not POSTER_DIR.is_dir():
 			self.stdout.write(self.style.ERROR(f"No poster directory at {POSTER_DIR}"))
@@ -0,0 +1,19 @@
+'''
+File: loaddata.py
+Project: rzierke-site
+Description: Django's loaddata, with the connections cache invalidations of
+every loaded row collapsed into one per cache. A fixture saves its rows one by
+one, and each raw save would otherwise bump the graph version on its own:
+
+	uv run python manage.py loaddata characters.json
+'''
+
+from django.core.management.commands.loaddata import Command as LoadDataCommand
+
+from connections.invalidation import deferred_invalidation
+
+
+class Command(LoadDataCommand):
+	@deferred_invalidation()
+	def handle(self, *fixture_labels, **options):
+		return super().handle(*fixture_labels, **options)
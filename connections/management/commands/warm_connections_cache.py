@@ -0,0 +1,51 @@
+'''
+File: warm_connections_cache.py
+Project: rzierke-site
+Description: Prebuild the connections caches -- the full graph payload, the
+watch-order payload, and the most requested filters and paths -- so the first
+visitors after a deploy or an edit don't pay for the cold build. Needs a shared
+cache backend: with the default per-process locmem cache it only fills its own
+cache and exits, and the web workers warm themselves at startup instead (see
+connections.cache_warming.warm_on_startup).
+
+	uv run python manage.py warm_connections_cache
+	uv run python manage.py warm_connections_cache --filters 20 --paths 50
+'''
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from connections.cache_warming import TOP_FILTERS, TOP_PATHS, warm_connections_cache
+
+
+class Command(BaseCommand):
+	help = "Prebuild the connections graph and watch-order caches."
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"--filters",
+			type=int,
+			default=TOP_FILTERS,
+			help=f"How many of the most requested filter combinations to warm (default {TOP_FILTERS}).",
+		)
+		parser.add_argument(
+			"--paths",
+			type=int,
+			default=TOP_PATHS,
+			help=f"How many of the most requested path queries to warm (default {TOP_PATHS}).",
+		)
+
+	def handle(self, *args, **options):
+		if settings.CACHES["default"]["BACKEND"] == "django.core.cache.backends.locmem.LocMemCache":
+			self.stderr.write(
+				self.style.WARNING(
+					"The default cache is per-process locmem, so this only warms this command's own "
+					"process. Web workers warm themselves at startup."
+				)
+			)
+		warmed = warm_connections_cache(filter_limit=options["filters"], path_limit=options["paths"])
+		self.stdout.write(
+			self.style.SUCCESS(
+				f"Warmed the graph and watch-order payloads, {warmed['filters']} filter(s) and {warmed['paths']} path(s)."
+			)
+		)
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-17 14:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from connections.watch_order_index import closure_pairs
+
+
+def fill_paths(apps, schema_editor):
+    WatchEntry = apps.get_model('connections', 'WatchEntry')
+    WatchPrerequisitePath = apps.get_model('connections', 'WatchPrerequisitePath')
+    links = WatchEntry.prerequisites.through.objects.values_list('to_watchentry_id', 'from_watchentry_id')
+    WatchPrerequisitePath.objects.bulk_create(
+        WatchPrerequisitePath(ancestor_id=ancestor_id, descendant_id=descendant_id)
+        for ancestor_id, descendant_id in closure_pairs(links)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('connections', '0014_remove_watchorderconfig_rows_per_column_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchPrerequisitePath',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='connections.watchentry')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='connections.watchentry')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='watchpath_descendant_ancestor')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_watch_prerequisite_path')],
+            },
+        ),
+        migrations.RunPython(fill_paths, reverse_code=migrations.RunPython.noop),
+    ]
@@ -11,7 +11,7 @@ Modified By: Reagan Zierke
 Description: <<description>>
 '''
 
-from decimal import Decimal
+from decimal import ROUND_DOWN, Decimal
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
@@ -153,13 +153,18 @@ class BulkAddConfig(models.Model):
 # --------------------------------------------------------------------------
 
 # Positions are sparse on purpose: new entries land on multiples of this gap so
-# there is always room to insert between two neighbours without renumbering
-# them. See next_position_after().
+# there is almost always room to insert between two neighbours without
+# renumbering them. See next_position_after().
 POSITION_GAP = Decimal('10')
 
 # Must match WatchEntry.position's decimal_places.
 POSITION_QUANTUM = Decimal('0.000001')
 
+# Narrowest spacing a local relabel may leave between neighbours: ten halvings
+# of POSITION_GAP, so the next run of inserts at the same spot is free again.
+# See _open_gap_after().
+MIN_RELABEL_SPACING = POSITION_GAP / 1024
+
 
 class WatchTrack(models.Model):
     """A lane in the watch-order chart, usually a studio or a spin-off branch."""
@@ -208,28 +213,23 @@ class WatchTrack(models.Model):
             seen.add(track.pk)
             track = track.continues_from
 
-    def column_root(self):
-        """The track at the head of this column.
+    def column_track_ids(self, columns=None):
+        """Ids of every track sharing this column, head first.
 
-        A column is a run of tracks joined by continues_from. Guarded against a
-        loop so a bad edit can never hang a page render.
+        `columns` is a TrackColumns an operation has already built; without
+        one, this builds it from one query over the tracks, however long the
+        chain. A continues_from loop, which clean() refuses, leaves each track
+        on it in a column of its own.
         """
-        seen = {self.pk}
-        track = self
-        while track.continues_from_id and track.continues_from_id not in seen:
-            track = track.continues_from
-            seen.add(track.pk)
-        return track
+        if columns is None:
+            columns = track_columns()
+        return columns.column_of(self.pk)
 
-    def column_tracks(self):
+    def column_tracks(self, columns=None):
         """Every track sharing this column, head first."""
-        chain, seen = [], set()
-        track = self.column_root()
-        while track is not None and track.pk not in seen:
-            chain.append(track)
-            seen.add(track.pk)
-            track = WatchTrack.objects.filter(continues_from=track).first()
-        return chain
+        track_ids = self.column_track_ids(columns)
+        tracks = WatchTrack.objects.in_bulk(track_ids)
+        return [tracks[track_id] for track_id in track_ids if track_id in tracks]
 
 
 class WatchCollection(models.Model):
@@ -334,6 +334,10 @@ class WatchEntry(models.Model):
             models.Index(fields=['track', 'position'], name='watchentry_track_position'),
         ]
 
+    # Set to an entry to have save() make room straight after it and take that
+    # spot, in the same transaction as the write. See make_room_after().
+    place_after = None
+
     def __str__(self):
         if self.release_year:
             return f"{self.title} ({self.release_year})"
@@ -342,9 +346,13 @@ class WatchEntry(models.Model):
     def save(self, *args, **kwargs):
         if self.poster_path and not self.poster_path.startswith('watch-order/'):
             self.poster_path = 'watch-order/' + self.poster_path
-        if self.position is None:
-            self.position = append_position(self.track)
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if self.place_after is not None:
+                self.position = make_room_after(self.place_after)
+                self.place_after = None
+            elif self.position is None:
+                self.position = append_position(self.track)
+            super().save(*args, **kwargs)
 
     @property
     def total_minutes(self):
@@ -371,6 +379,28 @@ class WatchProgress(models.Model):
         return f"{self.user} watched {self.entry.title}"
 
 
+class WatchPrerequisitePath(models.Model):
+    """One pair of entries joined by a chain of prerequisite links, ancestor first.
+
+    The transitive closure of WatchEntry.prerequisites, kept up to date by the
+    m2m signal in the same transaction as the link. See watch_order_index.
+    """
+
+    ancestor = models.ForeignKey(WatchEntry, on_delete=models.CASCADE, related_name='+')
+    descendant = models.ForeignKey(WatchEntry, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_watch_prerequisite_path')
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor'], name='watchpath_descendant_ancestor'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id}"
+
+
 class WatchOrderConfig(models.Model):
     """Singleton-ish display settings for the watch-order chart."""
 
@@ -395,7 +425,19 @@ class WatchOrderConfig(models.Model):
         return cls.objects.first() or cls()
 
 
-def column_entries(track):
+def track_columns():
+    """The current TrackColumns, from one query over the tracks.
+
+    Build it once per operation and pass it to the helpers below, which
+    otherwise build their own.
+    """
+    # Imported here: the column map is built from this module's models.
+    from .watch_order_columns import TrackColumns
+
+    return TrackColumns.build()
+
+
+def column_entries(track, columns=None):
     """Every entry in `track`'s column, whichever track inside it they belong to.
 
     Position is scoped to the column, not the track, so that two tracks sharing
@@ -403,42 +445,87 @@ def column_entries(track):
     Infinity Saga ones, which is the normal case for anything released out of
     story order.
     """
-    return WatchEntry.objects.filter(track__in=track.column_tracks())
+    return WatchEntry.objects.filter(track_id__in=track.column_track_ids(columns))
 
 
-def append_position(track):
+def append_position(track, columns=None):
     """Position that puts a new entry at the end of `track`'s column."""
-    last = column_entries(track).order_by('-position', '-pk').first()
+    last = column_entries(track, columns).order_by('-position', '-pk').first()
     if last is None:
         return POSITION_GAP
     return last.position + POSITION_GAP
 
 
-def next_position_after(entry):
+def next_position_after(entry, columns=None):
     """Position that places a new entry directly after `entry` in its column.
 
     Returns the midpoint between `entry` and whatever currently follows it, so
-    inserting never touches the neighbours. Appends past the end when `entry`
-    is last.
+    an insert normally never touches the neighbours. Appends past the end when
+    `entry` is last. When the six decimal places between the two are used up,
+    it is the position the entry gets once make_room_after() has spread out a
+    few of the following entries.
+
+    Read only, so it is safe to call while validating a form.
     """
-    following = (
-        column_entries(entry.track)
-        .filter(position__gt=entry.position)
-        .order_by('position', 'pk')
-        .first()
-    )
+    position, _relabelled = _plan_insert_after(entry, columns)
+    return position
+
+
+def make_room_after(entry, columns=None):
+    """Spread out the entries after `entry` if needed and return the new entry's position.
+
+    The writing half of next_position_after(). WatchEntry.save() calls it
+    inside the insert's own transaction, so a rejected or rolled-back save
+    leaves the neighbours alone.
+    """
+    position, relabelled = _plan_insert_after(entry, columns)
+    if relabelled:
+        WatchEntry.objects.bulk_update(relabelled, ['position'])
+    return position
+
+
+def _plan_insert_after(entry, columns=None):
+    """(position after `entry`, entries to relabel first, with their new positions set)."""
+    later = column_entries(entry.track, columns).filter(position__gt=entry.position).order_by('position', 'pk')
+    following = later.first()
     if following is None:
-        return entry.position + POSITION_GAP
+        return entry.position + POSITION_GAP, []
 
     midpoint = ((entry.position + following.position) / 2).quantize(POSITION_QUANTUM)
-    if midpoint <= entry.position or midpoint >= following.position:
-        # Six decimal places used up between these two neighbours. Renormalizing
-        # the column spreads everything back out to 10, 20, 30...
-        raise ValidationError(
-            f"No room left between '{entry}' and '{following}'. "
-            f"Renormalize the '{entry.track}' column first, then try again."
-        )
-    return midpoint
+    if entry.position < midpoint < following.position:
+        return midpoint, []
+
+    window = _relabel_window(entry, later)
+    return ((entry.position + window[0].position) / 2).quantize(POSITION_QUANTUM), window
+
+
+def _relabel_window(entry, later):
+    """The fewest of `later`, the entries after `entry`, that need spreading out to make room behind it.
+
+    Tries the next 1, 2, 4, ... entries in the column, spreading each window
+    evenly between `entry` and the first entry past it, and takes the first
+    window that leaves at least MIN_RELABEL_SPACING between neighbours. A dense
+    run therefore costs rows in proportion to its own size, and a window that
+    reaches the end of the column always fits. Order is untouched, so nothing
+    on the chart moves and there is no cache to invalidate.
+
+    Returns the window with the new positions set but not saved.
+    """
+    size = 1
+    while True:
+        window = list(later[:size + 1])
+        if len(window) <= size:
+            spacing = POSITION_GAP
+            break
+        bound = window.pop()
+        spacing = ((bound.position - entry.position) / (size + 1)).quantize(POSITION_QUANTUM, rounding=ROUND_DOWN)
+        if spacing >= MIN_RELABEL_SPACING:
+            break
+        size *= 2
+
+    for index, neighbour in enumerate(window, start=1):
+        neighbour.position = entry.position + spacing * index
+    return window
 
 
 def renormalize_track(track):
@@ -452,11 +539,12 @@ def renormalize_track(track):
     Uses bulk_update, so it does not fire post_save. Callers are responsible for
     invalidating the watch-order cache.
     """
-    chain = track.column_tracks()
+    columns = track_columns()
+    chain = track.column_tracks(columns)
     order = {chain_track.pk: index for index, chain_track in enumerate(chain)}
 
     entries = sorted(
-        column_entries(track),
+        column_entries(track, columns),
         key=lambda entry: (order.get(entry.track_id, 0), entry.position, entry.pk),
     )
     for index, entry in enumerate(entries, start=1):
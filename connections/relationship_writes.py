@@ -0,0 +1,162 @@
+"""Bulk relationship writes for the admin's bulk-add and clique-add tools.
+
+Saving relationships one at a time costs a lookup and an insert per row, and
+every save fires the post_save handlers that patch the graph caches. A large
+clique submission turned into hundreds of queries and as many cache patches.
+
+`write_relationships` checks a whole submission in memory against one
+character query and one query for existing relationships, inserts the new
+rows with a single `bulk_create`, and then invalidates each affected cache
+once. `bulk_create` skips `Relationship.save()` and its signals, so weights
+are set here and the caches are invalidated explicitly.
+
+The insert is all or nothing: if another submission stored one of the rows
+after the check, the unique constraint rejects the batch, the rows now stored
+are dropped, and the rest are inserted again. Every row reported as created
+was therefore written by this call.
+"""
+
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+from django.db import IntegrityError, transaction
+
+from .admin_index import RelationshipAdminIndex
+from .graph_service import MCUGraphService
+from .models import Character, Relationship
+
+CREATED = "created"
+# The relationship is already stored, or an earlier row in the same submission
+# adds it.
+EXISTS = "exists"
+MISSING_CHARACTER = "missing_character"
+SELF_RELATIONSHIP = "self_relationship"
+UNKNOWN_TYPE = "unknown_type"
+
+RELATIONSHIP_TYPES = {value for value, _label in Relationship.RELATIONSHIP_CHOICES}
+
+
+class RelationshipRow(NamedTuple):
+	character1_id: int
+	character2_id: int
+	relationship_type: str
+	directional: bool = False
+	notes: str = ""
+
+
+@dataclass
+class BulkWriteResult:
+	"""One outcome per submitted row, in order, plus the names of the characters involved."""
+
+	outcomes: list = field(default_factory=list)
+	names: dict = field(default_factory=dict)
+
+	def count(self, outcome):
+		return sum(1 for each in self.outcomes if each == outcome)
+
+
+def _match_key(character1_id, character2_id, relationship_type, directional):
+	"""Undirected relationships match a stored pair in either order; directional ones only as stored."""
+	if directional:
+		return (character1_id, character2_id, relationship_type, True)
+	return (*sorted((character1_id, character2_id)), relationship_type, False)
+
+
+def _stored_keys(character1_id, character2_id, relationship_type):
+	"""Every match key an existing row satisfies, whichever way a new row is asked for."""
+	return {
+		(character1_id, character2_id, relationship_type, True),
+		_match_key(character1_id, character2_id, relationship_type, False),
+	}
+
+
+def _insert(new_relationships):
+	"""Insert the relationships nobody else has stored meanwhile; return the (c1, c2, type) keys written."""
+	while new_relationships:
+		try:
+			with transaction.atomic():
+				created = Relationship.objects.bulk_create(new_relationships)
+		except IntegrityError:
+			stored = set(
+				Relationship.objects.filter(
+					character1_id__in={each.character1_id for each in new_relationships},
+					character2_id__in={each.character2_id for each in new_relationships},
+					relationship_type__in={each.relationship_type for each in new_relationships},
+				).values_list("character1_id", "character2_id", "relationship_type")
+			)
+			remaining = [
+				each for each in new_relationships
+				if (each.character1_id, each.character2_id, each.relationship_type) not in stored
+			]
+			if len(remaining) == len(new_relationships):
+				# Not a row someone else stored: a real error.
+				raise
+			new_relationships = remaining
+			continue
+		return {(each.character1_id, each.character2_id, each.relationship_type) for each in created}
+	return set()
+
+
+def write_relationships(rows, unordered=False):
+	"""Create every new relationship in `rows` (RelationshipRow tuples) in a constant number of queries.
+
+	With `unordered`, a stored relationship of the same type between the same two
+	characters counts as existing whichever way round it is stored, directional
+	or not. The clique tool works that way; the per-row tool only skips a
+	directional row stored in its own direction.
+	"""
+	rows = [
+		RelationshipRow(int(row.character1_id), int(row.character2_id), row.relationship_type, bool(row.directional), row.notes)
+		for row in rows
+	]
+	character_ids = {row.character1_id for row in rows} | {row.character2_id for row in rows}
+	relationship_types = {row.relationship_type for row in rows}
+
+	result = BulkWriteResult()
+	if not rows:
+		return result
+	result.names = dict(Character.objects.filter(pk__in=character_ids).values_list("pk", "name"))
+
+	existing = set()
+	for stored in Relationship.objects.filter(
+		character1_id__in=character_ids,
+		character2_id__in=character_ids,
+		relationship_type__in=relationship_types,
+	).values_list("character1_id", "character2_id", "relationship_type"):
+		existing |= _stored_keys(*stored)
+
+	new_relationships, pending = [], []
+	for row in rows:
+		if row.relationship_type not in RELATIONSHIP_TYPES:
+			result.outcomes.append(UNKNOWN_TYPE)
+		elif row.character1_id not in result.names or row.character2_id not in result.names:
+			result.outcomes.append(MISSING_CHARACTER)
+		elif row.character1_id == row.character2_id:
+			result.outcomes.append(SELF_RELATIONSHIP)
+		elif _match_key(*row[:3], row.directional and not unordered) in existing:
+			result.outcomes.append(EXISTS)
+		else:
+			existing |= _stored_keys(*row[:3])
+			new_relationships.append(
+				Relationship(
+					character1_id=row.character1_id,
+					character2_id=row.character2_id,
+					relationship_type=row.relationship_type,
+					directional=row.directional,
+					weight=Relationship.WEIGHTS.get(row.relationship_type, 1),
+					notes=row.notes,
+				)
+			)
+			# Settled once the insert shows which rows it wrote.
+			pending.append((len(result.outcomes), row[:3]))
+			result.outcomes.append(None)
+
+	if new_relationships:
+		# A row someone else stored since the check above is reported as existing.
+		inserted = _insert(new_relationships)
+		for index, stored in pending:
+			result.outcomes[index] = CREATED if stored in inserted else EXISTS
+		if inserted:
+			MCUGraphService.invalidate_cache()
+			RelationshipAdminIndex.invalidate_cache()
+	return result
@@ -1,21 +1,198 @@
 """Cache invalidation hooks for graph data."""
 
-from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
+from .admin_index import RelationshipAdminIndex
 from .graph_service import MCUGraphService
 from .models import (
-    Character, Relationship, WatchCollection, WatchEntry, WatchOrderConfig, WatchTrack,
+    AlterEgo, Character, Earth, Movie, Relationship, Team, TeamMembership, WatchCollection, WatchEntry,
+    WatchOrderConfig, WatchTrack,
 )
+from .watch_order_index import PrerequisiteIndex
 from .watch_order_service import WatchOrderService
 
 
+# Every handler goes through the services, which hold their invalidations
+# inside deferred_invalidation() (see connections.invalidation), so a bulk
+# write wrapped in one moves each cache once however many signals it sends.
+
+# Single edits patch the cached graph in place (see
+# MCUGraphService._apply_graph_patch) so an editor adding relationships one at
+# a time does not force a cold rebuild for every visitor. Fixture loads save
+# raw rows whose related objects may not exist yet, so they just invalidate.
 @receiver(post_save, sender=Character)
+def patch_graph_for_character(sender, instance, raw=False, **kwargs):
+    if raw:
+        MCUGraphService.invalidate_cache()
+        return
+    MCUGraphService.apply_character_change(instance)
+
+
 @receiver(post_save, sender=Relationship)
+def patch_graph_for_relationship(sender, instance, raw=False, **kwargs):
+    if raw:
+        MCUGraphService.invalidate_cache()
+        return
+    MCUGraphService.apply_relationship_change(instance)
+
+
+@receiver(post_delete, sender=Relationship)
+def patch_graph_for_removed_relationship(sender, instance, **kwargs):
+    MCUGraphService.apply_relationship_change(instance, removed=True)
+
+
+# Team memberships and movie appearances are what the team and movie filters
+# match on, so they move the cached attribute index too.
+@receiver(post_delete, sender=Character)
+@receiver(post_save, sender=TeamMembership)
+@receiver(post_delete, sender=TeamMembership)
 def invalidate_graph_cache(sender, **kwargs):
     MCUGraphService.invalidate_cache()
 
 
+@receiver(m2m_changed, sender=Movie.characters.through)
+def invalidate_graph_cache_on_appearance(sender, action, **kwargs):
+    if action in {"post_add", "post_remove", "post_clear"}:
+        MCUGraphService.invalidate_cache()
+
+
+# Release dates order the as-of timeline (see GraphTimeline), so moving one
+# moves the graph version. Deleting a movie clears its appearances and
+# introductions without per-character signals, which the movie filter and
+# the timeline both read.
+@receiver(pre_save, sender=Movie)
+def note_release_date_change(sender, instance, raw=False, **kwargs):
+    previous = None
+    if instance.pk is not None and not raw:
+        previous = Movie.objects.filter(pk=instance.pk).values_list("release_date", flat=True).first()
+    instance._release_date_changed = previous is not None and str(previous) != str(instance.release_date)
+
+
+@receiver(post_save, sender=Movie)
+def invalidate_graph_cache_on_release_date(sender, instance, raw=False, **kwargs):
+    if raw or getattr(instance, "_release_date_changed", False):
+        MCUGraphService.invalidate_cache()
+
+
+@receiver(post_delete, sender=Movie)
+def invalidate_graph_cache_on_movie_delete(sender, **kwargs):
+    MCUGraphService.invalidate_cache()
+
+
+# Character detail payloads are cached per character, outside the graph
+# version, so each edit drops only the characters whose details it changes.
+@receiver(post_save, sender=Character)
+@receiver(post_delete, sender=Character)
+def drop_character_details(sender, instance, **kwargs):
+    MCUGraphService.invalidate_character_details([instance.pk])
+
+
+@receiver(post_save, sender=AlterEgo)
+@receiver(post_delete, sender=AlterEgo)
+@receiver(post_save, sender=TeamMembership)
+@receiver(post_delete, sender=TeamMembership)
+def drop_member_character_details(sender, instance, **kwargs):
+    MCUGraphService.invalidate_character_details([instance.character_id])
+
+
+# Renaming a team, movie or Earth changes the details of everyone linked to it.
+# Deletes are caught before they happen: the links are gone afterwards, and
+# clearing Earth and movie links does not send per-character signals.
+@receiver(post_save, sender=Team)
+def drop_team_character_details(sender, instance, **kwargs):
+    MCUGraphService.invalidate_character_details(instance.members.values_list("character_id", flat=True))
+
+
+@receiver(post_save, sender=Earth)
+@receiver(pre_delete, sender=Earth)
+@receiver(post_save, sender=Movie)
+@receiver(pre_delete, sender=Movie)
+def drop_linked_character_details(sender, instance, **kwargs):
+    MCUGraphService.invalidate_character_details(instance.characters.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Movie.characters.through)
+def drop_character_details_on_appearance(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Changed from the character's side: instance is the character.
+        if action in {"post_add", "post_remove", "post_clear"}:
+            MCUGraphService.invalidate_character_details([instance.pk])
+    elif action in {"post_add", "post_remove"}:
+        MCUGraphService.invalidate_character_details(pk_set)
+    elif action == "pre_clear":
+        MCUGraphService.invalidate_character_details(instance.characters.values_list("pk", flat=True))
+
+
+# The typeahead index also covers aliases and Earth labels, which do not move
+# the graph version.
+@receiver(post_save, sender=AlterEgo)
+@receiver(post_delete, sender=AlterEgo)
+@receiver(post_save, sender=Earth)
+@receiver(post_delete, sender=Earth)
+def drop_search_index(sender, **kwargs):
+    MCUGraphService.invalidate_search_index()
+
+
+# The relationship admin's picker index is patched for just the relationships
+# and characters an edit touches.
+@receiver(post_save, sender=Relationship)
+def patch_admin_index_for_relationship(sender, instance, raw=False, **kwargs):
+    if raw:
+        RelationshipAdminIndex.invalidate_cache()
+        return
+    RelationshipAdminIndex.apply_relationship_change(instance)
+
+
+@receiver(post_delete, sender=Relationship)
+def patch_admin_index_for_removed_relationship(sender, instance, **kwargs):
+    RelationshipAdminIndex.apply_relationship_change(instance, removed=True)
+
+
+@receiver(post_save, sender=Character)
+@receiver(post_delete, sender=Character)
+def patch_admin_index_for_character(sender, instance, **kwargs):
+    RelationshipAdminIndex.apply_character_change([instance.pk])
+
+
+@receiver(post_save, sender=AlterEgo)
+@receiver(post_delete, sender=AlterEgo)
+def patch_admin_index_for_alias(sender, instance, **kwargs):
+    RelationshipAdminIndex.apply_character_change([instance.character_id])
+
+
+@receiver(post_save, sender=Earth)
+def patch_admin_index_for_earth(sender, instance, **kwargs):
+    RelationshipAdminIndex.apply_character_change(instance.characters.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Movie)
+def patch_admin_index_for_movie(sender, instance, **kwargs):
+    RelationshipAdminIndex.apply_character_change(
+        [*instance.characters.values_list("pk", flat=True), *instance.introduced_characters.values_list("pk", flat=True)]
+    )
+
+
+# Deleting a movie or Earth clears links without per-character signals.
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=Earth)
+def invalidate_admin_index(sender, **kwargs):
+    RelationshipAdminIndex.invalidate_cache()
+
+
+@receiver(m2m_changed, sender=Movie.characters.through)
+def patch_admin_index_on_appearance(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if reverse:
+        RelationshipAdminIndex.apply_character_change([instance.pk])
+    elif action == "post_clear":
+        # The cleared ids are gone by now.
+        RelationshipAdminIndex.invalidate_cache()
+    else:
+        RelationshipAdminIndex.apply_character_change(pk_set)
+
+
 # The watch order keeps its own cache version so that editing a character does
 # not throw away the chart payload, and vice versa.
 @receiver(post_save, sender=WatchEntry)
@@ -33,4 +210,24 @@ def invalidate_watch_order_cache(sender, **kwargs):
 @receiver(m2m_changed, sender=WatchEntry.collections.through)
 def invalidate_watch_order_cache_on_membership(sender, action, **kwargs):
     if action in {"post_add", "post_remove", "post_clear"}:
-        WatchOrderService.invalidate_cache()
\ No newline at end of file
+        WatchOrderService.invalidate_cache()
+
+# The prerequisite closure table is written in the same transaction as the
+# links. Additions only add paths; anything that can cut a path rebuilds it.
+@receiver(m2m_changed, sender=WatchEntry.prerequisites.through)
+def update_prerequisite_paths(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_add":
+        if reverse:
+            # Changed from the prerequisite's side: pk_set holds the entries it unlocks.
+            PrerequisiteIndex.add_links((instance.pk, entry_id) for entry_id in pk_set)
+        else:
+            PrerequisiteIndex.add_links((prerequisite_id, instance.pk) for prerequisite_id in pk_set)
+    elif action in {"post_remove", "post_clear"}:
+        PrerequisiteIndex.rebuild()
+
+
+# Deleting an entry drops its links without an m2m signal, and the paths that
+# ran through it with them.
+@receiver(post_delete, sender=WatchEntry)
+def rebuild_prerequisite_paths(sender, **kwargs):
+    PrerequisiteIndex.rebuild()
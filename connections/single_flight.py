@@ -0,0 +1,66 @@
+"""Stampede protection for the versioned caches.
+
+Bumping a cache version turns every cached entry into a miss at once, and each
+concurrent request would then rebuild the same thing in parallel. `single_flight`
+lets one caller per key rebuild while the rest either take the previous
+version's value (when the caller can serve it) or wait for the rebuild to land.
+
+The lock is a plain `cache.add`, so it is shared by every worker using the same
+cache backend. It expires on its own, so a builder that dies mid-rebuild only
+delays the others, and a waiter that gives up simply builds for itself.
+"""
+
+import time
+import uuid
+
+from django.core.cache import cache
+
+# Longest a rebuild may hold the lock before another caller is allowed in.
+LOCK_TIMEOUT = 30
+# Longest a caller waits on someone else's rebuild before doing it itself.
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+# Last-built values kept for stale-while-revalidate. Only served while a
+# rebuild is in flight, so this just needs to outlive one.
+STALE_TIMEOUT = 60 * 60
+
+
+def single_flight(lock_key, load, build, stale=None):
+	"""Return `load()`, running `build()` in at most one caller at a time.
+
+	`load()` reads the current value (None on a miss) and `build()` computes
+	and stores it. A caller that finds someone else rebuilding returns
+	`stale()` if that gives a value, and otherwise polls `load()` until the
+	rebuild lands or WAIT_TIMEOUT passes.
+	"""
+	value = load()
+	if value is not None:
+		return value
+
+	token = uuid.uuid4().hex
+	if cache.add(lock_key, token, LOCK_TIMEOUT):
+		try:
+			# Someone may have finished between our miss and taking the lock.
+			value = load()
+			return value if value is not None else build()
+		finally:
+			if cache.get(lock_key) == token:
+				cache.delete(lock_key)
+
+	if stale is not None:
+		value = stale()
+		if value is not None:
+			return value
+
+	deadline = time.monotonic() + WAIT_TIMEOUT
+	while time.monotonic() < deadline:
+		time.sleep(POLL_INTERVAL)
+		# Lock first: the builder stores before it unlocks, so a miss seen after
+		# the lock was still held is a real miss.
+		locked = cache.get(lock_key) is not None
+		value = load()
+		if value is not None:
+			return value
+		if not locked:
+			break
+	return build()
@@ -2,8 +2,7 @@ from django.contrib import admin as django_admin
 from django.test import TestCase
 
 from ..admin import CharacterAdmin, CharacterAdminForm, RelationshipAdmin, RelationshipAdminForm, SearchableRelationshipCharacterSelect
-from ..models import Character, Earth, Movie, Relationship
-from ..views import _group_character_options
+from ..models import AlterEgo, Character, Earth, Movie, Relationship
 
 
 class ConnectionsAdminTests(TestCase):
@@ -66,16 +65,17 @@ class ConnectionsAdminTests(TestCase):
 			["Earth-1610", "Earth-616", "Earth-838"],
 		)
 
-	def test_group_character_options_includes_earth_display_name(self):
-		earth = Earth.objects.create(number="Earth-616")
-		movie = self._movie("Movie One", "2024-01-01")
+	def test_character_aliases_come_from_the_search_index(self):
 		character = self._character("Test Character")
-		character.earth_number = earth
-		character.movie_introduced = movie
-		character.save(update_fields=["earth_number", "movie_introduced"])
+		AlterEgo.objects.create(character=character, name="Alias One")
+		AlterEgo.objects.create(character=character, name="Alias Two")
+		admin_instance = RelationshipAdmin(Relationship, django_admin.site)
+		admin_instance._character_aliases()
+
+		with self.assertNumQueries(0):
+			aliases = admin_instance._character_aliases()
 
-		grouped_options = _group_character_options(Character.objects.select_related("movie_introduced", "earth_number").order_by("name"))
-		self.assertEqual(grouped_options[0]["characters"][0]["display_name"], "Test Character (Earth-616)")
+		self.assertEqual(aliases, {str(character.id): "Alias One Alias Two"})
 
 	def test_relationship_admin_keeps_grouped_characters_and_adds_search(self):
 		movie_one = self._movie("Movie One", "2024-01-01")
@@ -0,0 +1,104 @@
+"""Tests for the cached relationship admin picker index."""
+
+import pytest
+from django.db import transaction
+
+from connections.admin_index import RelationshipAdminIndex
+from connections.models import AlterEgo, Character, Earth, Movie, Relationship
+
+
+# Patches wait for the surrounding transaction to commit, so these run against
+# real commits rather than inside a rolled-back test transaction.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def no_rebuilds(monkeypatch):
+    """Warm the index, then fail any further full build."""
+    RelationshipAdminIndex.current()
+
+    def fail():
+        raise AssertionError("the index should have been patched, not rebuilt")
+
+    monkeypatch.setattr(RelationshipAdminIndex, "build", classmethod(lambda cls: fail()))
+
+
+def _relationship(first, second, relationship_type="Ally"):
+    return Relationship.objects.create(character1=first, character2=second, relationship_type=relationship_type)
+
+
+class TestCurrent:
+    def test_is_served_from_cache_once_built(self, django_assert_num_queries):
+        steve = Character.objects.create(name="Steve Rogers")
+        bucky = Character.objects.create(name="Bucky Barnes")
+        _relationship(steve, bucky)
+        RelationshipAdminIndex.current()
+
+        with django_assert_num_queries(0):
+            adjacency = RelationshipAdminIndex.current().adjacency()
+
+        assert adjacency == {steve.id: [bucky.id], bucky.id: [steve.id]}
+
+
+class TestPatches:
+    def test_relationships_are_patched_in_and_out(self, no_rebuilds):
+        steve = Character.objects.create(name="Steve Rogers")
+        bucky = Character.objects.create(name="Bucky Barnes")
+
+        ally = _relationship(steve, bucky)
+        family = _relationship(bucky, steve, "Family")
+        ally.delete()
+
+        assert RelationshipAdminIndex.current().adjacency() == {steve.id: [bucky.id], bucky.id: [steve.id]}
+
+        family.delete()
+
+        assert RelationshipAdminIndex.current().adjacency() == {}
+
+    def test_aliases_and_appearances_update_the_variant_data(self, no_rebuilds):
+        earth = Earth.objects.create(number="Earth-838")
+        strange = Character.objects.create(name="Stephen Strange")
+        supreme = Character.objects.create(name="Strange Supreme", earth_number=earth)
+        movie = Movie.objects.create(title="Multiverse of Madness", release_date="2022-05-06")
+
+        AlterEgo.objects.create(character=supreme, name="Stephen Strange")
+        movie.characters.add(strange)
+
+        variant_adjacency, movie_members, variant_options = RelationshipAdminIndex.current().variant_data()
+        assert variant_adjacency == {strange.id: [supreme.id], supreme.id: [strange.id]}
+        assert movie_members == {"Multiverse of Madness": [strange.id]}
+        assert (supreme.id, "Strange Supreme — Stephen Strange (Earth-838)") in variant_options
+
+    def test_deleting_a_character_drops_it(self, no_rebuilds):
+        wanda = Character.objects.create(name="Wanda Maximoff")
+        vision = Character.objects.create(name="Vision")
+        _relationship(wanda, vision, "Romantic")
+
+        vision.delete()
+
+        index = RelationshipAdminIndex.current()
+        assert vision.id not in index.characters
+        assert index.adjacency() == {}
+
+    def test_patched_index_matches_a_fresh_build(self):
+        RelationshipAdminIndex.current()
+        thor = Character.objects.create(name="Thor")
+        loki = Character.objects.create(name="Loki")
+        movie = Movie.objects.create(title="Thor", release_date="2011-05-06")
+        loki.movies.add(movie)
+        AlterEgo.objects.create(character=loki, name="God of Mischief")
+        _relationship(thor, loki, "Family")
+
+        assert RelationshipAdminIndex.current() == RelationshipAdminIndex.build()
+
+
+class TestRollback:
+    def test_a_rolled_back_relationship_never_reaches_the_index(self, no_rebuilds):
+        steve = Character.objects.create(name="Steve Rogers")
+        bucky = Character.objects.create(name="Bucky Barnes")
+
+        with pytest.raises(RuntimeError), transaction.atomic():
+            _relationship(steve, bucky)
+            raise RuntimeError
+
+        assert RelationshipAdminIndex.current().adjacency() == {}
@@ -0,0 +1,154 @@
+"""Tests for the hit counters and the connections cache warmer."""
+
+import threading
+from io import StringIO
+from unittest.mock import MagicMock
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+
+from connections import cache_warming
+from connections.graph_service import MCUGraphService
+from connections.models import Character, Relationship
+
+
+pytestmark = pytest.mark.django_db
+
+
+def _pair():
+    tony = Character.objects.create(name="Tony Stark", alignment="Hero")
+    peter = Character.objects.create(name="Peter Parker", alignment="Hero")
+    Relationship.objects.create(character1=tony, character2=peter, relationship_type="Mentor")
+    return tony, peter
+
+
+class TestHitCounter:
+    def test_top_hits_ranks_by_count_within_a_kind(self):
+        service = MCUGraphService()
+        for _ in range(3):
+            service.record_hit("path", "1:2", [1, 2])
+        service.record_hit("path", "3:4", [3, 4])
+        service.record_hit("filter", "a", {"alignment": ["Hero"]})
+
+        assert service.top_hits("path", 5) == [[1, 2], [3, 4]]
+        assert service.top_hits("path", 1) == [[1, 2]]
+        assert service.top_hits("filter", 5) == [{"alignment": ["Hero"]}]
+
+    def test_a_repeat_hit_only_bumps_its_own_counter(self, monkeypatch):
+        service = MCUGraphService()
+        service.record_hit("filter", "a", {"alignment": ["Hero"]})
+        monkeypatch.setattr(cache, "get", MagicMock(side_effect=AssertionError("read the hit list")))
+        monkeypatch.setattr(cache, "set", MagicMock(side_effect=AssertionError("rewrote the hit list")))
+
+        service.record_hit("filter", "a", {"alignment": ["Hero"]})
+
+        monkeypatch.undo()
+        assert cache.get(service._hit_counter_key("filter", "a")) == 2
+
+    def test_a_full_list_takes_no_new_entries_until_pruned(self, monkeypatch):
+        monkeypatch.setattr(MCUGraphService, "HITS_LIMIT", 4)
+        service = MCUGraphService()
+        service.record_hit("path", "1:2", [1, 2])
+        service.record_hit("path", "1:2", [1, 2])
+        for index in range(3, 7):
+            service.record_hit("path", f"1:{index}", [1, index])
+
+        assert len(cache.get(MCUGraphService.HITS_KEY)) == 4
+        assert service.top_hits("path", 1) == [[1, 2]]
+
+        service.prune_hits()
+
+        assert len(cache.get(MCUGraphService.HITS_KEY)) == 2
+        assert service.top_hits("path", 1) == [[1, 2]]
+        service.record_hit("path", "1:9", [1, 9])
+        assert [1, 9] in service.top_hits("path", 5)
+
+    def test_pruning_drops_entries_whose_counter_expired(self):
+        service = MCUGraphService()
+        service.record_hit("path", "1:2", [1, 2])
+        service.record_hit("path", "3:4", [3, 4])
+        cache.delete(service._hit_counter_key("path", "3:4"))
+
+        service.prune_hits()
+
+        assert cache.get(MCUGraphService.HITS_KEY) == {("path", "1:2"): [1, 2]}
+
+    def test_views_count_filters_and_canonical_path_pairs(self, client):
+        tony, peter = _pair()
+
+        client.get(reverse("graph-filter"), {"alignment": "Hero"})
+        client.get(reverse("graph-path"), {"from": peter.id, "to": tony.id})
+        client.get(reverse("graph-paths"), {"from": tony.id, "to": peter.id})
+
+        service = MCUGraphService()
+        assert service.top_hits("path", 5) == [sorted([tony.id, peter.id])]
+        assert service.top_hits("filter", 5)[0]["alignment"] == ["Hero"]
+
+
+class TestWarmConnectionsCache:
+    def test_command_builds_payloads_and_popular_queries(self):
+        tony, peter = _pair()
+        service = MCUGraphService()
+        service.record_hit("path", "pair", [tony.id, peter.id])
+        service.record_hit("filter", "heroes", {"alignment": ["Hero"], "phase": None})
+        output = StringIO()
+
+        call_command("warm_connections_cache", stdout=output)
+
+        assert "1 filter(s) and 1 path(s)" in output.getvalue()
+        source_id = min(tony.id, peter.id)
+        assert cache.get(service._cache_key("full-payload")) is not None
+        assert cache.get(service._cache_key(f"filter-payload:{service.filter_key(alignment=['Hero'])}")) is not None
+        assert cache.get(service._cache_key(f"path-tree:{source_id}")) is not None
+
+    def test_skips_paths_whose_characters_are_gone(self):
+        MCUGraphService().record_hit("path", "gone", [998, 999])
+
+        assert cache_warming.warm_connections_cache()["paths"] == 0
+
+
+class TestPrewarmOnInvalidate:
+    def test_off_by_default(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks() as callbacks:
+            MCUGraphService.invalidate_cache()
+
+        assert callbacks == []
+
+    def test_warms_in_the_background_after_commit(self, settings, monkeypatch, django_capture_on_commit_callbacks):
+        settings.CONNECTIONS_PREWARM_ON_INVALIDATE = True
+        monkeypatch.setattr(cache_warming, "PREWARM_DELAY", 0)
+        warmed = threading.Event()
+        monkeypatch.setattr(cache_warming, "warm_connections_cache", warmed.set)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            MCUGraphService.invalidate_cache()
+
+        assert warmed.wait(timeout=5)
+
+
+class TestPrewarmOnStartup:
+    def test_a_starting_worker_warms_its_own_cache(self, settings, monkeypatch):
+        settings.CONNECTIONS_PREWARM_ON_START = True
+        monkeypatch.setattr(cache_warming, "PREWARM_DELAY", 0)
+        warmed = threading.Event()
+        monkeypatch.setattr(cache_warming, "warm_connections_cache", warmed.set)
+
+        cache_warming.warm_on_startup()
+
+        assert warmed.wait(timeout=5)
+
+    def test_can_be_turned_off(self, settings, monkeypatch):
+        settings.CONNECTIONS_PREWARM_ON_START = False
+        monkeypatch.setattr(cache_warming, "_start_prewarm", MagicMock(side_effect=AssertionError("warmed")))
+
+        cache_warming.warm_on_startup()
+
+    def test_the_command_warns_that_locmem_only_warms_itself(self):
+        errors = StringIO()
+
+        call_command("warm_connections_cache", stdout=StringIO(), stderr=errors)
+
+        assert "per-process locmem" in errors.getvalue()
+
@@ -0,0 +1,68 @@
+"""Tests for the character typeahead index."""
+
+import pickle
+
+from connections.character_search import CharacterSearchIndex
+
+
+def _index():
+    return CharacterSearchIndex.build(
+        [
+            (1, "Peter Parker", "Earth-616", ["Spider-Man"]),
+            (2, "Peter Quill", None, ["Star-Lord"]),
+            (3, "T'Challa", "Earth-616", ["Black Panther"]),
+            (4, "Wanda Maximoff", None, ["Scarlet Witch"]),
+            (5, "Spider-Man", "Earth-199999", []),
+        ]
+    )
+
+
+def _ids(query, limit=20):
+    return [result["id"] for result in _index().search(query, limit)]
+
+
+class TestSearch:
+    def test_every_query_word_must_prefix_a_word(self):
+        assert _ids("pet par") == [1]
+        assert _ids("par pet") == [1]
+        assert _ids("peter x") == []
+
+    def test_names_outrank_aliases_and_exact_matches_come_first(self):
+        assert _ids("spider-man") == [5, 1]
+        assert _ids("spider") == [5, 1]
+
+    def test_matching_ignores_case_accents_and_apostrophes(self):
+        assert _ids("TCHALLA") == [3]
+        assert _ids("Wánda") == [4]
+
+    def test_words_from_name_and_alias_can_combine(self):
+        assert _ids("wanda witch") == [4]
+        assert _index().search("wanda witch")[0]["matched_alias"] is None
+
+    def test_results_carry_display_names_and_respect_the_limit(self):
+        results = _index().search("peter", limit=1)
+
+        assert results == [
+            {
+                "id": 1,
+                "name": "Peter Parker",
+                "display_name": "Peter Parker (Earth-616)",
+                "earth": "Earth-616",
+                "matched_alias": None,
+            }
+        ]
+
+    def test_blank_queries_match_nothing(self):
+        assert _ids("") == []
+        assert _ids("  -- ") == []
+
+
+class TestIndex:
+    def test_aliases_by_character_skips_characters_without_aliases(self):
+        assert _index().aliases_by_character()[3] == ("Black Panther",)
+        assert 5 not in _index().aliases_by_character()
+
+    def test_survives_pickling(self):
+        index = pickle.loads(pickle.dumps(_index()))
+
+        assert [result["id"] for result in index.search("star")] == [2]
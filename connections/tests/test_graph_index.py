@@ -0,0 +1,91 @@
+"""Tests for the attribute bitset index behind filtered_subgraph."""
+
+import pickle
+
+from connections.graph_index import AttributeIndex, character_summaries
+
+
+def _node(name, alignment=None, status=None, earth=None, phase=None):
+    return {
+        "name": name,
+        "alignment": alignment,
+        "status": status,
+        "earth": earth,
+        "phase_introduced": phase,
+        "movie_introduced_id": None,
+        "photo_url": "",
+    }
+
+
+def _index():
+    nodes = {
+        1: _node("Thor", alignment="Hero", status="Alive", phase=1),
+        2: _node("Hela", alignment="Villain", status="Dead", phase=3),
+        3: _node("Loki", alignment="Neutral", status="Alive", phase=1),
+        4: _node("Strange", alignment="Hero", earth="Earth-838", phase=4),
+    }
+    teams = [(1, 100), (3, 100)]
+    movies = [(1, 7), (2, 7), (3, 8)]
+    rows = [
+        (10, 1, 2, "Enemy", 6, False),
+        (11, 1, 3, "Family", 2, False),
+        (12, 2, 3, "Enemy", 6, False),
+    ]
+    return AttributeIndex.build(nodes, teams, movies, rows)
+
+
+def _ids(index, **filters):
+    return [summary.id for summary in character_summaries(index.subgraph(**filters))]
+
+
+class TestMatching:
+    def test_no_filters_selects_everyone_including_lone_characters(self):
+        assert _ids(_index()) == [2, 3, 4, 1]
+
+    def test_values_in_one_filter_are_alternatives(self):
+        assert _ids(_index(), alignment=["Villain", "Neutral"]) == [2, 3]
+
+    def test_filters_combine_with_and(self):
+        assert _ids(_index(), alignment=["Hero"], phase=1) == [1]
+        assert _ids(_index(), status=["Alive"], team=["100"], movie=["8"]) == [3]
+
+    def test_unknown_values_match_nothing(self):
+        assert _ids(_index(), team=["not-a-team"]) == []
+        assert _ids(_index(), earth=["Earth-199999"]) == []
+
+
+class TestSubgraph:
+    def test_keeps_only_edges_between_selected_characters(self):
+        graph = _index().subgraph(alignment=["Hero", "Neutral"])
+
+        assert list(graph.edges()) == [(1, 3)]
+
+    def test_relationship_types_restrict_edges_not_characters(self):
+        graph = _index().subgraph(relationship_types=["Enemy"])
+
+        assert graph.number_of_nodes() == 4
+        assert list(graph.edges()) == [(1, 2), (2, 3)]
+
+
+class TestUpdates:
+    def test_with_character_moves_the_character_between_values(self):
+        index = _index().with_character(2, _node("Hela", alignment="Hero", status="Dead", phase=3))
+
+        assert _ids(index, alignment=["Hero"]) == [2, 4, 1]
+        assert _ids(index, alignment=["Villain"]) == []
+        # The original is untouched.
+        assert _ids(_index(), alignment=["Villain"]) == [2]
+
+    def test_with_character_returns_none_for_an_unindexed_character(self):
+        assert _index().with_character(99, _node("Nobody")) is None
+
+    def test_with_rows_replaces_the_relationships(self):
+        index = _index().with_rows([(13, 1, 4, "Ally", 3, False)])
+
+        assert list(index.subgraph().edges()) == [(1, 4)]
+        assert _index().with_rows([(13, 1, 99, "Ally", 3, False)]) is None
+
+    def test_survives_pickling(self):
+        index = pickle.loads(pickle.dumps(_index()))
+
+        assert _ids(index, team=["100"]) == [3, 1]
@@ -0,0 +1,57 @@
+"""Tests for the server-side force-directed layout."""
+
+import math
+
+from connections.graph_layout import NODE_RADIUS, force_layout
+from connections.graph_snapshot import GraphSnapshot
+
+
+def _node(name, earth=None):
+    return {
+        "name": name,
+        "alignment": None,
+        "status": None,
+        "earth": earth,
+        "phase_introduced": None,
+        "movie_introduced_id": None,
+        "photo_url": "",
+    }
+
+
+def _graph(count=12, extra_rows=()):
+    nodes = {node_id: _node(f"Character {node_id}", earth="Earth-616") for node_id in range(1, count + 1)}
+    rows = [(node_id, node_id, node_id + 1, "Ally", 3, False) for node_id in range(1, count)]
+    return GraphSnapshot.build(nodes, [*rows, *extra_rows])
+
+
+class TestForceLayout:
+    def test_empty_graph_has_no_positions(self):
+        assert force_layout(GraphSnapshot.build({}, [])) == {}
+
+    def test_positions_every_node_without_overlap(self):
+        positions = force_layout(_graph())
+
+        assert set(positions) == set(range(1, 13))
+        points = list(positions.values())
+        for index, point in enumerate(points):
+            for other in points[index + 1:]:
+                assert math.dist(point, other) > NODE_RADIUS
+
+    def test_is_deterministic(self):
+        assert force_layout(_graph()) == force_layout(_graph())
+
+    def test_linked_nodes_end_up_closer_than_unlinked_ones(self):
+        positions = force_layout(_graph())
+
+        assert math.dist(positions[1], positions[2]) < math.dist(positions[1], positions[12])
+
+    def test_warm_start_keeps_existing_nodes_nearly_in_place(self):
+        before = force_layout(_graph())
+        nodes = {node_id: _node(f"Character {node_id}", earth="Earth-616") for node_id in range(1, 14)}
+        rows = [*_graph().rows(), (99, 6, 13, "Ally", 3, False)]
+
+        after = force_layout(GraphSnapshot.build(nodes, rows), seed=before)
+
+        assert 13 in after
+        moved = [math.dist(before[node_id], after[node_id]) for node_id in before]
+        assert max(moved) < NODE_RADIUS * 4
@@ -0,0 +1,70 @@
+"""Tests for the pre-encoded graph payloads."""
+
+import gzip
+import json
+
+from django.test import RequestFactory
+
+from connections.graph_payloads import encode_payload, payload_response
+
+
+def _get(**headers):
+    return RequestFactory().get("/api/graph/", headers=headers)
+
+
+class TestEncodePayload:
+    def test_gzip_body_decodes_to_the_payload(self):
+        encoded = encode_payload({"nodes": [], "edges": []}, "mcu:full-payload:v1")
+
+        assert json.loads(gzip.decompress(encoded.bodies["gzip"])) == {"nodes": [], "edges": []}
+        assert json.loads(encoded.bodies["identity"]) == {"nodes": [], "edges": []}
+
+    def test_etag_is_stable_for_the_same_key_and_body(self):
+        first = encode_payload({"nodes": [1]}, "mcu:full-payload:v1")
+        again = encode_payload({"nodes": [1]}, "mcu:full-payload:v1")
+
+        assert first.etag == again.etag
+        assert first.etag.startswith('"') and first.etag.endswith('"')
+        assert encode_payload({"nodes": [1]}, "mcu:full-payload:v2").etag != first.etag
+        assert encode_payload({"nodes": [2]}, "mcu:full-payload:v1").etag != first.etag
+
+
+class TestPayloadResponse:
+    def test_identity_without_accept_encoding(self):
+        response = payload_response(_get(), encode_payload({"a": 1}, "key"))
+
+        assert response.status_code == 200
+        assert not response.has_header("Content-Encoding")
+        assert json.loads(response.content) == {"a": 1}
+
+    def test_gzip_refused_with_zero_quality(self):
+        response = payload_response(_get(**{"Accept-Encoding": "gzip;q=0"}), encode_payload({"a": 1}, "key"))
+
+        assert not response.has_header("Content-Encoding")
+
+    def test_if_none_match_returns_not_modified(self):
+        encoded = encode_payload({"a": 1}, "key")
+
+        response = payload_response(_get(**{"If-None-Match": encoded.etag}), encoded)
+
+        assert response.status_code == 304
+
+    def test_each_encoding_has_its_own_etag(self):
+        encoded = encode_payload({"a": 1}, "key")
+
+        plain = payload_response(_get(), encoded)
+        zipped = payload_response(_get(**{"Accept-Encoding": "gzip"}), encoded)
+
+        assert zipped["Content-Encoding"] == "gzip"
+        assert plain["ETag"] == encoded.etag
+        assert zipped["ETag"] == encoded.etag[:-1] + '-gzip"'
+
+    def test_the_identity_etag_does_not_validate_the_gzip_body(self):
+        encoded = encode_payload({"a": 1}, "key")
+
+        response = payload_response(
+            _get(**{"Accept-Encoding": "gzip", "If-None-Match": encoded.etag}), encoded
+        )
+
+        assert response.status_code == 200
+        assert response["Content-Encoding"] == "gzip"
@@ -1,8 +1,12 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 
 import networkx as nx
 
 from ..graph_service import MCUGraphService
+from ..graph_snapshot import GraphSnapshot
 from ..models import AlterEgo, Character, Earth, Movie, Relationship, Team, TeamMembership
 
 
@@ -111,6 +115,65 @@ class MCUGraphServiceTests(TestCase):
 
 		self.assertEqual(result["character_ids"], [start.id, cheap.id, finish.id])
 
+	def test_shortest_path_answers_both_directions_from_one_tree(self):
+		# (a, b) and (b, a) canonicalize onto the tree of the smaller id, so the
+		# reverse query is answered without another search.
+		first = self._character("First")
+		middle = self._character("Middle")
+		last = self._character("Last")
+		Relationship.objects.create(character1=first, character2=middle, relationship_type="Ally", directional=False)
+		Relationship.objects.create(character1=middle, character2=last, relationship_type="Ally", directional=False)
+
+		forward = self.graph_service.shortest_path(first.id, last.id)
+
+		with mock.patch.object(GraphSnapshot, "shortest_path_tree", side_effect=AssertionError("tree was rebuilt")):
+			result = self.graph_service.shortest_path(last.id, first.id)
+
+		self.assertEqual(result["character_ids"], [last.id, middle.id, first.id])
+		self.assertEqual(result["character_ids"], list(reversed(forward["character_ids"])))
+		self.assertEqual(result["total_cost"], 8)
+
+	def test_shortest_path_answers_every_target_from_one_source_tree(self):
+		hub = self._character("Hub")
+		spokes = [self._character(f"Spoke {number}") for number in range(3)]
+		for spoke in spokes:
+			Relationship.objects.create(character1=hub, character2=spoke, relationship_type="Ally", directional=False)
+
+		self.graph_service.shortest_path(hub.id, spokes[0].id)
+
+		with mock.patch.object(GraphSnapshot, "shortest_path_tree", side_effect=AssertionError("tree was rebuilt")):
+			for spoke in spokes[1:]:
+				self.assertEqual(self.graph_service.shortest_path(hub.id, spoke.id)["character_ids"], [hub.id, spoke.id])
+				self.assertEqual(self.graph_service.shortest_path(spoke.id, hub.id)["character_ids"], [spoke.id, hub.id])
+
+	def test_shortest_path_rejects_other_components_without_a_search(self):
+		tony = self._character("Tony")
+		peter = self._character("Peter")
+		wanda = self._character("Wanda")
+		vision = self._character("Vision")
+		Relationship.objects.create(character1=tony, character2=peter, relationship_type="Mentor", directional=True)
+		Relationship.objects.create(character1=wanda, character2=vision, relationship_type="Romantic", directional=False)
+		self.graph_service.build_graph()
+
+		with mock.patch.object(GraphSnapshot, "shortest_path_tree", side_effect=AssertionError("searched")):
+			with self.assertRaises(nx.NetworkXNoPath):
+				self.graph_service.shortest_path(peter.id, wanda.id)
+
+	def test_path_trees_are_rebuilt_after_invalidation(self):
+		start = self._character("Start")
+		finish = self._character("Finish")
+		hub = self._character("Hub")
+		Relationship.objects.create(character1=start, character2=hub, relationship_type="Ally", directional=False)
+		Relationship.objects.create(character1=hub, character2=finish, relationship_type="Ally", directional=False)
+
+		self.assertEqual(len(self.graph_service.shortest_path(start.id, finish.id)["edges"]), 2)
+
+		# The graph is patched once the save commits.
+		with self.captureOnCommitCallbacks(execute=True):
+			Relationship.objects.create(character1=start, character2=finish, relationship_type="Enemy", directional=False)
+
+		self.assertEqual(self.graph_service.shortest_path(start.id, finish.id)["character_ids"], [start.id, finish.id])
+
 	def test_filtered_subgraph_filters_by_any_movie_appearance(self):
 		introduced_movie = self._movie("Intro Movie", "2024-01-01")
 		later_movie = self._movie("Later Movie", "2025-01-01")
@@ -161,6 +224,42 @@ class MCUGraphServiceTests(TestCase):
 		_, characters = self.graph_service.filtered_subgraph(earth=["Earth-838"])
 		self.assertEqual([character.name for character in characters], ["Illuminati"])
 
+	def test_filtered_subgraph_runs_no_queries_once_the_index_is_warm(self):
+		team = Team.objects.create(name="Avengers")
+		thor = self._character("Thor")
+		loki = self._character("Loki")
+		TeamMembership.objects.create(character=thor, team=team)
+		Relationship.objects.create(character1=thor, character2=loki, relationship_type="Family")
+		self.graph_service.filtered_subgraph()
+
+		with self.assertNumQueries(0):
+			graph, characters = self.graph_service.filtered_subgraph(team=[str(team.id)], relationship_types=["Family"])
+
+		self.assertEqual([character.name for character in characters], ["Thor"])
+		self.assertEqual(graph.number_of_edges(), 0)
+
+	def test_filtered_subgraph_restricts_edges_to_the_requested_types(self):
+		thor = self._character("Thor")
+		loki = self._character("Loki")
+		hela = self._character("Hela")
+		Relationship.objects.create(character1=thor, character2=loki, relationship_type="Family")
+		Relationship.objects.create(character1=thor, character2=hela, relationship_type="Enemy")
+
+		graph, characters = self.graph_service.filtered_subgraph(relationship_types=["Enemy"])
+
+		self.assertEqual(len(characters), 3)
+		self.assertEqual(list(graph.edges()), [(thor.id, hela.id)])
+
+	def test_filtered_subgraph_sees_new_team_memberships(self):
+		team = Team.objects.create(name="Guardians")
+		groot = self._character("Groot")
+		self.assertEqual(self.graph_service.filtered_subgraph(team=[str(team.id)])[1], [])
+
+		TeamMembership.objects.create(character=groot, team=team)
+
+		_, characters = self.graph_service.filtered_subgraph(team=[str(team.id)])
+		self.assertEqual([character.name for character in characters], ["Groot"])
+
 	def test_to_cytoscape_format_includes_character_details(self):
 		introducing_movie = self._movie("Introducing Movie", "2024-05-01")
 		later_movie = self._movie("Later Movie", "2025-06-01")
@@ -259,3 +358,56 @@ class MCUGraphServiceTests(TestCase):
 		self.assertEqual(details["aliases"], ["Alias One"])
 		self.assertEqual(details["teams"], [{"name": "Fantastic Four", "status": "Current"}])
 		self.assertEqual(details["movies"], [{"id": movie.id, "title": "Detail Movie", "year": 2024}])
+
+	def _signing_client(self):
+		client = mock.Mock()
+		client.generate_presigned_url.side_effect = lambda operation, Params, ExpiresIn: (
+			f"https://signed.example/{Params['Key']}?expires={ExpiresIn}"
+		)
+		return client
+
+	def test_photo_urls_sign_bucket_objects_with_one_shared_expiry(self):
+		client = self._signing_client()
+		paths = ["connections/a.jpg", "connections/b.jpg", "https://elsewhere.example/c.jpg", ""]
+
+		with self.settings(CONNECTIONS_SIGN_IMAGE_URLS=True), mock.patch(
+			"connections.graph_service._get_s3_client", return_value=client
+		):
+			urls = self.graph_service._photo_urls(paths)
+			again = self.graph_service._photo_urls(paths)
+
+		self.assertEqual(client.generate_presigned_url.call_count, 2)
+		expiries = {call.kwargs["ExpiresIn"] for call in client.generate_presigned_url.call_args_list}
+		self.assertEqual(len(expiries), 1)
+		self.assertTrue(urls["connections/a.jpg"].startswith("https://signed.example/connections/a.jpg"))
+		self.assertEqual(urls["https://elsewhere.example/c.jpg"], "https://elsewhere.example/c.jpg")
+		self.assertEqual(urls[""], "")
+		self.assertEqual(again, urls)
+
+	def test_photo_urls_fall_back_to_the_raw_url_when_signing_fails(self):
+		client = mock.Mock()
+		client.generate_presigned_url.side_effect = RuntimeError("no credentials")
+
+		with self.settings(CONNECTIONS_SIGN_IMAGE_URLS=True, CONNECTIONS_IMAGE_BASE_URL="https://bucket.example"), mock.patch(
+			"connections.graph_service._get_s3_client", return_value=client
+		):
+			urls = self.graph_service._photo_urls(["connections/a.jpg"])
+
+		self.assertEqual(urls, {"connections/a.jpg": "https://bucket.example/connections/a.jpg"})
+
+	def test_full_graph_signs_portraits_in_one_batch(self):
+		client = self._signing_client()
+		one, two, three = (
+			Character.objects.create(name=name, photo_path=f"connections/{name.lower()}.png") for name in ("One", "Two", "Three")
+		)
+		Relationship.objects.create(character1=one, character2=two, relationship_type="Ally")
+		Relationship.objects.create(character1=two, character2=three, relationship_type="Ally")
+
+		with self.settings(CONNECTIONS_SIGN_IMAGE_URLS=True), mock.patch(
+			"connections.graph_service._get_s3_client", return_value=client
+		), mock.patch("connections.graph_service.cache.get_many", wraps=cache.get_many) as get_many:
+			graph = self.graph_service.build_graph()
+
+		self.assertEqual(client.generate_presigned_url.call_count, 3)
+		self.assertEqual(get_many.call_count, 1)
+		self.assertTrue(all(graph.nodes[node_id]["photo_url"].startswith("https://signed.example/") for node_id in graph.nodes))
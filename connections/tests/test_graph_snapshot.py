@@ -0,0 +1,173 @@
+"""Tests for the array-backed graph snapshot and its DiGraph-style read API."""
+
+import pickle
+
+from connections.graph_snapshot import GraphSnapshot
+
+
+def _node(node_id, name, **kwargs):
+    return {"id": node_id, "label": name, "name": name, **kwargs}
+
+
+def _snapshot():
+    nodes = {
+        1: _node(1, "Thor", alignment="Hero"),
+        2: _node(2, "Hela", alignment="Villain"),
+        3: _node(3, "Loki", alignment="Neutral"),
+        4: _node(4, "Odin"),
+    }
+    relationships = [
+        (10, 1, 2, "Enemy", 6, False),
+        (11, 1, 2, "Family", 2, False),
+        (12, 3, 1, "Family", 2, False),
+        (13, 4, 3, "Mentor", 4, True),
+    ]
+    return GraphSnapshot.build(nodes, relationships)
+
+
+class TestReadApi:
+    def test_nodes_are_sorted_ids_with_attributes(self):
+        graph = _snapshot()
+
+        assert list(graph.nodes) == [1, 2, 3, 4]
+        assert graph.nodes[2]["label"] == "Hela"
+        assert graph.nodes[2]["alignment"] == "Villain"
+        assert 5 not in graph.nodes
+
+    def test_a_pair_with_two_types_is_one_edge_with_two_segments(self):
+        graph = _snapshot()
+
+        assert graph.number_of_edges() == 3
+        edge = graph[1][2]
+        assert edge["relationship_types"] == ["Enemy", "Family"]
+        assert edge["relationship_ids"] == [10, 11]
+        assert edge["weight"] == 2
+        assert set(edge["relationship_segments"]) == {"Enemy", "Family"}
+        assert edge["relationship_segments"]["Enemy"]["weight"] == 6
+
+    def test_edges_keep_their_stored_orientation(self):
+        graph = _snapshot()
+
+        assert graph.has_edge(4, 3)
+        assert not graph.has_edge(3, 4)
+        assert graph[4][3]["directional"] is True
+        assert [(source, target) for source, target in graph.edges()] == [(1, 2), (3, 1), (4, 3)]
+
+    def test_to_networkx_round_trips(self):
+        graph = _snapshot().to_networkx()
+
+        assert graph.number_of_nodes() == 4
+        assert graph[3][1]["relationship_type"] == "Family"
+
+    def test_survives_pickling(self):
+        graph = pickle.loads(pickle.dumps(_snapshot()))
+
+        assert graph.has_edge(1, 2)
+        assert graph.nodes[3]["name"] == "Loki"
+
+
+class TestShortestPathTree:
+    def test_walks_directional_edges_both_ways(self):
+        graph = _snapshot()
+
+        tree = graph.shortest_path_tree(graph.index_of(4))
+
+        # Odin -> Loki -> Thor -> Hela, even though Loki -> Thor is stored the
+        # other way round.
+        assert tree[graph.index_of(2)] == graph.index_of(1)
+        assert tree[graph.index_of(1)] == graph.index_of(3)
+        assert tree[graph.index_of(3)] == graph.index_of(4)
+
+    def test_unreachable_nodes_are_marked(self):
+        graph = GraphSnapshot.build({1: _node(1, "A"), 2: _node(2, "B")}, [])
+
+        assert list(graph.shortest_path_tree(0)) == [0, -1]
+
+
+def _diamond():
+    # 1 - 2 - 4 and 1 - 3 - 4 (two hops each, different weights), plus a
+    # three-hop detour 1 - 5 - 6 - 4.
+    nodes = {node_id: _node(node_id, f"N{node_id}") for node_id in range(1, 7)}
+    relationships = [
+        (1, 1, 2, "Variant", 1, False),
+        (2, 2, 4, "Variant", 1, False),
+        (3, 1, 3, "Enemy", 6, False),
+        (4, 3, 4, "Enemy", 6, False),
+        (5, 1, 5, "Ally", 4, False),
+        (6, 5, 6, "Ally", 4, False),
+        (7, 4, 6, "Ally", 4, True),
+    ]
+    return GraphSnapshot.build(nodes, relationships)
+
+
+class TestKShortestPaths:
+    def _ids(self, graph, paths):
+        return [[graph.node_ids[node] for node in path] for path in paths]
+
+    def test_ranks_by_hops_then_weight(self):
+        graph = _diamond()
+
+        paths = graph.k_shortest_paths(graph.index_of(1), graph.index_of(4), 5)
+
+        assert self._ids(graph, paths) == [[1, 2, 4], [1, 3, 4], [1, 5, 6, 4]]
+        assert [graph.path_cost(path) for path in paths] == [(2, 2), (2, 12), (3, 12)]
+
+    def test_k_limits_the_result(self):
+        graph = _diamond()
+
+        assert self._ids(graph, graph.k_shortest_paths(0, graph.index_of(4), 1)) == [[1, 2, 4]]
+
+    def test_paths_are_loopless_and_distinct(self):
+        graph = _diamond()
+
+        paths = graph.k_shortest_paths(graph.index_of(2), graph.index_of(3), 10)
+
+        assert len({tuple(path) for path in paths}) == len(paths)
+        for path in paths:
+            assert len(set(path)) == len(path)
+
+    def test_disconnected_nodes_have_no_paths(self):
+        graph = GraphSnapshot.build({1: _node(1, "A"), 2: _node(2, "B")}, [])
+
+        assert graph.k_shortest_paths(0, 1, 3) == []
+
+
+class TestNeighborhood:
+    def test_radius_bounds_the_hops(self):
+        graph = _diamond()
+
+        indices, truncated = graph.neighborhood(graph.index_of(1), 1)
+
+        assert sorted(graph.node_ids[index] for index in indices) == [1, 2, 3, 5]
+        assert truncated is False
+
+    def test_limit_keeps_the_lightest_links(self):
+        graph = _diamond()
+
+        indices, truncated = graph.neighborhood(graph.index_of(1), 2, limit=3)
+
+        # Variant (1) before Ally (4) before Enemy (6).
+        assert [graph.node_ids[index] for index in indices] == [1, 2, 5]
+        assert truncated is True
+
+    def test_subgraph_keeps_edges_among_the_selection(self):
+        graph = _diamond()
+
+        sub = graph.subgraph([graph.index_of(node_id) for node_id in (1, 2, 4)])
+
+        assert list(sub.nodes) == [1, 2, 4]
+        assert list(sub.edges()) == [(1, 2), (2, 4)]
+        assert sub.nodes[2]["name"] == "N2"
+
+
+class TestComponents:
+    def test_labels_follow_the_lowest_index(self):
+        graph = GraphSnapshot.build(
+            {node_id: _node(node_id, f"N{node_id}") for node_id in range(1, 6)},
+            [(1, 1, 3, "Ally", 4, False), (2, 2, 4, "Ally", 4, True), (3, 4, 5, "Ally", 4, False)],
+        )
+
+        assert list(graph.component_ids) == [0, 1, 0, 1, 1]
+        assert graph.connected(graph.index_of(2), graph.index_of(5))
+        assert not graph.connected(graph.index_of(1), graph.index_of(5))
+        assert graph.component(graph.index_of(4)) == {1, 3, 4}
@@ -0,0 +1,98 @@
+"""Tests for the release-order graph timeline behind ?as_of=."""
+
+from datetime import date
+from unittest.mock import MagicMock
+
+import pytest
+
+from connections.graph_service import MCUGraphService
+from connections.graph_snapshot import GraphSnapshot
+from connections.graph_timeline import GraphTimeline
+from connections.models import Character, Movie, Relationship
+
+
+pytestmark = pytest.mark.django_db
+
+IRON_MAN = date(2008, 5, 2)
+AVENGERS = date(2012, 5, 4)
+HOMECOMING = date(2017, 7, 7)
+
+
+def _nodes(*node_ids):
+    return {node_id: {"name": f"Character {node_id}"} for node_id in node_ids}
+
+
+class TestGraphTimeline:
+    def _timeline(self):
+        graph = GraphSnapshot.build(
+            _nodes(1, 2, 3, 4),
+            [
+                (10, 1, 2, "Ally", 4, False),
+                (11, 2, 3, "Ally", 4, False),
+                (12, 1, 3, "Mentor", 3, True),
+                (13, 3, 4, "Enemy", 6, False),
+            ],
+        )
+        appearances = [(1, IRON_MAN), (2, AVENGERS), (2, IRON_MAN), (3, HOMECOMING)]
+        return GraphTimeline.build(graph, {1: IRON_MAN}, appearances)
+
+    def test_rows_are_visible_once_both_characters_have_appeared(self):
+        timeline = self._timeline()
+
+        assert [row[0] for row in timeline.rows_as_of(date(2008, 1, 1))] == []
+        assert [row[0] for row in timeline.rows_as_of(AVENGERS)] == [10]
+        assert sorted(row[0] for row in timeline.rows_as_of(HOMECOMING)) == [10, 11, 12]
+
+    def test_characters_without_a_dated_appearance_never_appear(self):
+        snapshot = self._timeline().snapshot(date(2030, 1, 1))
+
+        assert 4 not in snapshot
+        assert snapshot.number_of_edges() == 3
+
+    def test_each_snapshot_extends_the_one_before(self):
+        timeline = self._timeline()
+
+        earlier = timeline.rows_as_of(IRON_MAN)
+        later = timeline.rows_as_of(HOMECOMING)
+
+        assert later[:len(earlier)] == earlier
+
+    def test_dates_between_first_appearances_share_a_cutoff(self):
+        timeline = self._timeline()
+
+        assert timeline.cutoff(AVENGERS) == IRON_MAN
+        assert timeline.cutoff(HOMECOMING) == HOMECOMING
+        assert timeline.cutoff(date(2000, 1, 1)) is None
+        assert len(timeline.snapshot(None)) == 0
+
+
+class TestServiceAsOf:
+    def test_snapshot_and_path_trees_are_reused(self, monkeypatch):
+        iron_man = Movie.objects.create(title="Iron Man", release_date=IRON_MAN)
+        homecoming = Movie.objects.create(title="Homecoming", release_date=HOMECOMING)
+        tony = Character.objects.create(name="Tony Stark", movie_introduced=iron_man)
+        happy = Character.objects.create(name="Happy Hogan", movie_introduced=iron_man)
+        peter = Character.objects.create(name="Peter Parker", movie_introduced=homecoming)
+        Relationship.objects.create(character1=tony, character2=happy, relationship_type="Ally")
+        Relationship.objects.create(character1=tony, character2=peter, relationship_type="Mentor")
+        service = MCUGraphService()
+        service.shortest_path(tony.id, happy.id, as_of=AVENGERS)
+
+        monkeypatch.setattr(GraphSnapshot, "build", MagicMock(side_effect=AssertionError("snapshot was rebuilt")))
+        monkeypatch.setattr(GraphSnapshot, "shortest_path_tree", MagicMock(side_effect=AssertionError("tree was rebuilt")))
+        path = service.shortest_path(happy.id, tony.id, as_of=IRON_MAN)
+
+        assert path["character_ids"] == [happy.id, tony.id]
+
+    def test_moving_a_release_date_moves_the_timeline(self):
+        iron_man = Movie.objects.create(title="Iron Man", release_date=IRON_MAN)
+        tony = Character.objects.create(name="Tony Stark", movie_introduced=iron_man)
+        happy = Character.objects.create(name="Happy Hogan", movie_introduced=iron_man)
+        Relationship.objects.create(character1=tony, character2=happy, relationship_type="Ally")
+        service = MCUGraphService()
+        assert service.build_graph_as_of(AVENGERS)[1].number_of_edges() == 1
+
+        iron_man.release_date = HOMECOMING
+        iron_man.save()
+
+        assert service.build_graph_as_of(AVENGERS)[1].number_of_edges() == 0
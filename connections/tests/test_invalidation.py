@@ -0,0 +1,154 @@
+"""Tests for deferred_invalidation(), which collapses signal storms into one bump per cache."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+from connections.admin_index import RelationshipAdminIndex
+from connections.graph_service import MCUGraphService
+from connections.invalidation import deferred_invalidation
+from connections.models import Character, Relationship, WatchEntry, WatchTrack
+from connections.watch_order_service import WatchOrderService
+
+
+# Graph patches wait for the surrounding transaction to commit, so these run
+# against real commits rather than inside a rolled-back test transaction.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _versions():
+    return (
+        MCUGraphService()._get_cache_version(),
+        RelationshipAdminIndex._get_cache_version(),
+        WatchOrderService()._get_cache_version(),
+    )
+
+
+def _characters(*names):
+    return [Character.objects.create(name=name) for name in names]
+
+
+class TestDeferredInvalidation:
+    def test_many_saves_bump_each_cache_once(self):
+        steve, bucky, sam, wanda = _characters("Steve Rogers", "Bucky Barnes", "Sam Wilson", "Wanda Maximoff")
+        track = WatchTrack.objects.create(name="Infinity Saga", slug="infinity-saga")
+        graph_before, admin_before, watch_before = _versions()
+
+        with deferred_invalidation():
+            Relationship.objects.create(character1=steve, character2=bucky, relationship_type="Ally")
+            Relationship.objects.create(character1=steve, character2=sam, relationship_type="Ally")
+            Relationship.objects.create(character1=sam, character2=wanda, relationship_type="Ally")
+            for position in range(3):
+                WatchEntry.objects.create(track=track, title=f"Entry {position}", slug=f"entry-{position}", position=position)
+            assert _versions() == (graph_before, admin_before, watch_before)
+
+        assert _versions() == (graph_before + 1, admin_before + 1, watch_before + 1)
+
+    def test_a_lone_edit_is_still_patched_rather_than_rebuilt(self, monkeypatch):
+        service = MCUGraphService()
+        steve, bucky = _characters("Steve Rogers", "Bucky Barnes")
+        service.build_graph()
+
+        with deferred_invalidation():
+            relationship = Relationship.objects.create(character1=steve, character2=bucky, relationship_type="Ally")
+
+        monkeypatch.setattr(
+            MCUGraphService,
+            "_build_graph_from_relationships",
+            MagicMock(side_effect=AssertionError("graph was rebuilt")),
+        )
+        assert service.build_graph()[steve.id][bucky.id]["relationship_ids"] == [relationship.id]
+
+    def test_a_deferred_delete_is_patched_out(self):
+        service = MCUGraphService()
+        steve, bucky = _characters("Steve Rogers", "Bucky Barnes")
+        relationship = Relationship.objects.create(character1=steve, character2=bucky, relationship_type="Ally")
+        service.build_graph()
+        RelationshipAdminIndex.current()
+
+        with deferred_invalidation():
+            relationship.delete()
+
+        assert service.build_graph().number_of_edges() == 0
+        assert RelationshipAdminIndex.current().adjacency() == {}
+
+    def test_character_details_are_dropped_together(self):
+        service = MCUGraphService()
+        tony, peter = _characters("Tony Stark", "Peter Parker")
+        service.character_detail_payloads([tony.id, peter.id])
+
+        with deferred_invalidation():
+            tony.save()
+            peter.save()
+            assert cache.get(service._character_details_key(tony.id)) is not None
+
+        assert cache.get_many([service._character_details_key(tony.id), service._character_details_key(peter.id)]) == {}
+
+    def test_nested_blocks_flush_with_the_outermost(self):
+        graph_before = MCUGraphService()._get_cache_version()
+
+        with deferred_invalidation():
+            with deferred_invalidation():
+                _characters("Thor", "Loki")
+            assert MCUGraphService()._get_cache_version() == graph_before
+
+        assert MCUGraphService()._get_cache_version() == graph_before + 1
+
+    def test_held_invalidations_run_when_the_block_raises(self):
+        graph_before = MCUGraphService()._get_cache_version()
+
+        with pytest.raises(RuntimeError):
+            with deferred_invalidation():
+                _characters("Hela")
+                raise RuntimeError
+
+        assert MCUGraphService()._get_cache_version() == graph_before + 1
+
+    def test_works_as_a_decorator(self):
+        graph_before = MCUGraphService()._get_cache_version()
+
+        @deferred_invalidation()
+        def create_roster():
+            _characters("Natasha Romanoff", "Clint Barton", "Yelena Belova")
+
+        create_roster()
+
+        assert MCUGraphService()._get_cache_version() == graph_before + 1
+
+
+class TestAdminWiring:
+    def test_bulk_delete_bumps_the_graph_once(self, client, superuser):
+        steve, bucky, sam, wanda = _characters("Steve Rogers", "Bucky Barnes", "Sam Wilson", "Wanda Maximoff")
+        relationships = [
+            Relationship.objects.create(character1=steve, character2=other, relationship_type="Ally")
+            for other in (bucky, sam, wanda)
+        ]
+        client.force_login(superuser)
+        graph_before = MCUGraphService()._get_cache_version()
+
+        client.post(
+            reverse("admin:connections_relationship_bulk_delete"),
+            {"character": steve.id, "delete_ids": [relationship.id for relationship in relationships]},
+        )
+
+        assert not Relationship.objects.exists()
+        assert MCUGraphService()._get_cache_version() == graph_before + 1
+
+    def test_changelist_actions_bump_the_graph_once(self, client, superuser):
+        characters = _characters("Thor", "Loki", "Hela")
+        client.force_login(superuser)
+        graph_before = MCUGraphService()._get_cache_version()
+
+        client.post(
+            reverse("admin:connections_character_changelist"),
+            {
+                "action": "delete_selected",
+                "_selected_action": [character.id for character in characters],
+                "post": "yes",
+            },
+        )
+
+        assert not Character.objects.exists()
+        assert MCUGraphService()._get_cache_version() == graph_before + 1
@@ -0,0 +1,221 @@
+"""Tests for the bulk relationship write path behind the admin's bulk tools."""
+
+from unittest import mock
+
+import pytest
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from connections.admin_index import RelationshipAdminIndex
+from connections.graph_service import MCUGraphService
+from connections import relationship_writes
+from connections.models import Character, Relationship
+from connections.relationship_writes import (
+    CREATED,
+    EXISTS,
+    MISSING_CHARACTER,
+    SELF_RELATIONSHIP,
+    UNKNOWN_TYPE,
+    RelationshipRow,
+    write_relationships,
+)
+
+
+pytestmark = pytest.mark.django_db
+
+
+def _characters(count):
+    return [Character.objects.create(name=f"Character {index}") for index in range(count)]
+
+
+def _clique_rows(characters, relationship_type="Ally"):
+    return [
+        RelationshipRow(first.id, second.id, relationship_type)
+        for position, first in enumerate(characters)
+        for second in characters[position + 1:]
+    ]
+
+
+class TestWriteRelationships:
+    def test_creates_rows_with_their_type_weight(self):
+        tony, peter = _characters(2)
+
+        result = write_relationships([RelationshipRow(tony.id, peter.id, "Family", notes="Found family")])
+
+        assert result.outcomes == [CREATED]
+        relationship = Relationship.objects.get()
+        assert relationship.weight == Relationship.WEIGHTS["Family"]
+        assert relationship.notes == "Found family"
+
+    def test_reports_each_invalid_row(self):
+        tony, peter = _characters(2)
+        Relationship.objects.create(character1=peter, character2=tony, relationship_type="Ally")
+
+        result = write_relationships([
+            RelationshipRow(tony.id, peter.id, "Ally"),
+            RelationshipRow(tony.id, tony.id, "Ally"),
+            RelationshipRow(tony.id, 999999, "Ally"),
+            RelationshipRow(tony.id, peter.id, "Nemesis"),
+            RelationshipRow(tony.id, peter.id, "Enemy"),
+            RelationshipRow(peter.id, tony.id, "Enemy"),
+        ])
+
+        assert result.outcomes == [EXISTS, SELF_RELATIONSHIP, MISSING_CHARACTER, UNKNOWN_TYPE, CREATED, EXISTS]
+        assert result.names == {tony.id: tony.name, peter.id: peter.name}
+        assert Relationship.objects.count() == 2
+
+    def test_directional_rows_only_match_in_their_own_direction(self):
+        tony, peter = _characters(2)
+        Relationship.objects.create(character1=tony, character2=peter, relationship_type="Mentor", directional=True)
+
+        result = write_relationships([
+            RelationshipRow(tony.id, peter.id, "Mentor", True),
+            RelationshipRow(peter.id, tony.id, "Mentor", True),
+        ])
+
+        assert result.outcomes == [EXISTS, CREATED]
+
+    def test_a_row_inserted_by_someone_else_meanwhile_is_reported_as_existing(self):
+        tony, peter, bucky = _characters(3)
+        match_key = relationship_writes._match_key
+
+        def insert_first(*args):
+            # Lands after the submission was checked but before it is written.
+            if not Relationship.objects.exists():
+                Relationship.objects.create(character1=tony, character2=peter, relationship_type="Ally")
+            return match_key(*args)
+
+        with mock.patch.object(relationship_writes, "_match_key", side_effect=insert_first):
+            result = write_relationships([
+                RelationshipRow(tony.id, peter.id, "Ally"),
+                RelationshipRow(tony.id, bucky.id, "Ally"),
+            ])
+
+        assert result.outcomes == [EXISTS, CREATED]
+        assert Relationship.objects.count() == 2
+
+    def test_a_submission_whose_rows_all_conflict_leaves_the_caches_alone(self):
+        tony, peter = _characters(2)
+        match_key = relationship_writes._match_key
+
+        def insert_first(*args):
+            # The only row is stored by someone else before the batch lands.
+            if not Relationship.objects.exists():
+                Relationship.objects.create(character1=tony, character2=peter, relationship_type="Ally")
+            return match_key(*args)
+
+        with mock.patch.object(relationship_writes, "_match_key", side_effect=insert_first), \
+                mock.patch.object(MCUGraphService, "invalidate_cache") as graph:
+            result = write_relationships([RelationshipRow(tony.id, peter.id, "Ally")])
+
+        assert result.outcomes == [EXISTS]
+        assert Relationship.objects.count() == 1
+        graph.assert_not_called()
+
+    def test_an_unrelated_integrity_error_is_raised(self):
+        tony, peter = _characters(2)
+
+        with mock.patch.object(Relationship.objects, "bulk_create", side_effect=IntegrityError), \
+                pytest.raises(IntegrityError):
+            write_relationships([RelationshipRow(tony.id, peter.id, "Ally")])
+
+    def test_unordered_skips_the_reverse_of_a_directional_relationship(self):
+        tony, peter = _characters(2)
+        Relationship.objects.create(character1=tony, character2=peter, relationship_type="Mentor", directional=True)
+
+        result = write_relationships([RelationshipRow(peter.id, tony.id, "Mentor", True)], unordered=True)
+
+        assert result.outcomes == [EXISTS]
+        assert Relationship.objects.count() == 1
+
+    def test_query_count_does_not_grow_with_the_submission(self):
+        characters = _characters(12)
+
+        with CaptureQueriesContext(connection) as small:
+            write_relationships(_clique_rows(characters[:3]))
+        with CaptureQueriesContext(connection) as large:
+            write_relationships(_clique_rows(characters, "Enemy"))
+
+        assert Relationship.objects.count() == 3 + 66
+        assert len(large.captured_queries) == len(small.captured_queries)
+
+    def test_invalidates_each_cache_once(self):
+        characters = _characters(5)
+
+        with mock.patch.object(MCUGraphService, "invalidate_cache") as graph, \
+                mock.patch.object(RelationshipAdminIndex, "invalidate_cache") as admin_index:
+            write_relationships(_clique_rows(characters))
+
+        graph.assert_called_once_with()
+        admin_index.assert_called_once_with()
+
+    def test_nothing_new_leaves_the_caches_alone(self):
+        tony, peter = _characters(2)
+        Relationship.objects.create(character1=tony, character2=peter, relationship_type="Ally")
+
+        with mock.patch.object(MCUGraphService, "invalidate_cache") as graph:
+            write_relationships([RelationshipRow(tony.id, peter.id, "Ally")])
+
+        graph.assert_not_called()
+
+
+class TestAdminBulkTools:
+    def test_bulk_add_reports_rows_and_creates_the_rest(self, client, superuser):
+        tony, peter, happy = _characters(3)
+        Relationship.objects.create(character1=tony, character2=peter, relationship_type="Ally")
+        client.force_login(superuser)
+
+        response = client.post(
+            reverse("admin:connections_relationship_bulk_add"),
+            {
+                "source_character": tony.id,
+                "rows-0-character2": peter.id,
+                "rows-0-relationship_type": "Ally",
+                "rows-1-character2": happy.id,
+                "rows-1-relationship_type": "Mentor",
+                "rows-1-directional": "on",
+                "rows-1-direction": "reverse",
+                "rows-2-character2": tony.id,
+                "rows-2-relationship_type": "Ally",
+                "_save": "1",
+            },
+            follow=True,
+        )
+
+        messages = [str(message) for message in response.context["messages"]]
+        assert f"Already exists: {tony.name} ↔ {peter.name} (Ally)" in messages
+        assert "Row 3: a character can't be related to themself." in messages
+        assert "Created 1 relationship(s)." in messages
+        mentor = Relationship.objects.get(relationship_type="Mentor")
+        assert (mentor.character1_id, mentor.character2_id, mentor.directional) == (happy.id, tony.id, True)
+
+    def test_clique_add_skips_existing_pairs_in_either_order(self, client, superuser):
+        characters = _characters(4)
+        Relationship.objects.create(character1=characters[1], character2=characters[0], relationship_type="Ally")
+        client.force_login(superuser)
+
+        client.post(
+            reverse("admin:connections_relationship_clique_add"),
+            {"mode": "clique", "clique_Ally": [character.id for character in characters], "_save": "1"},
+        )
+
+        assert Relationship.objects.filter(relationship_type="Ally").count() == 6
+
+    def test_clique_source_mode_skips_the_reverse_of_a_directional_pair(self, client, superuser):
+        tony, peter = _characters(2)
+        Relationship.objects.create(character1=tony, character2=peter, relationship_type="Mentor", directional=True)
+        client.force_login(superuser)
+
+        client.post(
+            reverse("admin:connections_relationship_clique_add"),
+            {
+                "mode": "source",
+                "sources": [peter.id],
+                "clique_Mentor": [tony.id],
+                "directional_Mentor": "on",
+                "_save": "1",
+            },
+        )
+
+        assert Relationship.objects.filter(relationship_type="Mentor").count() == 1
@@ -1,14 +1,20 @@
 """Tests for the connections post_save signals that invalidate the graph cache."""
 
+from unittest.mock import MagicMock
+
 import pytest
 from django.core.cache import cache
+from django.db import transaction
 from django.urls import reverse
 
 from connections.graph_service import MCUGraphService
-from connections.models import Character, Relationship
+from connections.graph_snapshot import GraphSnapshot
+from connections.models import AlterEgo, Character, Movie, Relationship, Team, TeamMembership
 
 
-pytestmark = pytest.mark.django_db
+# Graph patches wait for the surrounding transaction to commit, so these run
+# against real commits rather than inside a rolled-back test transaction.
+pytestmark = pytest.mark.django_db(transaction=True)
 
 
 class TestCharacterSaveSignal:
@@ -107,3 +113,203 @@ class TestRelationshipSaveSignal:
         rebuilt = service.build_graph()
         assert rebuilt.number_of_edges() == 2
         assert rebuilt.has_edge(wanda.id, pietro.id)
+
+
+class TestIncrementalGraphPatches:
+    def _warm(self, service):
+        return service.build_graph()
+
+    def test_new_relationship_patches_the_cached_graph_without_a_rebuild(self, monkeypatch):
+        service = MCUGraphService()
+        sam = Character.objects.create(name="Sam Wilson")
+        bucky = Character.objects.create(name="Bucky Barnes")
+        steve = Character.objects.create(name="Steve Rogers")
+        Relationship.objects.create(character1=sam, character2=bucky, relationship_type="Ally")
+        self._warm(service)
+
+        relationship = Relationship.objects.create(character1=steve, character2=bucky, relationship_type="Ally")
+
+        monkeypatch.setattr(
+            MCUGraphService,
+            "_build_graph_from_relationships",
+            MagicMock(side_effect=AssertionError("graph was rebuilt")),
+        )
+        graph = service.build_graph()
+        assert graph.has_edge(steve.id, bucky.id)
+        assert graph[steve.id][bucky.id]["relationship_ids"] == [relationship.id]
+
+    def test_a_rolled_back_save_leaves_the_cached_graph_alone(self):
+        service = MCUGraphService()
+        steve = Character.objects.create(name="Steve Rogers")
+        bucky = Character.objects.create(name="Bucky Barnes")
+        self._warm(service)
+        version = service._get_cache_version()
+
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                Relationship.objects.create(character1=steve, character2=bucky, relationship_type="Ally")
+                raise RuntimeError("a later write in the same block failed")
+
+        assert service._get_cache_version() == version
+        assert not service.build_graph().has_edge(steve.id, bucky.id)
+
+    def test_patched_graph_matches_a_fresh_build(self):
+        service = MCUGraphService()
+        thor = Character.objects.create(name="Thor")
+        loki = Character.objects.create(name="Loki")
+        hela = Character.objects.create(name="Hela")
+        Relationship.objects.create(character1=thor, character2=loki, relationship_type="Family")
+        self._warm(service)
+
+        Relationship.objects.create(character1=thor, character2=hela, relationship_type="Enemy")
+        Relationship.objects.create(character1=hela, character2=thor, relationship_type="Family", directional=True)
+        Relationship.objects.filter(relationship_type="Family", character1=thor).first().delete()
+        thor.name = "Thor Odinson"
+        thor.save()
+
+        patched = service.build_graph()
+        fresh = service._build_graph_from_relationships(Relationship.objects.all(), include_details=False)
+        assert sorted(patched.rows()) == sorted(fresh.rows())
+        assert list(patched.nodes) == list(fresh.nodes)
+        assert patched.nodes[thor.id]["name"] == "Thor Odinson"
+
+    def test_deleting_a_relationship_removes_its_edge(self):
+        service = MCUGraphService()
+        wanda = Character.objects.create(name="Wanda Maximoff")
+        vision = Character.objects.create(name="Vision")
+        relationship = Relationship.objects.create(character1=wanda, character2=vision, relationship_type="Romantic")
+        assert self._warm(service).number_of_edges() == 1
+
+        relationship.delete()
+
+        assert service.build_graph().number_of_edges() == 0
+
+    def test_path_trees_follow_a_new_shortcut(self):
+        service = MCUGraphService()
+        a, b, c = (Character.objects.create(name=name) for name in ("A", "B", "C"))
+        Relationship.objects.create(character1=a, character2=b, relationship_type="Ally")
+        Relationship.objects.create(character1=b, character2=c, relationship_type="Ally")
+        assert service.shortest_path(a.id, c.id)["character_ids"] == [a.id, b.id, c.id]
+
+        Relationship.objects.create(character1=c, character2=a, relationship_type="Enemy")
+
+        assert service.shortest_path(a.id, c.id)["character_ids"] == [a.id, c.id]
+        assert service.shortest_path(b.id, a.id)["character_ids"] == [b.id, a.id]
+
+    def test_rename_only_drops_filter_results_containing_the_character(self, monkeypatch):
+        service = MCUGraphService()
+        carol = Character.objects.create(name="Carol Danvers", alignment="Hero")
+        thanos = Character.objects.create(name="Thanos", alignment="Villain")
+        Relationship.objects.create(character1=carol, character2=thanos, relationship_type="Enemy")
+        self._warm(service)
+        service.filtered_subgraph(alignment=["Hero"])
+        service.filtered_subgraph(alignment=["Villain"])
+
+        thanos.name = "The Mad Titan"
+        thanos.save()
+
+        hero_key = service._cache_key(f"filtered:{service.filter_key(alignment=['Hero'])}")
+        villain_key = service._cache_key(f"filtered:{service.filter_key(alignment=['Villain'])}")
+        assert cache.get(hero_key) is not None
+        assert cache.get(villain_key) is None
+
+    def test_alignment_change_drops_every_filter_result(self):
+        service = MCUGraphService()
+        carol = Character.objects.create(name="Carol Danvers", alignment="Hero")
+        thanos = Character.objects.create(name="Thanos", alignment="Villain")
+        Relationship.objects.create(character1=carol, character2=thanos, relationship_type="Enemy")
+        self._warm(service)
+        service.filtered_subgraph(alignment=["Hero"])
+
+        thanos.alignment = "Hero"
+        thanos.save()
+
+        graph, _ = service.filtered_subgraph(alignment=["Hero"])
+        assert set(graph.nodes) == {carol.id, thanos.id}
+
+    def test_attribute_index_is_patched_rather_than_rebuilt(self, monkeypatch):
+        service = MCUGraphService()
+        nebula = Character.objects.create(name="Nebula", alignment="Villain")
+        gamora = Character.objects.create(name="Gamora", alignment="Hero")
+        Relationship.objects.create(character1=nebula, character2=gamora, relationship_type="Family")
+        service.filtered_subgraph()
+
+        nebula.alignment = "Hero"
+        nebula.save()
+        Relationship.objects.create(character1=gamora, character2=nebula, relationship_type="Enemy")
+
+        monkeypatch.setattr(
+            MCUGraphService,
+            "_build_attribute_index",
+            MagicMock(side_effect=AssertionError("attribute index was rebuilt")),
+        )
+        graph, _ = service.filtered_subgraph(alignment=["Hero"], relationship_types=["Enemy"])
+        assert set(graph.nodes) == {nebula.id, gamora.id}
+        assert graph.has_edge(gamora.id, nebula.id)
+
+    def test_path_trees_outside_the_change_are_carried(self, monkeypatch):
+        service = MCUGraphService()
+        a, b, c, d = (Character.objects.create(name=name) for name in ("A", "B", "C", "D"))
+        Relationship.objects.create(character1=a, character2=b, relationship_type="Ally")
+        Relationship.objects.create(character1=c, character2=d, relationship_type="Ally")
+        service.shortest_path(a.id, b.id)
+        service.shortest_path(c.id, d.id)
+
+        Relationship.objects.create(character1=d, character2=c, relationship_type="Enemy")
+
+        monkeypatch.setattr(
+            GraphSnapshot,
+            "shortest_path_tree",
+            MagicMock(side_effect=AssertionError("tree was rebuilt")),
+        )
+        assert service.shortest_path(b.id, a.id)["character_ids"] == [b.id, a.id]
+
+
+class TestCharacterDetailInvalidation:
+    def _details(self, character):
+        return MCUGraphService().character_detail_payload(character.id)
+
+    def test_alias_team_and_movie_edits_refresh_only_that_character(self):
+        steve = Character.objects.create(name="Steve Rogers")
+        bucky = Character.objects.create(name="Bucky Barnes")
+        bucky_details = self._details(bucky)
+        self._details(steve)
+
+        AlterEgo.objects.create(character=steve, name="Captain America")
+        team = Team.objects.create(name="Avengers")
+        TeamMembership.objects.create(character=steve, team=team)
+        movie = Movie.objects.create(title="The First Avenger", release_date="2011-07-22")
+        movie.characters.add(steve)
+
+        details = self._details(steve)
+        assert details["aliases"] == ["Captain America"]
+        assert details["teams"] == [{"name": "Avengers", "status": "Current"}]
+        assert [entry["title"] for entry in details["movies"]] == ["The First Avenger"]
+        assert cache.get(MCUGraphService._character_details_key(bucky.id)) == bucky_details
+
+    def test_renaming_a_team_or_movie_refreshes_its_characters(self):
+        steve = Character.objects.create(name="Steve Rogers")
+        team = Team.objects.create(name="Avengers")
+        TeamMembership.objects.create(character=steve, team=team)
+        movie = Movie.objects.create(title="First Avenger", release_date="2011-07-22")
+        steve.movies.add(movie)
+        self._details(steve)
+
+        team.name = "New Avengers"
+        team.save()
+        movie.title = "Captain America: The First Avenger"
+        movie.save()
+
+        details = self._details(steve)
+        assert details["teams"][0]["name"] == "New Avengers"
+        assert details["movies"][0]["title"] == "Captain America: The First Avenger"
+
+    def test_deleting_a_movie_refreshes_its_characters(self):
+        steve = Character.objects.create(name="Steve Rogers")
+        movie = Movie.objects.create(title="The First Avenger", release_date="2011-07-22")
+        movie.characters.add(steve)
+        self._details(steve)
+
+        movie.delete()
+
+        assert self._details(steve)["movies"] == []
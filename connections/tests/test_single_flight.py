@@ -0,0 +1,79 @@
+"""Tests for single-flight rebuilds of cached values."""
+
+import threading
+from unittest.mock import MagicMock
+
+from django.core.cache import cache
+
+from connections import single_flight as single_flight_module
+from connections.single_flight import single_flight
+
+
+def _builder(key, value="built", started=None, release=None):
+    calls = []
+
+    def build():
+        calls.append(1)
+        if started is not None:
+            started.set()
+        if release is not None:
+            release.wait(5)
+        cache.set(key, value)
+        return value
+
+    return build, calls
+
+
+class TestSingleFlight:
+    def test_hit_never_builds(self):
+        cache.set("value", "cached")
+        build = MagicMock()
+
+        assert single_flight("value:lock", lambda: cache.get("value"), build) == "cached"
+        build.assert_not_called()
+
+    def test_miss_builds_and_releases_the_lock(self):
+        build, calls = _builder("value")
+
+        assert single_flight("value:lock", lambda: cache.get("value"), build) == "built"
+        assert calls == [1]
+        assert cache.get("value:lock") is None
+
+    def test_concurrent_misses_build_once(self, monkeypatch):
+        monkeypatch.setattr(single_flight_module, "POLL_INTERVAL", 0.01)
+        started, release = threading.Event(), threading.Event()
+        build, calls = _builder("value", started=started, release=release)
+        results = []
+
+        def request():
+            results.append(single_flight("value:lock", lambda: cache.get("value"), build))
+
+        builder = threading.Thread(target=request)
+        builder.start()
+        started.wait(5)
+        waiters = [threading.Thread(target=request) for _ in range(4)]
+        for waiter in waiters:
+            waiter.start()
+        release.set()
+        for thread in [builder, *waiters]:
+            thread.join(5)
+
+        assert calls == [1]
+        assert results == ["built"] * 5
+
+    def test_serves_stale_while_someone_else_rebuilds(self):
+        cache.add("value:lock", "someone-else")
+        build = MagicMock()
+
+        value = single_flight("value:lock", lambda: cache.get("value"), build, stale=lambda: "previous")
+
+        assert value == "previous"
+        build.assert_not_called()
+
+    def test_builds_itself_when_the_other_builder_gives_up(self, monkeypatch):
+        monkeypatch.setattr(single_flight_module, "POLL_INTERVAL", 0.01)
+        cache.add("value:lock", "someone-else", 0.05)
+        build, calls = _builder("value")
+
+        assert single_flight("value:lock", lambda: cache.get("value"), build) == "built"
+        assert calls == [1]
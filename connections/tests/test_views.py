@@ -1,12 +1,19 @@
 """Tests for the connections app views (API endpoints + graph page)."""
 
+import gzip
+import json
+import queue
+import threading
+import time
 from unittest.mock import MagicMock
 
 import pytest
+from django.core.cache import cache
 from django.urls import reverse
 
+from connections import graph_service as graph_service_module
 from connections import views as connections_views
-from connections.models import Character, Earth, Movie, Relationship, Team
+from connections.models import AlterEgo, Character, Earth, Movie, Relationship, Team
 
 
 pytestmark = pytest.mark.django_db
@@ -25,6 +32,19 @@ def _relationship(character1, character2, relationship_type="Ally", directional=
     )
 
 
+def _timeline_cast():
+    """Tony and Happy from Iron Man, Peter from Homecoming, with Tony mentoring Peter."""
+    iron_man = Movie.objects.create(title="Iron Man", release_date="2008-05-02")
+    homecoming = Movie.objects.create(title="Spider-Man: Homecoming", release_date="2017-07-07")
+    tony = _character("Tony Stark", movie_introduced=iron_man)
+    happy = _character("Happy Hogan", movie_introduced=iron_man)
+    peter = _character("Peter Parker", movie_introduced=homecoming)
+    _relationship(tony, happy)
+    _relationship(happy, peter)
+    _relationship(tony, peter, relationship_type="Mentor")
+    return tony, happy, peter
+
+
 class TestGraphView:
     def test_returns_nodes_and_edges_in_cytoscape_shape(self, client):
         tony = _character("Tony Stark")
@@ -35,7 +55,7 @@ class TestGraphView:
 
         assert response.status_code == 200
         payload = response.json()
-        assert set(payload.keys()) == {"nodes", "edges"}
+        assert set(payload.keys()) == {"nodes", "edges", "version"}
 
         node_ids = {node["data"]["id"] for node in payload["nodes"]}
         assert node_ids == {str(tony.id), str(peter.id)}
@@ -58,13 +78,223 @@ class TestGraphView:
         response = client.get(reverse("graph"))
 
         assert response.status_code == 200
-        assert response.json() == {"nodes": [], "edges": []}
+        payload = response.json()
+        assert (payload["nodes"], payload["edges"]) == ([], [])
 
     def test_rejects_non_get(self, client):
         response = client.post(reverse("graph"))
 
         assert response.status_code == 405
 
+    def test_nodes_carry_server_settled_positions(self, client):
+        _relationship(_character("Tony Stark"), _character("Peter Parker"))
+        service = connections_views.graph_service
+        service.compute_layout(service.build_graph())
+
+        payload = client.get(reverse("graph")).json()
+
+        for node in payload["nodes"]:
+            assert set(node["position"]) == {"x", "y"}
+        first, second = (node["position"] for node in payload["nodes"])
+        assert (first["x"], first["y"]) != (second["x"], second["y"])
+
+    def test_a_request_never_runs_the_layout_itself(self, client, monkeypatch):
+        """The simulation takes seconds on a large graph; the browser settles an unpositioned payload."""
+        _relationship(_character("Tony Stark"), _character("Peter Parker"))
+        spy = MagicMock(side_effect=AssertionError("layout ran on the request"))
+        monkeypatch.setattr(graph_service_module, "force_layout", spy)
+        cache_set = MagicMock(wraps=cache.set)
+        monkeypatch.setattr(cache, "set", cache_set)
+
+        payload = client.get(reverse("graph")).json()
+
+        assert not any("position" in node for node in payload["nodes"])
+        payload_key = connections_views.graph_service._cache_key("full-payload")
+        timeouts = [call.args[2] for call in cache_set.call_args_list if call.args[0] == payload_key]
+        assert timeouts == [connections_views.graph_service.LAYOUT_PENDING_TIMEOUT]
+
+    def test_a_missing_layout_is_settled_in_the_background(self, client, settings):
+        settings.CONNECTIONS_LAYOUT_IN_BACKGROUND = True
+        _relationship(_character("Tony Stark"), _character("Peter Parker"))
+        service = connections_views.graph_service
+
+        client.get(reverse("graph"))
+
+        layout_key = service._layout_key(None, service._get_cache_version())
+        for _ in range(100):
+            if cache.get(layout_key) is not None:
+                break
+            time.sleep(0.05)
+        assert set(cache.get(layout_key)) == {node.id for node in Character.objects.all()}
+
+    def test_layout_misses_share_one_bounded_worker(self, settings, monkeypatch):
+        """A crawl through filter combinations must not start a simulation per miss."""
+        settings.CONNECTIONS_LAYOUT_IN_BACKGROUND = True
+        started, release = threading.Event(), threading.Event()
+
+        def blocked_layout(graph, seed=None):
+            started.set()
+            release.wait(5)
+            return {}
+
+        monkeypatch.setattr(graph_service_module, "force_layout", blocked_layout)
+        monkeypatch.setattr(graph_service_module, "_layout_queue", queue.Queue(maxsize=2))
+        monkeypatch.setattr(graph_service_module, "_layouts_queued", set())
+        monkeypatch.setattr(graph_service_module, "_layout_worker", None)
+        service = connections_views.graph_service
+        graph = service.build_graph()
+        workers_before = sum(thread.name == "connections-layout" for thread in threading.enumerate())
+        try:
+            service.graph_layout(graph, filter_key="first")
+            assert started.wait(5)
+            for index in range(10):
+                service.graph_layout(graph, filter_key=f"crawl-{index}")
+            service.graph_layout(graph, filter_key="crawl-0")
+
+            workers = sum(thread.name == "connections-layout" for thread in threading.enumerate())
+            assert workers == workers_before + 1
+            assert graph_service_module._layout_queue.qsize() == 2
+        finally:
+            release.set()
+
+    def test_layout_is_reused_within_a_version(self, client, monkeypatch):
+        _relationship(_character("Tony Stark"), _character("Peter Parker"))
+        service = connections_views.graph_service
+        service.compute_layout(service.build_graph())
+        client.get(reverse("graph"))
+        # Drop the encoded payloads but keep the layouts.
+        cache.delete(service._cache_key("full-payload"))
+
+        spy = MagicMock(side_effect=AssertionError("layout was recomputed"))
+        monkeypatch.setattr(graph_service_module, "force_layout", spy)
+
+        assert "position" in client.get(reverse("graph")).json()["nodes"][0]
+        spy.assert_not_called()
+
+    def test_serves_the_previous_payload_while_a_rebuild_is_in_flight(self, client):
+        tony = _character("Tony Stark")
+        _relationship(tony, _character("Peter Parker"))
+        before = client.get(reverse("graph"))
+
+        _relationship(tony, _character("Pepper Potts"), relationship_type="Romantic")
+        cache.add(f"{connections_views.graph_service._cache_key('full-payload')}:lock", "another-request")
+
+        during = client.get(reverse("graph"))
+
+        assert during.json() == before.json()
+        assert during["ETag"] == before["ETag"]
+
+    def test_serves_gzip_when_accepted(self, client):
+        _relationship(_character("Tony Stark"), _character("Happy Hogan"))
+
+        response = client.get(reverse("graph"), headers={"Accept-Encoding": "gzip, deflate"})
+
+        assert response.status_code == 200
+        assert response["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response["Vary"]
+        assert len(json.loads(gzip.decompress(response.content))["nodes"]) == 2
+
+    def test_matching_etag_gets_a_bodyless_304(self, client):
+        _character("Tony Stark")
+        etag = client.get(reverse("graph"))["ETag"]
+
+        response = client.get(reverse("graph"), headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response["ETag"] == etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_etag_changes_after_an_edit(self, client):
+        tony = _character("Tony Stark")
+        etag = client.get(reverse("graph"))["ETag"]
+
+        _relationship(tony, _character("Pepper Potts"), relationship_type="Romantic")
+        response = client.get(reverse("graph"), headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        assert len(response.json()["edges"]) == 1
+
+    def test_as_of_hides_characters_introduced_later(self, client):
+        tony, happy, peter = _timeline_cast()
+        homecoming = peter.movie_introduced
+        iron_man = tony.movie_introduced
+
+        early = client.get(reverse("graph"), {"as_of": iron_man.id}).json()
+        late = client.get(reverse("graph"), {"as_of": homecoming.id}).json()
+
+        assert {node["data"]["id"] for node in early["nodes"]} == {str(tony.id), str(happy.id)}
+        assert {node["data"]["id"] for node in late["nodes"]} == {str(tony.id), str(happy.id), str(peter.id)}
+
+    def test_as_of_an_unknown_movie_returns_404(self, client):
+        assert client.get(reverse("graph"), {"as_of": 999999}).status_code == 404
+        assert client.get(reverse("graph"), {"as_of": "endgame"}).status_code == 400
+
+
+class TestGraphChangesView:
+    def _apply(self, payload, changes):
+        """Replay a changes response onto a full payload, the way graph.js does."""
+        elements = {
+            kind: {element["data"]["id"]: element["data"] for element in payload[kind]} for kind in ("nodes", "edges")
+        }
+        for change in changes["changes"]:
+            for kind in ("nodes", "edges"):
+                for element_id in change[kind]["removed"]:
+                    elements[kind].pop(element_id, None)
+                for element in change[kind]["added"] + change[kind]["updated"]:
+                    elements[kind][element["data"]["id"]] = element["data"]
+        return elements
+
+    def test_replaying_the_changes_matches_a_fresh_payload(self, client):
+        tony, peter, pepper = _character("Tony Stark"), _character("Peter Parker"), _character("Pepper Potts")
+        mentor = _relationship(tony, peter, relationship_type="Mentor", directional=True)
+        before = client.get(reverse("graph")).json()
+
+        _relationship(tony, pepper, relationship_type="Romantic")
+        _relationship(tony, peter, relationship_type="Family")
+        mentor.delete()
+        tony.name = "Anthony Stark"
+        tony.save()
+
+        changes = client.get(reverse("graph-changes"), {"since": before["version"]}).json()
+        after = client.get(reverse("graph")).json()
+
+        assert changes["version"] == after["version"]
+        assert len(changes["changes"]) == after["version"] - before["version"]
+        assert self._apply(before, changes) == self._apply(after, {"changes": []})
+
+    def test_a_current_version_has_no_changes(self, client):
+        _relationship(_character("Thor"), _character("Loki"), relationship_type="Family")
+        version = client.get(reverse("graph")).json()["version"]
+
+        assert client.get(reverse("graph-changes"), {"since": version}).json() == {"version": version, "changes": []}
+
+    def test_asks_for_a_resync_past_a_plain_bump(self, client):
+        _relationship(_character("Thor"), _character("Loki"), relationship_type="Family")
+        version = client.get(reverse("graph")).json()["version"]
+
+        graph_service_module.MCUGraphService.invalidate_cache()
+        response = client.get(reverse("graph-changes"), {"since": version}).json()
+
+        assert response == {"version": version + 1, "resync": True}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_asks_for_a_resync_once_the_log_is_trimmed(self, client, monkeypatch):
+        monkeypatch.setattr(graph_service_module.MCUGraphService, "CHANGES_LIMIT", 2)
+        thor, loki, hela, odin = _character("Thor"), _character("Loki"), _character("Hela"), _character("Odin")
+        version = client.get(reverse("graph")).json()["version"]
+
+        for relative in (loki, hela, odin):
+            _relationship(thor, relative, relationship_type="Family")
+
+        assert client.get(reverse("graph-changes"), {"since": version}).json()["resync"] is True
+        assert len(client.get(reverse("graph-changes"), {"since": version + 1}).json()["changes"]) == 2
+
+    def test_since_is_required_and_numeric(self, client):
+        assert client.get(reverse("graph-changes")).status_code == 400
+        assert client.get(reverse("graph-changes"), {"since": "latest"}).status_code == 400
+
 
 class TestGraphPathView:
     def test_missing_params_returns_400(self, client):
@@ -139,6 +369,123 @@ class TestGraphPathView:
         assert first_edge["weight"] == 4
         assert first_edge["directional"] is False
 
+    def test_as_of_uses_only_what_was_known_then(self, client):
+        tony, happy, peter = _timeline_cast()
+
+        before = client.get(reverse("graph-path"), {"from": tony.id, "to": peter.id, "as_of": tony.movie_introduced_id})
+        after = client.get(reverse("graph-path"), {"from": tony.id, "to": peter.id, "as_of": peter.movie_introduced_id})
+
+        assert before.status_code == 404
+        assert before.json() == {"error": "One or both characters had not appeared by then."}
+        assert after.json()["character_ids"] == [tony.id, peter.id]
+
+
+class TestGraphPathsView:
+    def test_returns_alternatives_best_first(self, client):
+        tony = _character("Tony Stark")
+        happy = _character("Happy Hogan")
+        pepper = _character("Pepper Potts")
+        peter = _character("Peter Parker")
+        _relationship(tony, happy, relationship_type="Ally")
+        _relationship(happy, peter, relationship_type="Ally")
+        _relationship(tony, pepper, relationship_type="Romantic")
+        _relationship(pepper, peter, relationship_type="Ally")
+
+        response = client.get(reverse("graph-paths"), {"from": peter.id, "to": tony.id, "k": 5})
+
+        assert response.status_code == 200
+        paths = response.json()["paths"]
+        assert [path["character_ids"] for path in paths] == [
+            [peter.id, pepper.id, tony.id],
+            [peter.id, happy.id, tony.id],
+        ]
+        assert [path["total_cost"] for path in paths] == [7, 8]
+        assert paths[0] == client.get(reverse("graph-path"), {"from": peter.id, "to": tony.id}).json()
+
+    def test_invalid_k_returns_400(self, client):
+        response = client.get(reverse("graph-paths"), {"from": 1, "to": 2, "k": 0})
+
+        assert response.status_code == 400
+
+    def test_disconnected_characters_return_404(self, client):
+        tony = _character("Tony Stark")
+        wanda = _character("Wanda Maximoff")
+        _relationship(tony, _character("Rhodey"))
+        _relationship(wanda, _character("Vision"))
+
+        response = client.get(reverse("graph-paths"), {"from": tony.id, "to": wanda.id})
+
+        assert response.status_code == 404
+
+
+class TestGraphNeighborhoodView:
+    def test_returns_the_characters_within_the_radius(self, client):
+        tony = _character("Tony Stark")
+        peter = _character("Peter Parker")
+        may = _character("May Parker")
+        _relationship(tony, peter, relationship_type="Mentor", directional=True)
+        _relationship(peter, may, relationship_type="Family")
+
+        near = client.get(reverse("graph-neighborhood", args=[tony.id])).json()
+        wider = client.get(reverse("graph-neighborhood", args=[tony.id]), {"radius": 2}).json()
+
+        assert {node["data"]["id"] for node in near["nodes"]} == {str(tony.id), str(peter.id)}
+        assert len(near["edges"]) == 1
+        assert near["center"] == str(tony.id)
+        assert {node["data"]["id"] for node in wider["nodes"]} == {str(tony.id), str(peter.id), str(may.id)}
+        for node in wider["nodes"]:
+            assert "details" not in node["data"]
+
+    def test_limit_truncates(self, client):
+        tony = _character("Tony Stark")
+        for name in ("Peter Parker", "Happy Hogan", "Pepper Potts"):
+            _relationship(tony, _character(name))
+
+        payload = client.get(reverse("graph-neighborhood", args=[tony.id]), {"limit": 2}).json()
+
+        assert len(payload["nodes"]) == 2
+        assert payload["truncated"] is True
+
+    def test_character_without_relationships_is_shown_alone(self, client):
+        loner = _character("Loner")
+        _relationship(_character("Tony Stark"), _character("Peter Parker"))
+
+        payload = client.get(reverse("graph-neighborhood", args=[loner.id])).json()
+
+        assert [node["data"]["name"] for node in payload["nodes"]] == ["Loner"]
+        assert payload["edges"] == []
+
+    def test_unknown_character_returns_404(self, client):
+        response = client.get(reverse("graph-neighborhood", args=[999999]))
+
+        assert response.status_code == 404
+
+    def test_invalid_radius_returns_400(self, client):
+        tony = _character("Tony Stark")
+
+        response = client.get(reverse("graph-neighborhood", args=[tony.id]), {"radius": 9})
+
+        assert response.status_code == 400
+
+
+class TestGraphComponentsView:
+    def test_lists_components_largest_first_and_isolated_characters(self, client):
+        tony = _character("Tony Stark")
+        peter = _character("Peter Parker")
+        may = _character("May Parker")
+        wanda = _character("Wanda Maximoff")
+        vision = _character("Vision")
+        loner = _character("Loner")
+        _relationship(tony, peter)
+        _relationship(peter, may, relationship_type="Family")
+        _relationship(wanda, vision, relationship_type="Romantic")
+
+        payload = client.get(reverse("graph-components")).json()
+
+        assert [component["size"] for component in payload["components"]] == [3, 2]
+        assert [character["name"] for character in payload["components"][1]["characters"]] == ["Vision", "Wanda Maximoff"]
+        assert payload["isolated"] == [{"id": loner.id, "name": "Loner"}]
+
 
 class TestGraphCharacterDetailView:
     def test_existing_character_returns_details(self, client):
@@ -167,6 +514,75 @@ class TestGraphCharacterDetailView:
         assert response.json() == {"error": "Character was not found."}
 
 
+class TestGraphCharactersView:
+    def test_returns_details_keyed_by_id_and_lists_missing_ids(self, client):
+        steve = _character("Steve Rogers", status="Alive")
+        bucky = _character("Bucky Barnes")
+
+        response = client.get(reverse("graph-characters"), {"ids": f"{steve.id},{bucky.id},999999,{steve.id}"})
+
+        assert response.status_code == 200
+        payload = response.json()
+        assert list(payload["characters"]) == [str(steve.id), str(bucky.id)]
+        assert payload["characters"][str(steve.id)]["status_label"] == "Alive"
+        assert payload["missing"] == [999999]
+
+    def test_cached_details_are_served_without_queries(self, client, django_assert_num_queries):
+        steve = _character("Steve Rogers")
+        bucky = _character("Bucky Barnes")
+        client.get(reverse("graph-characters"), {"ids": f"{steve.id},{bucky.id}"})
+
+        with django_assert_num_queries(0):
+            response = client.get(reverse("graph-characters"), {"ids": f"{bucky.id},{steve.id}"})
+
+        assert set(response.json()["characters"]) == {str(steve.id), str(bucky.id)}
+
+    @pytest.mark.parametrize("ids", ["", "1,two", ",".join(str(n) for n in range(201))])
+    def test_rejects_bad_id_lists(self, client, ids):
+        response = client.get(reverse("graph-characters"), {"ids": ids})
+
+        assert response.status_code == 400
+
+
+class TestGraphSearchView:
+    def test_returns_ranked_matches_with_earth_labels(self, client):
+        earth = Earth.objects.create(number="Earth-616")
+        peter = _character("Peter Parker", earth_number=earth)
+        _character("Peter Quill")
+        AlterEgo.objects.create(character=peter, name="Spider-Man")
+
+        response = client.get(reverse("graph-search"), {"q": "spider"})
+
+        assert response.status_code == 200
+        assert response.json()["results"] == [
+            {
+                "id": peter.id,
+                "name": "Peter Parker",
+                "display_name": "Peter Parker (Earth-616)",
+                "earth": "Earth-616",
+                "matched_alias": "Spider-Man",
+            }
+        ]
+        names = [result["name"] for result in client.get(reverse("graph-search"), {"q": "pet"}).json()["results"]]
+        assert names == ["Peter Parker", "Peter Quill"]
+
+    def test_new_aliases_are_searchable_without_a_graph_rebuild(self, client):
+        carol = _character("Carol Danvers")
+        client.get(reverse("graph-search"), {"q": "carol"})
+        version = graph_service_module.MCUGraphService()._get_cache_version()
+
+        AlterEgo.objects.create(character=carol, name="Captain Marvel")
+
+        results = client.get(reverse("graph-search"), {"q": "captain marvel"}).json()["results"]
+        assert [result["id"] for result in results] == [carol.id]
+        assert graph_service_module.MCUGraphService()._get_cache_version() == version
+
+    def test_empty_query_and_bad_limits(self, client):
+        assert client.get(reverse("graph-search"), {"q": " "}).json()["results"] == []
+        assert client.get(reverse("graph-search"), {"q": "a", "limit": "0"}).status_code == 400
+        assert client.get(reverse("graph-search"), {"q": "a", "limit": "x"}).status_code == 400
+
+
 class TestGraphFilterView:
     def test_returns_payload_with_echoed_filters(self, client):
         hero = _character("Carol Danvers", alignment="Hero")
@@ -231,7 +647,7 @@ class TestGraphFilterView:
 
 
 class TestGraphPageView:
-    def test_renders_with_filter_and_character_options(self, client):
+    def test_renders_filter_choices_without_the_roster(self, client):
         movie = Movie.objects.create(title="Iron Man", release_date="2008-05-02")
         earth = Earth.objects.create(number="Earth-616")
         team = Team.objects.create(name="Avengers")
@@ -254,20 +670,11 @@ class TestGraphPageView:
         assert list(context["movie_choices"]) == [movie]
         assert list(context["team_choices"]) == [team]
 
-        options = context["character_options"]
-        assert {option["id"] for option in options} == {character.id, orphan.id}
-        by_id = {option["id"]: option for option in options}
-        assert by_id[character.id]["name"] == "Tony Stark"
-        assert by_id[character.id]["display_name"] == "Tony Stark (Earth-616)"
-        assert by_id[orphan.id]["display_name"] == "Uatu"
-
-        grouped = context["grouped_character_options"]
-        labels = [group["label"] for group in grouped]
-        assert "Iron Man" in labels
-        assert "No first appearance" in labels
-        iron_man_group = next(group for group in grouped if group["label"] == "Iron Man")
-        assert [entry["name"] for entry in iron_man_group["characters"]] == ["Tony Stark"]
-        assert iron_man_group["characters"][0]["aliases"] == []
+        # The character pickers search through the API instead of inlining
+        # the roster.
+        assert "character_options" not in context
+        for roster_member in (character, orphan):
+            assert roster_member.name.encode() not in response.content
 
     def test_rejects_non_get(self, client):
         response = client.post(reverse("connections-graph"))
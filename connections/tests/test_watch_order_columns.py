@@ -0,0 +1,100 @@
+"""Tests for the map of which watch-order tracks share a column."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from connections.invalidation import deferred_invalidation
+from connections.models import WatchEntry, WatchTrack, append_position, column_entries, track_columns
+from connections.watch_order_columns import TrackColumns
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def sagas():
+    infinity = WatchTrack.objects.create(name="Infinity Saga", slug="infinity", lane_order=0)
+    multiverse = WatchTrack.objects.create(
+        name="Multiverse Saga", slug="multiverse", lane_order=5, continues_from=infinity
+    )
+    xmen = WatchTrack.objects.create(name="Fox X-Men", slug="fox-x-men", lane_order=1)
+    return infinity, multiverse, xmen
+
+
+class TestColumnMap:
+    def test_every_track_in_a_column_maps_to_the_whole_chain(self, sagas):
+        infinity, multiverse, xmen = sagas
+
+        assert infinity.column_track_ids() == (infinity.pk, multiverse.pk)
+        assert multiverse.column_track_ids() == (infinity.pk, multiverse.pk)
+        assert xmen.column_track_ids() == (xmen.pk,)
+        assert multiverse.column_tracks() == [infinity, multiverse]
+
+    def test_a_column_lookup_is_one_query(self, sagas, django_assert_num_queries):
+        infinity, multiverse, _xmen = sagas
+
+        with django_assert_num_queries(1):
+            assert multiverse.column_track_ids() == (infinity.pk, multiverse.pk)
+
+    def test_an_append_reads_the_column_in_two_queries(self, sagas, django_assert_num_queries):
+        infinity, multiverse, _xmen = sagas
+        WatchEntry.objects.create(track=infinity, title="Endgame", slug="endgame")
+
+        with django_assert_num_queries(2):
+            assert append_position(multiverse) == 20
+
+    def test_an_insert_that_relabels_builds_the_map_once(self, sagas, monkeypatch):
+        infinity, multiverse, _xmen = sagas
+        anchor = WatchEntry.objects.create(track=infinity, title="Endgame", slug="endgame", position=10)
+        WatchEntry.objects.create(track=multiverse, title="Doomsday", slug="doomsday", position="10.000001")
+        build = MagicMock(wraps=TrackColumns.build)
+        monkeypatch.setattr(TrackColumns, "build", build)
+
+        entry = WatchEntry(track=multiverse, title="Thunderbolts", slug="thunderbolts")
+        entry.place_after = anchor
+        entry.save()
+
+        assert build.call_count == 1
+        assert column_entries(infinity).get(slug="doomsday").position > entry.position > anchor.position
+
+    def test_one_map_serves_several_lookups(self, sagas, django_assert_num_queries):
+        infinity, multiverse, _xmen = sagas
+        columns = track_columns()
+
+        with django_assert_num_queries(0):
+            assert infinity.column_track_ids(columns) == multiverse.column_track_ids(columns)
+
+    def test_a_regroup_without_signals_is_seen_at_once(self, sagas):
+        """As when another worker saves the track: nothing in this process is told."""
+        infinity, multiverse, xmen = sagas
+
+        WatchTrack.objects.filter(pk=xmen.pk).update(continues_from=multiverse)
+
+        assert infinity.column_track_ids() == (infinity.pk, multiverse.pk, xmen.pk)
+
+    def test_saving_a_track_regroups_the_columns(self, sagas):
+        infinity, multiverse, xmen = sagas
+        assert xmen.column_track_ids() == (xmen.pk,)
+
+        xmen.continues_from = multiverse
+        xmen.save()
+
+        assert infinity.column_track_ids() == (infinity.pk, multiverse.pk, xmen.pk)
+
+    def test_deleting_a_track_splits_its_column(self, sagas):
+        infinity, multiverse, _xmen = sagas
+
+        multiverse.delete()
+
+        assert infinity.column_track_ids() == (infinity.pk,)
+
+    def test_tracks_saved_in_a_deferred_block_are_seen_at_once(self, sagas):
+        infinity, multiverse, _xmen = sagas
+
+        with deferred_invalidation():
+            secret_wars = WatchTrack.objects.create(
+                name="Secret Wars", slug="secret-wars", continues_from=multiverse
+            )
+            entry = WatchEntry.objects.create(track=secret_wars, title="Doomsday", slug="doomsday")
+            assert entry in column_entries(infinity)
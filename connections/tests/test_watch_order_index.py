@@ -0,0 +1,108 @@
+"""Tests for the prerequisite closure table."""
+
+import pytest
+from django.db import transaction
+
+from connections.models import WatchEntry, WatchPrerequisitePath, WatchTrack
+from connections.watch_order_index import PrerequisiteIndex, closure_pairs
+from connections.watch_order_service import would_create_cycle
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def track():
+    return WatchTrack.objects.create(name="MCU", slug="mcu")
+
+
+def _entries(track, *slugs):
+    return [WatchEntry.objects.create(track=track, title=slug.title(), slug=slug) for slug in slugs]
+
+
+def _stored_pairs():
+    return set(WatchPrerequisitePath.objects.values_list("ancestor_id", "descendant_id"))
+
+
+def _fresh_pairs():
+    return closure_pairs(
+        WatchEntry.prerequisites.through.objects.values_list("to_watchentry_id", "from_watchentry_id")
+    )
+
+
+class TestClosurePairs:
+    def test_closure_follows_chains(self):
+        assert closure_pairs([(1, 2), (2, 3), (1, 4)]) == {(1, 2), (1, 3), (1, 4), (2, 3)}
+
+    def test_an_existing_loop_is_still_closed_over(self):
+        assert closure_pairs([(1, 2), (2, 1), (2, 3)]) == {
+            (1, 1), (1, 2), (1, 3), (2, 1), (2, 2), (2, 3)
+        }
+
+
+class TestSignals:
+    def test_added_links_extend_the_paths(self, track):
+        iron_man, avengers, endgame = _entries(track, "iron-man", "avengers", "endgame")
+
+        avengers.prerequisites.add(iron_man)
+        iron_man.unlocks.add(endgame)
+        endgame.prerequisites.add(avengers)
+
+        assert PrerequisiteIndex.ancestors(endgame.pk) == {iron_man.pk, avengers.pk}
+        assert PrerequisiteIndex.descendants(iron_man.pk) == {avengers.pk, endgame.pk}
+        assert _stored_pairs() == _fresh_pairs()
+
+    def test_joining_two_chains_matches_a_fresh_build(self, track):
+        first, second, third, fourth = _entries(track, "first", "second", "third", "fourth")
+        second.prerequisites.add(first)
+        fourth.prerequisites.add(third)
+
+        third.prerequisites.add(second)
+
+        assert _stored_pairs() == _fresh_pairs()
+        assert PrerequisiteIndex.descendants(first.pk) == {second.pk, third.pk, fourth.pk}
+
+    def test_removing_a_link_cuts_the_paths_through_it(self, track):
+        iron_man, avengers, endgame = _entries(track, "iron-man", "avengers", "endgame")
+        avengers.prerequisites.add(iron_man)
+        endgame.prerequisites.add(avengers)
+        assert would_create_cycle(iron_man, [endgame.pk])
+
+        endgame.prerequisites.remove(avengers)
+
+        assert not would_create_cycle(iron_man, [endgame.pk])
+        assert PrerequisiteIndex.descendants(iron_man.pk) == {avengers.pk}
+
+    def test_deleting_an_entry_drops_the_paths_through_it(self, track):
+        iron_man, avengers, endgame = _entries(track, "iron-man", "avengers", "endgame")
+        avengers.prerequisites.add(iron_man)
+        endgame.prerequisites.add(avengers)
+
+        avengers.delete()
+
+        assert PrerequisiteIndex.descendants(iron_man.pk) == set()
+
+    def test_a_rolled_back_link_leaves_no_path(self, track):
+        first, second = _entries(track, "first", "second")
+
+        with pytest.raises(RuntimeError), transaction.atomic():
+            second.prerequisites.add(first)
+            raise RuntimeError
+
+        assert _stored_pairs() == set()
+        assert not would_create_cycle(first, [second.pk])
+
+
+class TestCycleCheck:
+    def test_a_cycle_check_is_one_query(self, track, django_assert_num_queries):
+        first, second = _entries(track, "first", "second")
+        second.prerequisites.add(first)
+
+        with django_assert_num_queries(1):
+            assert would_create_cycle(first, [second.pk])
+
+    def test_requiring_itself_needs_no_query(self, track, django_assert_num_queries):
+        (first,) = _entries(track, "first")
+
+        with django_assert_num_queries(0):
+            assert would_create_cycle(first, [first.pk])
@@ -0,0 +1,151 @@
+"""Tests for the server-side watch-order layout and its per-view cache."""
+
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+
+from connections import watch_order_service as watch_order_service_module
+from connections.models import WatchCollection, WatchEntry, WatchOrderConfig, WatchTrack
+from connections.watch_order_layout import layout_view
+from connections.watch_order_service import WatchOrderService
+
+
+def _entry(slug, lane=0, track=None, collections=(), connects_to_previous=True):
+    return {
+        "slug": slug,
+        "track": track or f"lane-{lane}",
+        "lane": lane,
+        "collections": list(collections),
+        "connects_to_previous": connects_to_previous,
+    }
+
+
+def _merge(source, target):
+    return {"source": source, "target": target, "kind": "prerequisite"}
+
+
+def _rows(layout):
+    return {slug: spot["row"] for slug, spot in layout["spots"].items()}
+
+
+class TestLayoutView:
+    def test_a_lane_is_chained_in_list_order(self):
+        layout = layout_view({"entries": [_entry("iron-man"), _entry("hulk"), _entry("iron-man-2")]})
+
+        assert _rows(layout) == {"iron-man": 0, "hulk": 1, "iron-man-2": 2}
+        assert [(edge["source"], edge["target"]) for edge in layout["edges"]] == [
+            ("iron-man", "hulk"),
+            ("hulk", "iron-man-2"),
+        ]
+
+    def test_a_merge_pushes_its_target_below_the_other_lane(self):
+        payload = {
+            "entries": [_entry("iron-man"), _entry("doomsday"), _entry("x-men", 1), _entry("x2", 1), _entry("dofp", 1)],
+            "edges": [_merge("dofp", "doomsday")],
+        }
+
+        rows = _rows(layout_view(payload))
+
+        assert rows["doomsday"] == rows["dofp"] + 1
+        assert layout_view(payload)["spots"]["x-men"]["column"] == 1
+
+    def test_siblings_sharing_a_parent_sit_side_by_side(self):
+        shows = ["daredevil", "jessica-jones", "luke-cage", "iron-fist"]
+        payload = {
+            "entries": [_entry("defenders"), *(_entry(slug) for slug in shows), _entry("punisher")],
+            "edges": [_merge("defenders", slug) for slug in shows],
+        }
+
+        layout = layout_view(payload)
+
+        assert {layout["spots"][slug]["row"] for slug in shows} == {1}
+        assert sorted(layout["spots"][slug]["column"] for slug in shows) == [0, 1, 2, 3]
+        assert layout["spots"]["punisher"]["row"] == 2
+        assert layout["columns"] == 4
+
+    def test_a_stated_prerequisite_beats_the_list_order(self):
+        payload = {
+            "entries": [_entry("origins"), _entry("first-class")],
+            "edges": [_merge("first-class", "origins")],
+        }
+
+        assert _rows(layout_view(payload)) == {"first-class": 0, "origins": 1}
+
+    def test_hidden_tracks_and_collections_close_their_gaps(self):
+        payload = {
+            "entries": [
+                _entry("iron-man", collections=["iron-man"]),
+                _entry("avengers"),
+                _entry("iron-man-3", collections=["iron-man"]),
+                _entry("x-men", 1, track="x-men"),
+            ],
+        }
+
+        collection = layout_view(payload, collection="iron-man")
+        hidden = layout_view(payload, hidden_tracks=["lane-0"])
+
+        assert _rows(collection) == {"iron-man": 0, "iron-man-3": 1}
+        assert hidden["spots"] == {"x-men": {"row": 0, "column": 0}}
+
+    def test_items_per_row_wraps_a_lane(self):
+        payload = {"entries": [_entry(f"film-{index}") for index in range(5)], "items_per_row": 2}
+
+        layout = layout_view(payload)
+
+        assert [(spot["row"], spot["column"]) for spot in layout["spots"].values()] == [
+            (0, 0), (0, 1), (1, 0), (1, 1), (2, 0),
+        ]
+        assert layout["columns"] == 2
+
+    def test_an_unconnected_entry_keeps_its_slot_without_an_arrow(self):
+        payload = {"entries": [_entry("loki"), _entry("what-if", connects_to_previous=False)]}
+
+        layout = layout_view(payload)
+
+        assert _rows(layout) == {"loki": 0, "what-if": 1}
+        assert layout["edges"][0]["drawn"] is False
+
+
+@pytest.mark.django_db
+class TestCachedLayouts:
+    @pytest.fixture
+    def chart(self):
+        mcu = WatchTrack.objects.create(name="MCU", slug="mcu", lane_order=0)
+        xmen = WatchTrack.objects.create(name="Fox X-Men", slug="fox-x-men", lane_order=1)
+        essentials = WatchCollection.objects.create(name="Essentials", slug="essentials")
+        iron_man = WatchEntry.objects.create(track=mcu, title="Iron Man", slug="iron-man")
+        doomsday = WatchEntry.objects.create(track=mcu, title="Avengers: Doomsday", slug="doomsday")
+        x_men = WatchEntry.objects.create(track=xmen, title="X-Men", slug="x-men")
+        doomsday.prerequisites.add(x_men)
+        iron_man.collections.add(essentials)
+        doomsday.collections.add(essentials)
+
+    def test_the_default_view_ships_with_the_payload(self, chart):
+        payload = WatchOrderService().build_payload()
+
+        assert payload["layout"] == layout_view(payload)
+        assert _rows(payload["layout"]) == {"iron-man": 0, "doomsday": 1, "x-men": 0}
+
+    def test_a_view_is_laid_out_once_per_version(self, chart):
+        service = WatchOrderService()
+        first = service.layout(hidden_tracks=["fox-x-men", "unknown"])
+
+        with patch.object(watch_order_service_module, "layout_view") as relayout:
+            assert service.layout(hidden_tracks=["fox-x-men"]) == first
+        relayout.assert_not_called()
+
+        config = WatchOrderConfig.current()
+        config.items_per_row = 2
+        config.save()
+
+        assert service.layout(hidden_tracks=["fox-x-men"])["columns"] == 2
+
+    def test_endpoint_lays_out_the_requested_view(self, client, chart):
+        response = client.get(reverse("watch-order-layout"), {"collection": "essentials", "hide": "fox-x-men"})
+
+        assert response.status_code == 200
+        assert set(response.json()["spots"]) == {"iron-man", "doomsday"}
+
+    def test_endpoint_rejects_an_unknown_collection(self, client, chart):
+        assert client.get(reverse("watch-order-layout"), {"collection": "nope"}).status_code == 404
@@ -9,7 +9,6 @@ from decimal import Decimal
 from io import StringIO
 
 import pytest
-from django.core.exceptions import ValidationError
 
 from connections.forms import WatchEntryAdminForm
 from connections.models import (
@@ -32,6 +31,13 @@ def xmen(db):
     return WatchTrack.objects.create(name="Fox X-Men", slug="fox-x-men", lane_order=1)
 
 
+def insert_after(track, title, anchor):
+    entry = WatchEntry(track=track, title=title, slug=title.lower().replace(" ", "-"))
+    entry.place_after = anchor
+    entry.save()
+    return entry
+
+
 def make_entry(track, title, **kwargs):
     return WatchEntry.objects.create(
         track=track,
@@ -100,12 +106,65 @@ class TestPositions:
         assert positions == sorted(positions)
         assert len(set(positions)) == len(positions), "positions must stay distinct"
 
-    def test_exhausted_midpoints_ask_for_a_renormalize(self, mcu):
+    def test_exhausted_midpoints_spread_the_next_entries_on_save(self, mcu):
+        first = make_entry(mcu, "Iron Man", position=Decimal("10"))
+        crowded = make_entry(mcu, "Hulk", position=Decimal("10.000001"))
+        make_entry(mcu, "Iron Man 2", position=Decimal("20"))
+
+        preview = next_position_after(first)
+        crowded.refresh_from_db()
+        assert crowded.position == Decimal("10.000001"), "previewing must not write"
+
+        inserted = insert_after(mcu, "The Incredible Hulk", first)
+
+        crowded.refresh_from_db()
+        assert crowded.position == Decimal("15")
+        assert inserted.position == preview
+        assert Decimal("10") < inserted.position < crowded.position
+
+    def test_a_relabel_stops_at_the_first_window_with_room(self, mcu):
+        first = make_entry(mcu, "Iron Man", position=Decimal("10"))
+        crowded = [
+            make_entry(mcu, f"Crowded {index}", position=Decimal("10") + Decimal("0.000001") * index)
+            for index in range(1, 4)
+        ]
+        later = [make_entry(mcu, f"Later {index}", position=Decimal(20 + 10 * index)) for index in range(5)]
+
+        insert_after(mcu, "The Incredible Hulk", first)
+
+        # Windows of one and two entries are still crowded; four reaches past
+        # them to Later 0, and Later 1 bounds it.
+        positions = [WatchEntry.objects.get(pk=row.pk).position for row in [*crowded, *later]]
+        assert positions[:4] == [Decimal("14"), Decimal("18"), Decimal("22"), Decimal("26")]
+        assert positions[4:] == [row.position for row in later[1:]]
+
+    def test_a_crowded_tail_is_spread_past_the_end(self, mcu):
         first = make_entry(mcu, "Iron Man", position=Decimal("10"))
         make_entry(mcu, "Hulk", position=Decimal("10.000001"))
+        make_entry(mcu, "Iron Man 2", position=Decimal("10.000002"))
 
-        with pytest.raises(ValidationError, match="Renormalize"):
-            next_position_after(first)
+        insert_after(mcu, "The Incredible Hulk", first)
+
+        assert list(
+            WatchEntry.objects.filter(track=mcu).order_by("position").values_list("title", "position")
+        ) == [
+            ("Iron Man", Decimal("10")),
+            ("The Incredible Hulk", Decimal("15")),
+            ("Hulk", Decimal("20")),
+            ("Iron Man 2", Decimal("30")),
+        ]
+
+    def test_inserting_at_one_spot_never_fails_and_keeps_order(self, mcu):
+        first = make_entry(mcu, "Iron Man")
+        make_entry(mcu, "Hulk")
+        make_entry(mcu, "Iron Man 2")
+
+        inserted = []
+        for index in range(60):
+            inserted.append(insert_after(mcu, f"Filler {index}", first))
+
+        titles = list(WatchEntry.objects.filter(track=mcu).order_by("position", "pk").values_list("title", flat=True))
+        assert titles == ["Iron Man", *(entry.title for entry in reversed(inserted)), "Hulk", "Iron Man 2"]
 
     def test_renormalize_respreads_and_preserves_order(self, mcu):
         make_entry(mcu, "Iron Man", position=Decimal("10"))
@@ -236,6 +295,24 @@ class TestAdminForm:
         entry = form.save()
         assert entry.position == Decimal("15")
 
+    def test_validating_never_moves_the_neighbours(self, mcu):
+        first = make_entry(mcu, "Iron Man", position=Decimal("10"))
+        crowded = make_entry(mcu, "Hulk", position=Decimal("10.000001"))
+
+        # Rejected for another field: the gap is previewed, never opened.
+        form = WatchEntryAdminForm(data=self._form_data(mcu, insert_after=first.pk, slug="iron-man"))
+        assert not form.is_valid()
+        form = WatchEntryAdminForm(data=self._form_data(mcu, insert_after=first.pk))
+        assert form.is_valid(), form.errors
+        form.full_clean()
+
+        crowded.refresh_from_db()
+        assert crowded.position == Decimal("10.000001")
+
+        entry = form.save()
+        crowded.refresh_from_db()
+        assert Decimal("10") < entry.position < crowded.position
+
     def test_blank_insert_after_appends(self, mcu):
         make_entry(mcu, "Iron Man")
         make_entry(mcu, "Iron Man 2")
@@ -82,6 +82,30 @@ class TestPayload:
             {"slug": "doomsday-prep", "name": "Doomsday Prep", "description": "", "count": 2}
         ]
 
+    def test_collection_size_counts_only_entries_on_the_chart(self, chart):
+        prep = WatchCollection.objects.create(name="Doomsday Prep", slug="doomsday-prep")
+        prep.entries.add(chart["iron_man"], chart["xmen"])
+        chart["xmen"].is_published = False
+        chart["xmen"].save()
+
+        payload = WatchOrderService().build_payload()
+
+        assert payload["collections"][0]["count"] == 1
+
+    def test_query_count_does_not_grow_with_the_chart(self, chart, tracks, django_assert_max_num_queries):
+        """Memberships and merges are read in one pass each, not per entry."""
+        prep = WatchCollection.objects.create(name="Doomsday Prep", slug="doomsday-prep")
+        for index in range(20):
+            entry = WatchEntry.objects.create(track=tracks["xmen"], title=f"Extra {index}", slug=f"extra-{index}")
+            entry.collections.add(prep)
+            entry.prerequisites.add(chart["iron_man"])
+
+        with django_assert_max_num_queries(6):
+            payload = WatchOrderService()._serialize()
+
+        assert payload["collections"][0]["count"] == 20
+        assert len(payload["edges"]) == 21
+
     def test_an_entry_carries_every_collection_it_belongs_to(self, chart):
         """A lane is exclusive, a collection is not - this is the whole point."""
         prep = WatchCollection.objects.create(name="Doomsday Prep", slug="doomsday-prep")
@@ -173,6 +197,87 @@ class TestPage:
     def test_original_graph_page_still_resolves(self, client, db):
         assert reverse("connections-graph") == "/mcu-relationships/"
 
+    def test_notes_and_posters_stay_on_the_tiles(self, client, chart):
+        chart["iron_man"].note = "Start here."
+        chart["iron_man"].save()
+
+        response = client.get(reverse("connections-watch-order"))
+
+        assert b'data-watch-note="Start here."' in response.content
+        assert all(
+            "note" not in entry and "poster_url" not in entry
+            for entry in response.context["watch_order_data"]["entries"]
+        )
+
+
+class TestCollectionSlices:
+    @pytest.fixture
+    def prep(self, chart):
+        prep = WatchCollection.objects.create(name="Doomsday Prep", slug="doomsday-prep")
+        prep.entries.add(chart["doomsday"], chart["xmen"])
+        return prep
+
+    def test_slice_lists_members_in_chart_order_with_their_merges(self, prep):
+        collection_slice = WatchOrderService().collection_slice("doomsday-prep")
+
+        assert collection_slice["entries"] == ["doomsday", "x-men"]
+        assert collection_slice["edges"] == [{"source": "x-men", "target": "doomsday", "kind": "prerequisite"}]
+        assert set(collection_slice["layout"]["spots"]) == {"doomsday", "x-men"}
+        assert collection_slice["collection"]["count"] == 2
+
+    def test_merges_leaving_the_collection_are_dropped(self, chart, prep):
+        prep.entries.remove(chart["xmen"])
+
+        assert WatchOrderService().collection_slice("doomsday-prep")["edges"] == []
+
+    def test_slice_is_cached_until_the_chart_changes(self, chart, prep, django_assert_num_queries):
+        service = WatchOrderService()
+        first = service.collection_slice("doomsday-prep")
+
+        with django_assert_num_queries(0):
+            assert service.collection_slice("doomsday-prep") == first
+
+        prep.entries.add(chart["iron_man"])
+        assert service.collection_slice("doomsday-prep")["entries"] == ["iron-man", "doomsday", "x-men"]
+
+    def test_endpoint_serves_the_slice(self, client, prep):
+        response = client.get(reverse("watch-order-collection", args=["doomsday-prep"]))
+
+        assert response.status_code == 200
+        assert response.json()["entries"] == ["doomsday", "x-men"]
+
+    def test_endpoint_rejects_an_unknown_or_inactive_collection(self, client, prep):
+        WatchCollection.objects.create(name="Draft List", slug="draft", is_active=False)
+
+        assert client.get(reverse("watch-order-collection", args=["nope"])).status_code == 404
+        assert client.get(reverse("watch-order-collection", args=["draft"])).status_code == 404
+
+    def test_a_collection_page_renders_only_its_tiles(self, client, prep):
+        response = client.get(reverse("connections-watch-order"), {"collection": "doomsday-prep"})
+
+        assert response.content.count(b"data-watch-entry=") == 2
+        assert b'data-watch-entry="iron-man"' not in response.content
+        data = response.context["watch_order_data"]
+        assert [entry["slug"] for entry in data["entries"]] == ["doomsday", "x-men"]
+        assert data["collection"] == "doomsday-prep"
+        assert set(data["layout"]["spots"]) == {"doomsday", "x-men"}
+        assert b'<option value="doomsday-prep" selected>' in response.content
+        assert b"Everything (3)" in response.content
+
+    def test_a_collection_page_is_lighter_than_the_whole_chart(self, client, prep):
+        whole = client.get(reverse("connections-watch-order"))
+        scoped = client.get(reverse("connections-watch-order"), {"collection": "doomsday-prep"})
+
+        assert len(scoped.content) < len(whole.content)
+
+    def test_an_unknown_or_empty_collection_shows_the_whole_chart(self, client, prep):
+        WatchCollection.objects.create(name="Empty List", slug="empty")
+
+        for slug in ("nope", "empty"):
+            response = client.get(reverse("connections-watch-order"), {"collection": slug})
+            assert response.content.count(b"data-watch-entry=") == 3
+            assert response.context["watch_order_collection"] == ""
+
 
 class TestWatchedEndpoint:
     def test_requires_sign_in(self, client, chart):
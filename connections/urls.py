@@ -10,9 +10,17 @@ from . import views
 
 urlpatterns = [
 	path("graph/", views.graph_view, name="graph"),
+	path("graph/changes/", views.graph_changes_view, name="graph-changes"),
 	path("graph/filter/", views.graph_filter_view, name="graph-filter"),
 	path("graph/path/", views.graph_path_view, name="graph-path"),
+	path("graph/paths/", views.graph_paths_view, name="graph-paths"),
+	path("graph/neighborhood/<int:character_id>/", views.graph_neighborhood_view, name="graph-neighborhood"),
+	path("graph/components/", views.graph_components_view, name="graph-components"),
 	path("graph/character/<int:character_id>/", views.graph_character_detail_view, name="graph-character-detail"),
+	path("graph/characters/", views.graph_characters_view, name="graph-characters"),
+	path("graph/search/", views.graph_search_view, name="graph-search"),
+	path("watch-order/collection/<slug:slug>/", views.watch_order_collection_view, name="watch-order-collection"),
+	path("watch-order/layout/", views.watch_order_layout_view, name="watch-order-layout"),
 	path("watch-order/watched/", views.watch_order_watched_view, name="watch-order-watched"),
 	path("watch-order/watched/sync/", views.watch_order_sync_view, name="watch-order-sync"),
 ]
\ No newline at end of file
@@ -5,46 +5,32 @@ import json
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET, require_POST
-from django.core.cache import cache
 
 from networkx.exception import NetworkXNoPath, NodeNotFound
 
-from .graph_service import MCUGraphService
+from .graph_payloads import (
+	as_of_payload_source,
+	cached_payload,
+	filter_payload_source,
+	full_graph_payload,
+	graph_service,
+	payload_response,
+)
 from .models import Character, Movie, Relationship, Team, WatchEntry, WatchProgress
 from .watch_order_service import WatchOrderService
 
 
-graph_service = MCUGraphService()
 watch_order_service = WatchOrderService()
 
-
-def _group_character_options(characters):
-	grouped_options = []
-	current_group_label = None
-	current_group = []
-
-	for character in characters:
-		movie = character.movie_introduced
-		group_label = movie.title if movie else "No first appearance"
-		if group_label != current_group_label:
-			if current_group_label is not None:
-				grouped_options.append({"label": current_group_label, "characters": current_group})
-			current_group_label = group_label
-			current_group = []
-
-		current_group.append(
-			{
-				"id": character.id,
-				"name": character.name,
-				"display_name": f"{character.name} ({character.earth_number.number})" if character.earth_number else character.name,
-				"aliases": [alter_ego.name for alter_ego in character.alter_egos.all()],
-			}
-		)
-
-	if current_group_label is not None:
-		grouped_options.append({"label": current_group_label, "characters": current_group})
-
-	return grouped_options
+DEFAULT_PATH_ALTERNATIVES = 3
+MAX_PATH_ALTERNATIVES = 10
+DEFAULT_NEIGHBORHOOD_RADIUS = 1
+MAX_NEIGHBORHOOD_RADIUS = 3
+DEFAULT_NEIGHBORHOOD_LIMIT = 150
+MAX_NEIGHBORHOOD_LIMIT = 500
+MAX_CHARACTER_BATCH = 200
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
 
 
 def _bad_request(message):
@@ -55,89 +41,121 @@ def _serialize_graph_response(graph, characters=None):
 	return JsonResponse(graph_service.to_cytoscape_format(graph, characters), safe=False)
 
 
-def _serialize_light_graph_response(graph, characters=None):
-	return JsonResponse(graph_service.to_cytoscape_format(graph, characters, include_details=False), safe=False)
+def _cached_payload_response(request, suffix, build_payload):
+	return payload_response(request, cached_payload(suffix, build_payload))
 
 
 @require_GET
 def graph_page_view(request):
-	characters = Character.objects.select_related("movie_introduced", "earth_number").prefetch_related("alter_egos").order_by(
-		"movie_introduced__release_date",
-		"phase_introduced",
-		"name",
-	)
-
+	# Character pickers query graph_search_view as the user types rather than
+	# inlining the roster.
 	context = {
 		"alignment_choices": Character.ALIGNMENT_CHOICES,
 		"status_choices": Character.STATUS_CHOICES,
 		"relationship_choices": Relationship.RELATIONSHIP_CHOICES,
 		"movie_choices": Movie.objects.order_by("release_date", "title"),
 		"team_choices": Team.objects.order_by("name"),
-		"grouped_character_options": _group_character_options(characters),
-		"character_options": [
-			{
-				"id": character.id,
-				"name": character.name,
-				"display_name": f"{character.name} ({character.earth_number.number})" if character.earth_number else character.name,
-			}
-			for character in characters
-		],
 	}
 	return render(request, "connections/graph.html", context)
 
 
+def _as_of_date(request):
+	"""(release date, error response) for an optional `?as_of=<movie_id>`."""
+	raw_movie_id = request.GET.get("as_of", "").strip()
+	if not raw_movie_id:
+		return None, None
+	try:
+		movie_id = int(raw_movie_id)
+	except ValueError:
+		return None, _bad_request("'as_of' must be a numeric movie ID.")
+	release_date = graph_service.movie_release_date(movie_id)
+	if release_date is None:
+		return None, JsonResponse({"error": "Movie was not found."}, status=404)
+	return release_date, None
+
+
 @require_GET
 def graph_view(request):
-	graph = graph_service.build_graph()
-	return _serialize_light_graph_response(graph)
+	"""The whole graph, or with `?as_of=<movie_id>` only what was known by that movie's release."""
+	as_of, error = _as_of_date(request)
+	if error is not None:
+		return error
+	if as_of is not None:
+		suffix, build_payload = as_of_payload_source(as_of)
+		return _cached_payload_response(request, suffix, build_payload)
+	return _cached_payload_response(
+		request,
+		"full-payload",
+		full_graph_payload,
+	)
+
+
+@require_GET
+def graph_changes_view(request):
+	"""What changed in the full graph payload since `?since=<version>`."""
+	raw_since = request.GET.get("since", "").strip()
+	try:
+		since = int(raw_since)
+	except ValueError:
+		return _bad_request("'since' must be a numeric graph version.")
+	return JsonResponse(graph_service.changes_since(since))
 
 
 @require_GET
 def graph_filter_view(request):
-	alignment = request.GET.getlist("alignment")
-	phase = request.GET.get("phase")
-	status = request.GET.getlist("status")
-	earth = request.GET.getlist("earth")
-	team = request.GET.getlist("team")
-	movie = request.GET.getlist("movie")
-	relationship_types = request.GET.getlist("relationship_types")
-
-	version = graph_service._get_cache_version()
-	payload_cache_key = (
-		f"connections:filter_payload:v{version}"
-		f":a={','.join(sorted(alignment)) or '-'}"
-		f":p={phase or '-'}"
-		f":s={','.join(sorted(status)) or '-'}"
-		f":e={','.join(sorted(earth)) or '-'}"
-		f":t={','.join(sorted(team)) or '-'}"
-		f":m={','.join(sorted(movie)) or '-'}"
-		f":r={','.join(sorted(relationship_types)) or '-'}"
-	)
-	cached_payload = cache.get(payload_cache_key)
-	if cached_payload is not None:
-		return JsonResponse(cached_payload)
-
-	graph, characters = graph_service.filtered_subgraph(
-		alignment=alignment,
-		phase=phase,
-		status=status,
-		earth=earth,
-		team=team,
-		movie=movie,
-		relationship_types=relationship_types,
-	)
-	payload = graph_service.to_cytoscape_format(graph, characters, include_details=False)
-	payload["filters"] = {
-		"alignment": alignment,
-		"phase": phase,
-		"status": status,
-		"earth": earth,
-		"team": team,
-		"movie": movie,
-		"relationship_types": relationship_types,
+	filters = {
+		"alignment": request.GET.getlist("alignment"),
+		"phase": request.GET.get("phase"),
+		"status": request.GET.getlist("status"),
+		"earth": request.GET.getlist("earth"),
+		"team": request.GET.getlist("team"),
+		"movie": request.GET.getlist("movie"),
+		"relationship_types": request.GET.getlist("relationship_types"),
 	}
-	cache.set(payload_cache_key, payload, graph_service.CACHE_TIMEOUT)
-	return JsonResponse(payload)
+	suffix, build_payload = filter_payload_source(filters)
+	graph_service.record_hit("filter", suffix, filters)
+	return _cached_payload_response(request, suffix, build_payload)
+
+
+@require_GET
+def graph_neighborhood_view(request, character_id):
+	"""Light Cytoscape payload for the characters within `radius` hops of one character."""
+	try:
+		radius = int(request.GET.get("radius", DEFAULT_NEIGHBORHOOD_RADIUS))
+		limit = int(request.GET.get("limit", DEFAULT_NEIGHBORHOOD_LIMIT))
+	except ValueError:
+		return _bad_request("'radius' and 'limit' must be numbers.")
+	if not 1 <= radius <= MAX_NEIGHBORHOOD_RADIUS:
+		return _bad_request(f"'radius' must be between 1 and {MAX_NEIGHBORHOOD_RADIUS}.")
+	if not 1 <= limit <= MAX_NEIGHBORHOOD_LIMIT:
+		return _bad_request(f"'limit' must be between 1 and {MAX_NEIGHBORHOOD_LIMIT}.")
+
+	def build_payload():
+		graph, truncated = graph_service.neighborhood(character_id, radius, limit=limit)
+		payload = graph_service.to_cytoscape_format(graph, include_details=False)
+		payload["center"] = str(character_id)
+		payload["radius"] = radius
+		payload["truncated"] = truncated
+		return payload
+
+	try:
+		return _cached_payload_response(
+			request,
+			f"neighborhood:{character_id}:r{radius}:l{limit}",
+			build_payload,
+		)
+	except NodeNotFound:
+		return JsonResponse({"error": "Character was not found."}, status=404)
+
+
+@require_GET
+def graph_components_view(request):
+	"""Connected components of the graph, and the characters with no relationships."""
+	return _cached_payload_response(
+		request,
+		"components-payload",
+		graph_service.component_summary,
+	)
 
 
 @require_GET
@@ -154,6 +172,42 @@ def graph_character_detail_view(request, character_id):
 	return JsonResponse(details)
 
 
+@require_GET
+def graph_characters_view(request):
+	"""Detail payloads for several characters in one round trip, keyed by id."""
+	raw_ids = [part for part in request.GET.get("ids", "").split(",") if part.strip()]
+	if not raw_ids:
+		return _bad_request("'ids' is required.")
+	try:
+		character_ids = list(dict.fromkeys(int(part) for part in raw_ids))
+	except ValueError:
+		return _bad_request("'ids' must be comma-separated numeric character IDs.")
+	if len(character_ids) > MAX_CHARACTER_BATCH:
+		return _bad_request(f"At most {MAX_CHARACTER_BATCH} characters can be requested at once.")
+
+	details = graph_service.character_detail_payloads(character_ids)
+	return JsonResponse(
+		{
+			"characters": {str(character_id): details[character_id] for character_id in character_ids if character_id in details},
+			"missing": [character_id for character_id in character_ids if character_id not in details],
+		}
+	)
+
+
+@require_GET
+def graph_search_view(request):
+	"""Ranked typeahead matches for `q` over character names and aliases."""
+	query = request.GET.get("q", "").strip()
+	try:
+		limit = int(request.GET.get("limit", DEFAULT_SEARCH_LIMIT))
+	except ValueError:
+		return _bad_request("'limit' must be a number.")
+	if not 1 <= limit <= MAX_SEARCH_LIMIT:
+		return _bad_request(f"'limit' must be between 1 and {MAX_SEARCH_LIMIT}.")
+
+	return JsonResponse({"query": query, "results": graph_service.search_index().search(query, limit)})
+
+
 # --------------------------------------------------------------------------
 # Watch order chart
 # --------------------------------------------------------------------------
@@ -169,21 +223,57 @@ def _watched_slugs(user):
 
 @require_GET
 def watch_order_page_view(request):
-	"""The watch-order chart.
+	"""The watch-order chart, or one collection of it with `?collection=<slug>`.
 
 	Both payloads are inlined with json_script rather than fetched, so the chart
-	paints in one pass with the right progress already applied.
+	paints in one pass with the right progress already applied. The tiles are
+	rendered from the full payload; the script only needs the base one. A
+	collection's page renders that collection's tiles and nothing else; an
+	unknown or empty collection falls back to the whole chart.
 	"""
+	payload = watch_order_service.build_payload()
+	entry_count = len(payload["entries"])
+	collection = request.GET.get("collection", "").strip()
+	collection_payload = watch_order_service.collection_payload(collection) if collection else None
+	if not (collection_payload and collection_payload["entries"]):
+		# An empty collection would render no controls to leave it by.
+		collection = ""
+	else:
+		payload = collection_payload
 	return render(
 		request,
 		"connections/watch_order.html",
 		{
-			"watch_order_payload": watch_order_service.build_payload(),
+			"watch_order_payload": payload,
+			"watch_order_data": watch_order_service.base_payload(collection),
+			"watch_order_entry_count": entry_count,
+			"watch_order_collection": collection,
 			"watched_slugs": _watched_slugs(request.user),
 		},
 	)
 
 
+@require_GET
+def watch_order_layout_view(request):
+	"""Rows and columns for one view: `?collection=<slug>` and `?hide=<track slug>`, repeatable."""
+	layout = watch_order_service.layout(
+		collection=request.GET.get("collection", "").strip(),
+		hidden_tracks=request.GET.getlist("hide"),
+	)
+	if layout is None:
+		return JsonResponse({"error": "Collection was not found."}, status=404)
+	return JsonResponse(layout)
+
+
+@require_GET
+def watch_order_collection_view(request, slug):
+	"""One collection's entry slugs, merges and layout, for showing it without the full payload."""
+	collection_slice = watch_order_service.collection_slice(slug)
+	if collection_slice is None:
+		return JsonResponse({"error": "Collection was not found."}, status=404)
+	return JsonResponse(collection_slice)
+
+
 def _require_login(request):
 	"""401 JSON instead of a login redirect, which fetch() cannot follow usefully."""
 	if not request.user.is_authenticated:
@@ -260,39 +350,92 @@ def watch_order_sync_view(request):
 	return JsonResponse({"watched": _watched_slugs(request.user)})
 
 
+def _path_response_data(path_data):
+	return {
+		"character_ids": path_data["character_ids"],
+		"highlighted_nodes": [str(character_id) for character_id in path_data["character_ids"]],
+		"highlighted_edges": [
+			{
+				"source": str(edge["source"]),
+				"target": str(edge["target"]),
+				"relationship_type": edge["relationship_type"],
+				"relationship_types": edge["relationship_types"],
+				"relationship_ids": edge["relationship_ids"],
+				"weight": edge["weight"],
+				"directional": edge["directional"],
+			}
+			for edge in path_data["edges"]
+		],
+		"total_cost": path_data["total_cost"],
+	}
+
+
+def _not_found_message(as_of):
+	if as_of is None:
+		return "One or both characters were not found."
+	return "One or both characters had not appeared by then."
+
+
+def _record_path_hit(path_data):
+	"""Count a path query under its canonical pair, the one the service caches trees for."""
+	endpoints = sorted((path_data["character_ids"][0], path_data["character_ids"][-1]))
+	graph_service.record_hit("path", f"{endpoints[0]}:{endpoints[1]}", endpoints)
+
+
 @require_GET
 def graph_path_view(request):
+	"""Best path between two characters, optionally `?as_of=<movie_id>` like graph_view."""
 	from_id = request.GET.get("from")
 	to_id = request.GET.get("to")
 
 	if not from_id or not to_id:
 		return _bad_request("Both 'from' and 'to' are required.")
+	as_of, error = _as_of_date(request)
+	if error is not None:
+		return error
 
 	try:
-		path_data = graph_service.shortest_path(from_id, to_id)
+		path_data = graph_service.shortest_path(from_id, to_id, as_of=as_of)
 	except ValueError:
 		return _bad_request("'from' and 'to' must be numeric character IDs.")
 	except NodeNotFound:
-		return JsonResponse({"error": "One or both characters were not found."}, status=404)
+		return JsonResponse({"error": _not_found_message(as_of)}, status=404)
 	except NetworkXNoPath:
 		return JsonResponse({"error": "No path exists between those characters."}, status=404)
 
-	return JsonResponse(
-		{
-			"character_ids": path_data["character_ids"],
-			"highlighted_nodes": [str(character_id) for character_id in path_data["character_ids"]],
-			"highlighted_edges": [
-				{
-					"source": str(edge["source"]),
-					"target": str(edge["target"]),
-					"relationship_type": edge["relationship_type"],
-					"relationship_types": edge["relationship_types"],
-					"relationship_ids": edge["relationship_ids"],
-					"weight": edge["weight"],
-					"directional": edge["directional"],
-				}
-				for edge in path_data["edges"]
-			],
-			"total_cost": path_data["total_cost"],
-		}
-	)
+	if as_of is None:
+		_record_path_hit(path_data)
+	return JsonResponse(_path_response_data(path_data))
+
+
+@require_GET
+def graph_paths_view(request):
+	"""Up to `k` alternative connection paths, best first."""
+	from_id = request.GET.get("from")
+	to_id = request.GET.get("to")
+
+	if not from_id or not to_id:
+		return _bad_request("Both 'from' and 'to' are required.")
+
+	try:
+		k = int(request.GET.get("k", DEFAULT_PATH_ALTERNATIVES))
+	except ValueError:
+		return _bad_request("'k' must be a number.")
+	if not 1 <= k <= MAX_PATH_ALTERNATIVES:
+		return _bad_request(f"'k' must be between 1 and {MAX_PATH_ALTERNATIVES}.")
+	as_of, error = _as_of_date(request)
+	if error is not None:
+		return error
+
+	try:
+		paths = graph_service.k_shortest_paths(from_id, to_id, k, as_of=as_of)
+	except ValueError:
+		return _bad_request("'from' and 'to' must be numeric character IDs.")
+	except NodeNotFound:
+		return JsonResponse({"error": _not_found_message(as_of)}, status=404)
+	except NetworkXNoPath:
+		return JsonResponse({"error": "No path exists between those characters."}, status=404)
+
+	if as_of is None:
+		_record_path_hit(paths[0])
+	return JsonResponse({"paths": [_path_response_data(path_data) for path_data in paths]})
@@ -0,0 +1,82 @@
+"""Which watch-order tracks share a column.
+
+A column is a run of tracks joined by `continues_from`. Walking that chain
+took a query per link - each `continues_from` was loaded in turn and each
+successor looked up - and it ran on every entry save through
+`column_entries()`. `TrackColumns` holds the whole grouping, built from one
+query over the tracks.
+
+Every caller positions or validates an entry, so the map is read from the
+database rather than a cache: the cache is per process, and a track regrouped
+through another worker would put positions in the wrong column. It is built
+once per operation (models.track_columns()) and passed down to each lookup
+that operation makes. The chart payload groups its active tracks with the same
+`group_columns()` and is cached along with the rest of the payload.
+"""
+
+from dataclasses import dataclass, field
+
+from .models import WatchTrack
+
+
+def group_columns(tracks):
+	"""Group tracks into columns by following continues_from chains.
+
+	Returns a list of chains, each ordered head first. A track with no
+	continues_from starts its own column; one that continues another is
+	appended below it in the same column.
+	"""
+	by_id = {track.pk: track for track in tracks}
+
+	# continues_from points backwards, so invert it to walk a column downwards.
+	next_of = {}
+	for track in tracks:
+		if track.continues_from_id in by_id:
+			next_of[track.continues_from_id] = track
+
+	roots = sorted(
+		(track for track in tracks if track.continues_from_id not in by_id),
+		key=lambda track: (track.lane_order, track.name),
+	)
+
+	columns, placed = [], set()
+	for root in roots:
+		chain, track = [], root
+		while track is not None and track.pk not in placed:
+			chain.append(track)
+			placed.add(track.pk)
+			track = next_of.get(track.pk)
+		columns.append(chain)
+
+	# Anything left is caught in a continues_from loop. Give each its own
+	# column rather than dropping it off the chart entirely.
+	for track in tracks:
+		if track.pk not in placed:
+			placed.add(track.pk)
+			columns.append([track])
+
+	return columns
+
+
+@dataclass(frozen=True)
+class TrackColumns:
+	"""Track id -> the ids of every track in its column, head first. Use `build()`."""
+
+	columns: dict = field(default_factory=dict)
+
+	@classmethod
+	def build(cls):
+		"""The map as the database has it now, from one query over the tracks."""
+		tracks = WatchTrack.objects.only("name", "lane_order", "continues_from")
+		return cls(columns={
+			track.pk: tuple(chain_track.pk for chain_track in chain)
+			for chain in group_columns(list(tracks))
+			for track in chain
+		})
+
+	def column_of(self, track_id):
+		"""Ids of the tracks in `track_id`'s column, head first.
+
+		A track the map has not seen yet is taken to be a column of its own.
+		"""
+		return self.columns.get(track_id, (track_id,))
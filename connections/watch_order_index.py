@@ -0,0 +1,106 @@
+"""Reachability over the watch-order prerequisite links.
+
+Checking a new prerequisite for a loop used to load every entry with its
+prerequisites and topologically sort the whole chart on each admin form
+validation. `PrerequisiteIndex` keeps the transitive closure of the links in
+a table instead (`WatchPrerequisitePath`): one row for every pair of entries
+joined by a chain of links. Whether B can already reach A, which is what makes
+A -> B a loop, is then a single EXISTS query.
+
+The table is written by the prerequisites m2m signal, inside the transaction
+that changes the links, so every worker reads the same closure and a rolled
+back edit takes its paths with it. An added link only joins what leads up to
+it to what follows it; a removed link can shorten any number of paths, so
+removals and deleted entries rebuild the table from the link table.
+
+Links point the way the chart's edges do, from "watch this first" to "watch
+this after": ancestors are everything an entry requires, descendants
+everything that requires it.
+"""
+
+from .models import WatchEntry, WatchPrerequisitePath
+
+
+def closure_pairs(links):
+	"""Every (ancestor id, descendant id) pair over (prerequisite id, entry id) links.
+
+	A loop that predates the admin's check is walked once and closed over,
+	rather than followed forever.
+	"""
+	successors = {}
+	for prerequisite_id, entry_id in links:
+		successors.setdefault(prerequisite_id, set()).add(entry_id)
+
+	pairs = set()
+	for ancestor_id in successors:
+		stack, seen = list(successors[ancestor_id]), set()
+		while stack:
+			entry_id = stack.pop()
+			if entry_id in seen:
+				continue
+			seen.add(entry_id)
+			stack.extend(successors.get(entry_id, ()))
+		pairs.update((ancestor_id, descendant_id) for descendant_id in seen)
+	return pairs
+
+
+class PrerequisiteIndex:
+	"""Reads and writes of the prerequisite closure table."""
+
+	@staticmethod
+	def _paths(pairs):
+		return [
+			WatchPrerequisitePath(ancestor_id=ancestor_id, descendant_id=descendant_id)
+			for ancestor_id, descendant_id in pairs
+		]
+
+	@classmethod
+	def rebuild(cls):
+		"""Replace the whole table with the closure of the current links."""
+		links = WatchEntry.prerequisites.through.objects.values_list("to_watchentry_id", "from_watchentry_id")
+		WatchPrerequisitePath.objects.all().delete()
+		WatchPrerequisitePath.objects.bulk_create(cls._paths(closure_pairs(links)))
+
+	@classmethod
+	def add_links(cls, links):
+		"""Add the paths (prerequisite id, entry id) links open up.
+
+		Adding A -> B joins everything up to and including A to everything
+		from B down, and nothing else.
+		"""
+		for prerequisite_id, entry_id in links:
+			upstream = {prerequisite_id, *cls.ancestors(prerequisite_id)}
+			downstream = {entry_id, *cls.descendants(entry_id)}
+			WatchPrerequisitePath.objects.bulk_create(
+				cls._paths((ancestor_id, descendant_id) for ancestor_id in upstream for descendant_id in downstream),
+				ignore_conflicts=True,
+			)
+
+	@staticmethod
+	def would_close_loop(entry_id, prerequisite_ids):
+		"""Whether requiring `prerequisite_ids` before `entry_id` closes a loop.
+
+		The entry's own stored prerequisites do not matter: a path from the
+		entry back to one of its new prerequisites cannot run through them
+		without already being a loop.
+		"""
+		prerequisite_ids = set(prerequisite_ids)
+		if entry_id in prerequisite_ids:
+			return True
+		return WatchPrerequisitePath.objects.filter(
+			ancestor_id=entry_id, descendant_id__in=prerequisite_ids
+		).exists()
+
+	@staticmethod
+	def ancestors(entry_id):
+		"""Ids of every entry `entry_id` requires, directly or not."""
+		return set(
+			WatchPrerequisitePath.objects.filter(descendant_id=entry_id).values_list("ancestor_id", flat=True)
+		)
+
+	@staticmethod
+	def descendants(entry_id):
+		"""Ids of every entry that requires `entry_id`, directly or not."""
+		return set(
+			WatchPrerequisitePath.objects.filter(ancestor_id=entry_id).values_list("descendant_id", flat=True)
+		)
@@ -0,0 +1,319 @@
+"""Row and column layout for the watch-order chart.
+
+The same rules static/src/watch-order.js applies in the browser, run over a
+WatchOrderService payload so a view can be laid out once per version and
+cached rather than on every page load:
+
+- lanes come from the payload's `lane` numbers (tracks chained by `_columns`),
+  re-indexed over what is showing so a hidden track closes its column;
+- each lane is chained in `position` order over the visible entries, except
+  where a same-lane prerequisite places an entry, and except between siblings
+  that share a stated parent or child, which sit side by side;
+- stated `prerequisites` are authoritative, and a chain edge that would close a
+  loop against one is dropped;
+- rows are longest-path depths over the result, siblings are levelled onto one
+  row, and `items_per_row` wraps each lane into rows of that many entries.
+
+A view is the active collection plus the set of hidden tracks. The result is
+{"spots": {slug: {"row", "column"}}, "columns": n, "edges": [...]}, the edges
+being every arrow in the view; chain edges carry "drawn": False where an entry
+does not connect to the one before it.
+"""
+
+from collections import deque
+
+
+# Sibling levelling stops early once nothing moves; this only bounds it.
+LEVEL_PASSES = 20
+
+
+def layout_view(payload, collection="", hidden_tracks=()):
+	"""Lay out the entries of `payload` showing in one view of the chart."""
+	hidden_tracks = set(hidden_tracks)
+	entries = payload.get("entries") or []
+	entry_by_slug = {entry["slug"]: entry for entry in entries}
+
+	# `entries` arrives in lane then position order, and filtering preserves it,
+	# which is what lets the lane chains be rebuilt in a single pass.
+	visible = [
+		entry
+		for entry in entries
+		if entry["track"] not in hidden_tracks and (not collection or collection in entry["collections"])
+	]
+	visible_slugs = {entry["slug"] for entry in visible}
+	lanes = sorted({entry["lane"] for entry in visible})
+
+	merges = [
+		edge
+		for edge in payload.get("edges") or []
+		if edge["source"] in visible_slugs and edge["target"] in visible_slugs
+	]
+	groups, group_of = _sibling_groups(visible, merges, entry_by_slug)
+	chain_edges = _chain_lanes(visible, merges, groups, group_of, entry_by_slug)
+
+	# Stated prerequisites win wherever the list order disagrees with them.
+	edges = _keep_acyclic(chain_edges, merges, visible) + merges
+
+	rows = _assign_rows(visible, edges)
+	_level_siblings(rows, groups, edges)
+	spots, columns = _place_in_columns(visible, rows, lanes, payload.get("items_per_row") or 0)
+	return {"spots": spots, "columns": columns, "edges": edges}
+
+
+def _sibling_groups(visible, merges, entry_by_slug):
+	"""Runs of neighbouring entries in one lane that share a stated parent or child.
+
+	Returns ({key: member slugs}, {slug: key of its first group}). Members must
+	be contiguous in their lane: entries sharing a relative from opposite ends
+	of the list are sequential, not parallel.
+	"""
+	slot_in_lane, counter = {}, {}
+	for entry in visible:
+		slot_in_lane[entry["slug"]] = counter.get(entry["lane"], 0)
+		counter[entry["lane"]] = slot_in_lane[entry["slug"]] + 1
+
+	groups, group_of = {}, {}
+
+	def collect(kind, pairs):
+		# `kind` namespaces the key: an entry can be both the child of a fan-in
+		# and the parent of a fan-out.
+		by_key = {}
+		for relative, slug in pairs:
+			by_key.setdefault(f"{kind}:{relative}@{entry_by_slug[slug]['lane']}", []).append(slug)
+		for key, members in by_key.items():
+			if len(members) < 2:
+				continue
+			slots = [slot_in_lane[slug] for slug in members]
+			if max(slots) - min(slots) != len(members) - 1:
+				continue
+			groups[key] = members
+			for slug in members:
+				group_of.setdefault(slug, key)
+
+	collect("in", [(edge["target"], edge["source"]) for edge in merges])
+	collect("out", [(edge["source"], edge["target"]) for edge in merges])
+	return groups, group_of
+
+
+def _chain_lanes(visible, merges, groups, group_of, entry_by_slug):
+	"""The `track` edges chaining each lane in list order over the visible entries."""
+	visible_slugs = {entry["slug"] for entry in visible}
+	stated = {}
+	for edge in merges:
+		stated.setdefault(edge["target"], set()).add(edge["source"])
+
+	def states(slug):
+		return stated.get(slug, ())
+
+	def states_in_lane(slug):
+		# A prerequisite in another lane fixes nothing about where an entry sits
+		# in its own; only a same-lane one replaces the list order.
+		lane = entry_by_slug[slug]["lane"]
+		return any(entry_by_slug[source]["lane"] == lane for source in states(slug))
+
+	def chain_edge(source, target):
+		return {
+			"source": source["slug"],
+			"target": target["slug"],
+			"kind": "track",
+			# "Connects to previous" unchecked: the entry still takes the next
+			# slot, so the edge stays in the row maths, but nothing is drawn.
+			"drawn": target.get("connects_to_previous") is not False,
+		}
+
+	chain_edges = []
+	previous_in_lane, pending_in_lane = {}, {}
+	# Keyed rather than "currently open": a group's members need not sit
+	# together, and an entry in between must not get the rest wired twice.
+	wired_groups = set()
+
+	for entry in visible:
+		lane = entry["lane"]
+		pending = pending_in_lane.get(lane, [])
+		group = group_of.get(entry["slug"])
+
+		# Later siblings were wired alongside the first; they only join the frontier.
+		if group is not None and group in wired_groups:
+			pending.append(entry)
+			pending_in_lane[lane] = pending
+			continue
+
+		# The first ordinary entry after a fan comes after every member of it.
+		previous = previous_in_lane.get(lane)
+		sources = pending or ([previous] if previous is not None else [])
+
+		if group is not None:
+			members = [entry_by_slug[slug] for slug in groups[group] if slug in visible_slugs]
+		else:
+			members = [entry]
+
+		for member in members:
+			if states_in_lane(member["slug"]):
+				continue
+			for source in sources:
+				if source["slug"] not in states(member["slug"]):
+					chain_edges.append(chain_edge(source, member))
+
+		previous_in_lane[lane] = entry
+		if group is not None:
+			wired_groups.add(group)
+		pending_in_lane[lane] = [entry] if group is not None else []
+
+	# Safety net: an entry the rules above left with no incoming edge would
+	# float to the top of its column, so it follows the one before it.
+	reached = {edge["target"] for edge in merges} | {edge["target"] for edge in chain_edges}
+	last_seen = {}
+	for entry in visible:
+		previous = last_seen.get(entry["lane"])
+		if previous is not None and entry["slug"] not in reached:
+			chain_edges.append(chain_edge(previous, entry))
+			reached.add(entry["slug"])
+		last_seen[entry["lane"]] = entry
+
+	return chain_edges
+
+
+def _reaches(adjacency, start, goal):
+	stack, seen = [start], {start}
+	while stack:
+		at = stack.pop()
+		if at == goal:
+			return True
+		for following in adjacency.get(at, ()):
+			if following not in seen:
+				seen.add(following)
+				stack.append(following)
+	return False
+
+
+def _keep_acyclic(candidates, authoritative, nodes):
+	"""The candidate edges whose target cannot already reach their source.
+
+	`authoritative` edges are all kept, so the result is always a DAG.
+	"""
+	adjacency = {entry["slug"]: [] for entry in nodes}
+	for edge in authoritative:
+		if edge["source"] in adjacency:
+			adjacency[edge["source"]].append(edge["target"])
+
+	kept = []
+	for edge in candidates:
+		if edge["source"] not in adjacency or edge["target"] not in adjacency:
+			continue
+		if _reaches(adjacency, edge["target"], edge["source"]):
+			continue
+		adjacency[edge["source"]].append(edge["target"])
+		kept.append(edge)
+	return kept
+
+
+def _assign_rows(visible, edges):
+	"""Longest-path rows over the DAG (Kahn's algorithm), as {slug: row}."""
+	rows = {entry["slug"]: 0 for entry in visible}
+	successors = {entry["slug"]: [] for entry in visible}
+	indegree = {entry["slug"]: 0 for entry in visible}
+	for edge in edges:
+		successors[edge["source"]].append(edge["target"])
+		indegree[edge["target"]] += 1
+
+	queue = deque(slug for slug, degree in indegree.items() if degree == 0)
+	settled = 0
+	while queue:
+		slug = queue.popleft()
+		settled += 1
+		for following in successors[slug]:
+			rows[following] = max(rows[following], rows[slug] + 1)
+			indegree[following] -= 1
+			if indegree[following] == 0:
+				queue.append(following)
+
+	if settled != len(visible):
+		# The admin rejects prerequisites that close a loop, so this should be
+		# unreachable. Fall back to lane order rather than laying out nothing.
+		fallback_row = 0
+		for entry in visible:
+			if indegree[entry["slug"]] > 0:
+				fallback_row += 1
+				rows[entry["slug"]] = fallback_row
+	return rows
+
+
+def _level_siblings(rows, groups, edges):
+	"""Drop each group of parallel siblings onto one row, then push successors below.
+
+	Only groups where no member leads to another are levelled; forcing a
+	sequential pair abreast shoves them further apart on every pass.
+	"""
+	if not groups:
+		return
+
+	adjacency = {}
+	for edge in edges:
+		adjacency.setdefault(edge["source"], []).append(edge["target"])
+
+	parallel = []
+	for members in groups.values():
+		present = [slug for slug in members if slug in rows]
+		if len(present) < 2:
+			continue
+		if any(one != other and _reaches(adjacency, one, other) for one in present for other in present):
+			continue
+		parallel.append(present)
+
+	for _ in range(LEVEL_PASSES):
+		changed = False
+		for present in parallel:
+			deepest = max(rows[slug] for slug in present)
+			for slug in present:
+				if rows[slug] < deepest:
+					rows[slug] = deepest
+					changed = True
+
+		for edge in edges:
+			needed = rows[edge["source"]] + 1
+			if rows[edge["target"]] < needed:
+				rows[edge["target"]] = needed
+				changed = True
+
+		if not changed:
+			return
+
+
+def _place_in_columns(visible, rows, lanes, items_per_row):
+	"""Grid spots for the DAG rows. Returns ({slug: {"row", "column"}}, column count).
+
+	With wrapping off a lane is as wide as its busiest row, entries sharing a
+	row sit side by side and centred, and rows line up across lanes. With
+	wrapping on each lane reads like a page of text, `items_per_row` across.
+	"""
+	spots = {}
+	by_lane = {lane: [] for lane in lanes}
+	for entry in visible:
+		by_lane[entry["lane"]].append(entry)
+
+	if items_per_row <= 1:
+		offset = 0
+		for lane in lanes:
+			by_row = {}
+			for entry in by_lane[lane]:
+				by_row.setdefault(rows[entry["slug"]], []).append(entry)
+
+			width = max([1, *(len(group) for group in by_row.values())])
+			for row, group in by_row.items():
+				start = offset + (width - len(group)) // 2
+				for index, entry in enumerate(group):
+					spots[entry["slug"]] = {"row": row, "column": start + index}
+			offset += width
+		return spots, max(offset, 1)
+
+	column_offset = 0
+	for lane in lanes:
+		in_lane = sorted(by_lane[lane], key=lambda entry: rows[entry["slug"]])
+		for index, entry in enumerate(in_lane):
+			spots[entry["slug"]] = {
+				"row": index // items_per_row,
+				"column": column_offset + index % items_per_row,
+			}
+		# A lane narrower than the limit only claims the columns it fills.
+		column_offset += max(1, min(len(in_lane), items_per_row))
+	return spots, column_offset
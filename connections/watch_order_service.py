@@ -5,16 +5,30 @@ explicit `prerequisites` links carry the interesting part: merges across tracks,
 like the X-Men lane feeding into Doomsday or the older Spider-Man lanes feeding
 into No Way Home.
 
-Row assignment lives in the browser (static/src/watch-order.js) so that toggling
-a track re-lays-out without a round trip. This module only serializes the raw
-nodes and edges. The two share one contract: edges point from "watch this first"
-to "watch this after".
+Rows and columns are assigned by connections.watch_order_layout, which applies
+the same rules as the browser (static/src/watch-order.js). The default view is
+laid out once per version and sent with the payload, other views are laid out
+on request and cached, and the browser still lays out a view itself when it has
+no server layout for it, so toggling a track never waits on a round trip. All
+of them share one contract: edges point from "watch this first" to "watch this
+after".
+
+The page's script gets a base payload without the tile-only fields, and each
+collection has a cached slice - its entries, merges and layout - so showing one
+collection never means filtering the whole chart. A page opened on a collection
+is rendered from that collection's payload alone, tiles included.
 """
 
 from django.core.cache import cache
 from django.templatetags.static import static
 
+from .cache_versions import bump_version, get_version
+from .invalidation import defer
 from .models import WatchCollection, WatchEntry, WatchOrderConfig, WatchTrack
+from .single_flight import STALE_TIMEOUT, single_flight
+from .watch_order_columns import group_columns
+from .watch_order_index import PrerequisiteIndex
+from .watch_order_layout import layout_view
 
 
 class WatchOrderService:
@@ -23,6 +37,8 @@ class WatchOrderService:
 	CACHE_PREFIX = "connections:watchorder"
 	CACHE_TIMEOUT = 900
 	VERSION_KEY = f"{CACHE_PREFIX}:version"
+	# Entry fields base_payload() leaves to the server-rendered tiles.
+	TILE_FIELDS = ("note", "poster_url")
 
 	def _cache_key(self, suffix, version=None):
 		if version is None:
@@ -30,25 +46,19 @@ class WatchOrderService:
 		return f"{self.CACHE_PREFIX}:{suffix}:v{version}"
 
 	def _get_cache_version(self):
-		version = cache.get(self.VERSION_KEY)
-		if version is None:
-			version = 1
-			cache.set(self.VERSION_KEY, version)
-		return int(version)
+		return get_version(self.VERSION_KEY)
 
 	@classmethod
 	def invalidate_cache(cls):
-		version = cache.get(cls.VERSION_KEY)
-		if version is None:
-			cache.set(cls.VERSION_KEY, 2)
-			return 2
+		"""Bump the watch-order version; returns it, or None when held by deferred_invalidation()."""
+		if defer(cls.VERSION_KEY, lambda _items: cls.invalidate_cache()):
+			return None
+		new_version = bump_version(cls.VERSION_KEY)
 
-		try:
-			new_version = cache.incr(cls.VERSION_KEY)
-		except (ValueError, NotImplementedError):
-			new_version = int(version) + 1
-			cache.set(cls.VERSION_KEY, new_version)
+		# Imported here: the warmer imports this module.
+		from .cache_warming import schedule_prewarm
 
+		schedule_prewarm()
 		return new_version
 
 	def _poster_url(self, poster_path):
@@ -63,7 +73,7 @@ class WatchOrderService:
 			return poster_path
 		return static(poster_path)
 
-	def _entry_payload(self, entry, lanes):
+	def _entry_payload(self, entry, lanes, collection_slugs):
 		return {
 			"slug": entry.slug,
 			"title": entry.title,
@@ -80,62 +90,190 @@ class WatchOrderService:
 			"note": entry.note,
 			"movie_id": entry.movie_id,
 			"connects_to_previous": entry.connects_to_previous,
-			"collections": [collection.slug for collection in entry.collections.all()],
+			"collections": collection_slugs,
 		}
 
 	def _columns(self, tracks):
-		"""Group tracks into columns by following continues_from chains.
-
-		Returns a list of chains, each ordered head first. A track with no
-		continues_from starts its own column; one that continues another is
-		appended below it in the same column.
-		"""
-		by_id = {track.pk: track for track in tracks}
-
-		# continues_from points backwards, so invert it to walk a column downwards.
-		next_of = {}
-		for track in tracks:
-			if track.continues_from_id in by_id:
-				next_of[track.continues_from_id] = track
+		"""Group tracks into columns; see watch_order_columns.group_columns()."""
+		return group_columns(tracks)
 
-		roots = sorted(
-			(track for track in tracks if track.continues_from_id not in by_id),
-			key=lambda track: (track.lane_order, track.name),
-		)
-
-		columns, placed = [], set()
-		for root in roots:
-			chain, track = [], root
-			while track is not None and track.pk not in placed:
-				chain.append(track)
-				placed.add(track.pk)
-				track = next_of.get(track.pk)
-			columns.append(chain)
-
-		# Anything left is caught in a continues_from loop. Give each its own
-		# column rather than dropping it off the chart entirely.
-		for track in tracks:
-			if track.pk not in placed:
-				placed.add(track.pk)
-				columns.append([track])
+	def _collection_members(self, entries, collections):
+		"""({collection id: set of entry ids}, {entry id: collection slugs}).
 
-		return columns
+		One pass over the membership table rather than a prefetch per entry.
+		Only the entries on the chart are indexed, so hidden and unpublished ones
+		never count towards a collection. Each entry's slugs follow the order of
+		`collections`.
+		"""
+		rank = {collection.pk: position for position, collection in enumerate(collections)}
+		slug_of = {collection.pk: collection.slug for collection in collections}
+		members, slugs = {}, {entry.pk: [] for entry in entries}
+		links = WatchEntry.collections.through.objects.values_list("watchentry_id", "watchcollection_id")
+		for entry_id, collection_id in sorted(links, key=lambda link: rank[link[1]]):
+			if entry_id in slugs:
+				members.setdefault(collection_id, set()).add(entry_id)
+				slugs[entry_id].append(slug_of[collection_id])
+		return members, slugs
+
+	def _prerequisite_edges(self, entries):
+		"""Merge edges between chart entries, each entry's in chart order.
+
+		Prerequisites pointing at an entry that is not on the chart are skipped
+		so the client never has to render a dangling arrow.
+		"""
+		by_id = {entry.pk: entry for entry in entries}
+		prerequisites = {}
+		for entry_id, prerequisite_id in WatchEntry.prerequisites.through.objects.values_list(
+			"from_watchentry_id", "to_watchentry_id"
+		):
+			if entry_id in by_id and prerequisite_id in by_id:
+				prerequisites.setdefault(entry_id, []).append(by_id[prerequisite_id])
+
+		def ordering(prerequisite):
+			return (prerequisite.track.lane_order, prerequisite.position, prerequisite.pk)
+
+		return [
+			{"source": prerequisite.slug, "target": entry.slug, "kind": "prerequisite"}
+			for entry in entries
+			for prerequisite in sorted(prerequisites.get(entry.pk, ()), key=ordering)
+		]
 
 	def published_entries(self):
 		return (
 			WatchEntry.objects.filter(is_published=True, track__is_active=True)
 			.select_related("track")
-			.prefetch_related("prerequisites", "collections")
 			.order_by("track__lane_order", "position", "pk")
 		)
 
 	def build_payload(self):
-		"""Serialize tracks, entries, and edges for the client-side layout."""
-		cache_key = self._cache_key("payload")
-		cached = cache.get(cache_key)
-		if cached is not None:
-			return cached
+		"""Serialize tracks, entries, and edges, with the default view laid out.
+
+		After an edit one caller rebuilds while concurrent ones get the previous
+		version's payload; see single_flight.
+		"""
+		version = self._get_cache_version()
+		cache_key = self._cache_key("payload", version=version)
+		stale_key = f"{self.CACHE_PREFIX}:payload:latest"
+
+		def build():
+			payload = self._serialize()
+			# Layouts of other views are cached under the version their payload
+			# was built at, so they always match the entries they place.
+			payload["version"] = version
+			payload["layout"] = layout_view(payload)
+			cache.set(cache_key, payload, self.CACHE_TIMEOUT)
+			cache.set(stale_key, payload, STALE_TIMEOUT)
+			return payload
+
+		return single_flight(
+			f"{cache_key}:lock",
+			lambda: cache.get(cache_key),
+			build,
+			stale=lambda: cache.get(stale_key),
+		)
+
+	def layout(self, collection="", hidden_tracks=()):
+		"""Row and column layout of one view of the chart, cached per version.
 
+		A view is the active collection ("" for all of it) plus the tracks
+		hidden. Returns None for a collection the chart does not offer; unknown
+		track slugs are ignored, so each distinct view has one cache entry.
+		"""
+		payload = self.build_payload()
+		if collection and collection not in {item["slug"] for item in payload["collections"]}:
+			return None
+		hidden = sorted(set(hidden_tracks) & {track["slug"] for track in payload["tracks"]})
+		if not collection and not hidden:
+			return payload["layout"]
+
+		cache_key = self._cache_key(f"layout:{collection}:{','.join(hidden)}", version=payload["version"])
+		layout = cache.get(cache_key)
+		if layout is None:
+			layout = layout_view(payload, collection=collection, hidden_tracks=hidden)
+			cache.set(cache_key, layout, self.CACHE_TIMEOUT)
+		return layout
+
+	def base_payload(self, collection=""):
+		"""The payload without the fields only an entry's own tile and popup show.
+
+		Posters are rendered into the tiles and notes are read from them, so the
+		copy inlined for the script leaves both out. With `collection`, the same
+		for that collection's payload; None if the chart does not offer it.
+		Cached per version.
+		"""
+		payload = self.collection_payload(collection) if collection else self.build_payload()
+		if payload is None:
+			return None
+		suffix = f"base:{collection}" if collection else "base"
+		cache_key = self._cache_key(suffix, version=payload["version"])
+		base = cache.get(cache_key)
+		if base is None:
+			base = {
+				**payload,
+				"entries": [
+					{key: value for key, value in entry.items() if key not in self.TILE_FIELDS}
+					for entry in payload["entries"]
+				],
+			}
+			cache.set(cache_key, base, self.CACHE_TIMEOUT)
+		return base
+
+	def collection_payload(self, slug):
+		"""The payload cut down to one collection, for a page that shows only it.
+
+		Its entries, the merges between them and their layout, with the tracks
+		and collections of the whole chart so the controls still offer all of
+		them. Cached per version; None for a collection the chart does not offer.
+		"""
+		collection_slice = self.collection_slice(slug)
+		if collection_slice is None:
+			return None
+		payload = self.build_payload()
+		cache_key = self._cache_key(f"collection-payload:{slug}", version=payload["version"])
+		scoped = cache.get(cache_key)
+		if scoped is None:
+			members = set(collection_slice["entries"])
+			scoped = {
+				**payload,
+				"collection": slug,
+				"entries": [entry for entry in payload["entries"] if entry["slug"] in members],
+				"edges": collection_slice["edges"],
+				"layout": collection_slice["layout"],
+			}
+			cache.set(cache_key, scoped, self.CACHE_TIMEOUT)
+		return scoped
+
+	def collection_slice(self, slug):
+		"""One collection's view of the chart, cached per version.
+
+		Entry slugs in chart order, the merges between them and their layout -
+		enough to show the collection without filtering the whole payload.
+		Returns None for a collection the chart does not offer.
+		"""
+		payload = self.build_payload()
+		collection = next((item for item in payload["collections"] if item["slug"] == slug), None)
+		if collection is None:
+			return None
+
+		cache_key = self._cache_key(f"collection:{slug}", version=payload["version"])
+		collection_slice = cache.get(cache_key)
+		if collection_slice is None:
+			members = [entry["slug"] for entry in payload["entries"] if slug in entry["collections"]]
+			visible = set(members)
+			collection_slice = {
+				"version": payload["version"],
+				"collection": collection,
+				"entries": members,
+				"edges": [
+					edge for edge in payload["edges"]
+					if edge["source"] in visible and edge["target"] in visible
+				],
+				"layout": self.layout(collection=slug),
+			}
+			cache.set(cache_key, collection_slice, self.CACHE_TIMEOUT)
+		return collection_slice
+
+	def _serialize(self):
 		tracks = list(WatchTrack.objects.filter(is_active=True).select_related("continues_from"))
 		columns = self._columns(tracks)
 
@@ -154,22 +292,16 @@ class WatchOrderService:
 			self.published_entries(),
 			key=lambda entry: (lanes[entry.track.slug], entry.position, entry.pk),
 		)
-		visible_slugs = {entry.slug for entry in entries}
+		collections = list(WatchCollection.objects.all())
+		members, collection_slugs = self._collection_members(entries, collections)
 
 		# Only the explicit merges are sent. The chain down each lane is rebuilt in
 		# the browser from whatever is currently on screen, because a collection
 		# filter can leave gaps in a track - a stored chain would drop the entries
 		# either side of the gap onto the same row, on top of each other.
-		# Prerequisites pointing at a hidden entry are skipped so the client never
-		# has to render a dangling arrow.
-		edges = [
-			{"source": prerequisite.slug, "target": entry.slug, "kind": "prerequisite"}
-			for entry in entries
-			for prerequisite in entry.prerequisites.all()
-			if prerequisite.slug in visible_slugs
-		]
+		edges = self._prerequisite_edges(entries)
 
-		payload = {
+		return {
 			"tracks": [
 				{
 					"slug": track.slug,
@@ -184,75 +316,15 @@ class WatchOrderService:
 					"slug": collection.slug,
 					"name": collection.name,
 					"description": collection.description,
-					"count": sum(1 for entry in entries if collection in entry.collections.all()),
+					"count": len(members.get(collection.pk, ())),
 				}
-				for collection in WatchCollection.objects.filter(is_active=True)
+				for collection in collections
+				if collection.is_active
 			],
-			"entries": [self._entry_payload(entry, lanes) for entry in entries],
+			"entries": [self._entry_payload(entry, lanes, collection_slugs[entry.pk]) for entry in entries],
 			"edges": edges,
 			"items_per_row": WatchOrderConfig.current().items_per_row or 0,
 		}
-		cache.set(cache_key, payload, self.CACHE_TIMEOUT)
-		return payload
-
-
-# Stand-in id for an entry that has not been saved yet, so a brand-new row can
-# still be checked for cycles. Real ids are always positive.
-UNSAVED_PK = -1
-
-
-def build_edge_index(entries, extra_edges=(), ignore_saved_prerequisites_for=()):
-	"""Adjacency over prerequisite links only.
-
-	Position order is deliberately excluded. It is the order the list reads in,
-	not a constraint, and folding it in here would reject perfectly good
-	non-linear franchises: X-Men: First Class comes before Origins: Wolverine in
-	story terms while sitting later in the list, which is a contradiction only if
-	position is treated as a rule. The chart resolves that by letting the stated
-	prerequisite win and dropping the implied one.
-
-	`extra_edges` tests edges that are not saved yet, and
-	`ignore_saved_prerequisites_for` drops an entry's stored prerequisites so the
-	admin form can validate the set the user just submitted rather than the one
-	still in the database.
-	"""
-	successors = {entry.pk: set() for entry in entries}
-	ignored = set(ignore_saved_prerequisites_for)
-
-	for entry in entries:
-		if entry.pk in ignored or entry.pk == UNSAVED_PK:
-			continue
-		for prerequisite in entry.prerequisites.all():
-			if prerequisite.pk in successors:
-				successors[prerequisite.pk].add(entry.pk)
-
-	for source_id, target_id in extra_edges:
-		if source_id in successors and target_id in successors:
-			successors[source_id].add(target_id)
-
-	return successors
-
-
-def find_cycle_nodes(successors):
-	"""Ids left over after a topological sort, i.e. the ones caught in a cycle."""
-	indegree = {node_id: 0 for node_id in successors}
-	for targets in successors.values():
-		for target_id in targets:
-			indegree[target_id] += 1
-
-	queue = [node_id for node_id, degree in indegree.items() if degree == 0]
-	visited = 0
-	while queue:
-		node_id = queue.pop()
-		visited += 1
-		for target_id in successors[node_id]:
-			indegree[target_id] -= 1
-			if indegree[target_id] == 0:
-				queue.append(target_id)
-
-	if visited == len(successors):
-		return set()
-	return {node_id for node_id, degree in indegree.items() if degree > 0}
 
 
 def would_create_cycle(entry, prerequisite_ids):
@@ -261,30 +333,15 @@ def would_create_cycle(entry, prerequisite_ids):
 	Only a genuine loop among stated prerequisites counts - A before B before A.
 	Contradicting the list order is allowed, because the list order is just how
 	the chart reads top to bottom, not a claim about what has to come first.
+	Position order is deliberately left out for the same reason: X-Men: First
+	Class comes before Origins: Wolverine in story terms while sitting later in
+	the list, and the chart resolves that by letting the stated prerequisite win.
 
-	`entry` may be unsaved; its submitted prerequisites replace whatever is
-	stored, so removing a prerequisite is never reported as still cyclic.
+	`entry` may be unsaved, and then nothing can lead back to it yet. Its
+	submitted prerequisites replace whatever is stored, so removing one is never
+	reported as still cyclic.
 	"""
-	entry_pk = entry.pk if entry.pk is not None else UNSAVED_PK
-
-	entries = [
-		item
-		for item in WatchEntry.objects.select_related("track").prefetch_related("prerequisites")
-		if item.pk != entry_pk
-	]
-
-	# A shallow copy keeps the caller's instance untouched while we give the
-	# unsaved row a usable node key.
-	probe = WatchEntry(
-		pk=entry_pk,
-		track_id=entry.track_id,
-		position=entry.position,
-	)
-	entries.append(probe)
-
-	successors = build_edge_index(
-		entries,
-		extra_edges=[(prerequisite_id, entry_pk) for prerequisite_id in prerequisite_ids],
-		ignore_saved_prerequisites_for=[entry_pk],
-	)
-	return bool(find_cycle_nodes(successors))
+	if entry.pk is None:
+		return False
+	# One EXISTS query on the closure table, which every worker shares.
+	return PrerequisiteIndex.would_close_loop(entry.pk, prerequisite_ids)
@@ -0,0 +1,13 @@
+"""Gunicorn settings, read from the working directory when gunicorn starts.
+
+The command-line flags in docker-entrypoint.sh still set the bind address,
+worker count and logging; this file only adds the server hooks.
+"""
+
+
+def post_worker_init(worker):
+    # The connections caches are per-process locmem, so each worker has to warm
+    # its own after a deploy; it does so in a background thread.
+    from connections.cache_warming import warm_on_startup
+
+    warm_on_startup()
@@ -18,7 +18,6 @@ if (graphRoot) {
   const popupHandle  = nodePopup?.querySelector('[data-node-popup-handle]');
   const popupClose   = nodePopup?.querySelector('[data-node-popup-close]');
   const popupFocus   = nodePopup?.querySelector('[data-node-popup-focus]');
-  const characterSearchInput = document.querySelector('[data-character-search="single"]');
   const characterSearchDropdown = document.getElementById('character-search-dropdown');
   const fromInput    = document.getElementById('path-from');
   const toInput      = document.getElementById('path-to');
@@ -31,15 +30,6 @@ if (graphRoot) {
   // shrinks when a filtered payload returns a subset of earths.
   const allEarthValues = new Set();
   let filterInputs = [];
-  const characterOptions = JSON.parse(document.getElementById('character-options').textContent);
-  const nameToId = new Map();
-  characterOptions.forEach((character) => {
-    const id = String(character.id);
-    nameToId.set(character.name.toLowerCase(), id);
-    if (character.display_name) {
-      nameToId.set(character.display_name.toLowerCase(), id);
-    }
-  });
   const characterDetailCache = new Map();
   const characterDetailRequests = new Map();
   let activePayload = { nodes: [], edges: [] };
@@ -207,6 +197,45 @@ if (graphRoot) {
     popupDragState = null;
   };
 
+  // Detail lookups made in the same tick share one /characters/ request, so
+  // prefetching a node's neighbours costs a single round trip.
+  const DETAIL_BATCH_SIZE = 200;
+  let pendingDetailBatch = null;
+
+  const flushDetailBatch = () => {
+    const batch = pendingDetailBatch;
+    pendingDetailBatch = null;
+    const ids = [...batch.keys()];
+
+    for (let start = 0; start < ids.length; start += DETAIL_BATCH_SIZE) {
+      const chunk = ids.slice(start, start + DETAIL_BATCH_SIZE);
+      fetch(`/api/graph/characters/?ids=${chunk.join(',')}`, { headers: { Accept: 'application/json' } })
+        .then(async (response) => {
+          const payload = await response.json();
+
+          if (!response.ok) {
+            throw new Error(payload.error || 'Failed to load character details.');
+          }
+
+          chunk.forEach((cacheKey) => {
+            const details = payload.characters[cacheKey];
+            if (details) {
+              characterDetailCache.set(cacheKey, details);
+              batch.get(cacheKey).resolve(details);
+            } else {
+              batch.get(cacheKey).reject(new Error(`Failed to load character ${cacheKey}.`));
+            }
+          });
+        })
+        .catch((error) => {
+          chunk.forEach((cacheKey) => batch.get(cacheKey).reject(error));
+        })
+        .finally(() => {
+          chunk.forEach((cacheKey) => characterDetailRequests.delete(cacheKey));
+        });
+    }
+  };
+
   const fetchCharacterDetails = async (characterId) => {
     const cacheKey = String(characterId);
 
@@ -218,25 +247,25 @@ if (graphRoot) {
       return characterDetailRequests.get(cacheKey);
     }
 
-    const request = fetch(`/api/graph/character/${cacheKey}/`, { headers: { Accept: 'application/json' } })
-      .then(async (response) => {
-        const payload = await response.json();
-
-        if (!response.ok) {
-          throw new Error(payload.error || `Failed to load character ${cacheKey}.`);
-        }
-
-        characterDetailCache.set(cacheKey, payload);
-        return payload;
-      })
-      .finally(() => {
-        characterDetailRequests.delete(cacheKey);
-      });
+    if (!pendingDetailBatch) {
+      pendingDetailBatch = new Map();
+      queueMicrotask(flushDetailBatch);
+    }
 
+    const request = new Promise((resolve, reject) => {
+      pendingDetailBatch.set(cacheKey, { resolve, reject });
+    });
     characterDetailRequests.set(cacheKey, request);
     return request;
   };
 
+  // Warm the details of a node's neighbours, which are the likeliest next clicks.
+  const prefetchNeighborDetails = (node) => {
+    node.neighborhood('node').forEach((neighbor) => {
+      fetchCharacterDetails(neighbor.id()).catch(() => {});
+    });
+  };
+
   const setNodePopupPosition = (left, top) => {
     if (!nodePopup || nodePopup.hidden) return;
 
@@ -435,11 +464,14 @@ if (graphRoot) {
 
     if (node.data('details')) {
       showNodePopup(node, { keepPosition });
+      prefetchNeighborDetails(node);
       return;
     }
 
     showNodePopup(node, { keepPosition });
-    fetchCharacterDetails(data.id)
+    const request = fetchCharacterDetails(data.id);
+    prefetchNeighborDetails(node);
+    request
       .then((details) => {
         if (!nodePopup || nodePopup.dataset.characterId !== String(data.id || '')) return;
         node.data('details', details);
@@ -578,7 +610,7 @@ if (graphRoot) {
     });
   }
 
-  function initD3Sim(alpha = 1.0) {
+  function initD3Sim(alpha = 1.0, settle = true) {
     if (_simRafId !== null) { cancelAnimationFrame(_simRafId); _simRafId = null; }
     if (d3Sim) { d3Sim.stop(); d3Sim = null; }
 
@@ -674,12 +706,15 @@ if (graphRoot) {
     // rendering, then paint the final arrangement once. This turns a
     // multi-second animated settle into a single instant layout, and the
     // saved per-frame Cytoscape re-renders are what make large graphs viable.
-    const settleTicks = Math.min(
-      SETTLE_TICK_CAP,
-      Math.max(1, Math.ceil(Math.log(d3Sim.alphaMin() / alpha) / Math.log(1 - alphaDecay)))
-    );
-    for (let i = 0; i < settleTicks; i++) d3Sim.tick();
-    syncPositionsFromSim();
+    // Skipped when the server already sent settled positions.
+    if (settle) {
+      const settleTicks = Math.min(
+        SETTLE_TICK_CAP,
+        Math.max(1, Math.ceil(Math.log(d3Sim.alphaMin() / alpha) / Math.log(1 - alphaDecay)))
+      );
+      for (let i = 0; i < settleTicks; i++) d3Sim.tick();
+      syncPositionsFromSim();
+    }
 
     // Keep the simulation around (stopped) so interactions like node drags
     // can reheat and animate from the settled state.
@@ -837,16 +872,24 @@ if (graphRoot) {
 
     cy.json({ elements: payload });
 
-    const n = payload.nodes.length;
-    const baseRadius = Math.max(300, Math.sqrt(n) * 130);
+    // Full-graph and filter payloads arrive with positions the server already
+    // settled; the cy.json call above applied them (the `preset` layout). Views
+    // assembled here from a subset of nodes (focus, path) carry none and are
+    // settled in the browser as before.
+    const presettled = payload.nodes.length > 0 && payload.nodes.every((node) => node.position);
 
-    cy.nodes().forEach((node, i) => {
-      const r     = baseRadius * Math.sqrt((i + 0.5) / n);
-      const theta = 2 * Math.PI * i / (PHI * PHI);
-      node.position({ x: r * Math.cos(theta), y: r * Math.sin(theta) });
-    });
+    if (!presettled) {
+      const n = payload.nodes.length;
+      const baseRadius = Math.max(300, Math.sqrt(n) * 130);
 
-    initD3Sim(ALPHA_START);
+      cy.nodes().forEach((node, i) => {
+        const r     = baseRadius * Math.sqrt((i + 0.5) / n);
+        const theta = 2 * Math.PI * i / (PHI * PHI);
+        node.position({ x: r * Math.cos(theta), y: r * Math.sin(theta) });
+      });
+    }
+
+    initD3Sim(presettled ? 0 : ALPHA_START, !presettled);
     cy.fit(cy.elements(), 60);
 
     setLoadState(`${payload.nodes.length} nodes, ${payload.edges.length} edges`);
@@ -874,6 +917,53 @@ if (graphRoot) {
     return fullGraphPayload;
   };
 
+  // ─── Delta sync ────────────────────────────────────────────────────────────
+  // Path views are cut from the full graph. A tab left open keeps its copy
+  // current by asking the server what changed since the payload's version
+  // whenever it comes back into view, rather than downloading it again. When
+  // the server's change log no longer reaches back that far it says "resync",
+  // and the copy is dropped to be refetched on next use.
+  const applyElementChanges = (elements, changes) => {
+    const replaced = new Map([...changes.added, ...changes.updated].map((element) => [String(element.data.id), element]));
+    const dropped = new Set(changes.removed.map(String));
+    const kept = elements
+      .filter((element) => !dropped.has(String(element.data.id)))
+      .map((element) => {
+        const id = String(element.data.id);
+        const replacement = replaced.get(id);
+        if (!replacement) return element;
+        replaced.delete(id);
+        // Keep the settled spot; changes carry no positions.
+        return { ...replacement, position: element.position };
+      });
+    return [...kept, ...replaced.values()];
+  };
+
+  const syncFullGraph = async () => {
+    const payload = fullGraphPayload;
+    if (!payload || payload.version === undefined) return;
+    const response = await fetch(
+      `/api/graph/changes/?${new URLSearchParams({ since: payload.version })}`,
+      { headers: { Accept: 'application/json' } }
+    );
+    if (!response.ok || fullGraphPayload !== payload) return;
+    const delta = await response.json();
+    if (delta.resync) {
+      fullGraphPayload = null;
+      return;
+    }
+    delta.changes.forEach((change) => {
+      payload.nodes = applyElementChanges(payload.nodes, change.nodes);
+      payload.edges = applyElementChanges(payload.edges, change.edges);
+    });
+    payload.version = delta.version;
+  };
+
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState !== 'visible') return;
+    syncFullGraph().catch((error) => console.error(error));
+  });
+
   const cloneNode = (node) => ({
     data: { ...node.data },
     classes: node.classes || '',
@@ -923,41 +1013,24 @@ if (graphRoot) {
 
   // ─── Character focus (neighborhood) filter ─────────────────────────────────
   // Show only the given character and the characters directly connected to it,
-  // along with every relationship among that set.
+  // along with every relationship among that set. The server cuts the
+  // neighborhood out of its cached graph, so focusing never needs the full
+  // graph download.
   const applyNeighborhoodFilter = async (characterId) => {
     const centerId = String(characterId);
-    const fullGraph = await getFullGraphPayload();
-
-    const neighborIds = new Set([centerId]);
-    fullGraph.edges.forEach((edge) => {
-      const source = String(edge.data.source);
-      const target = String(edge.data.target);
-      if (source === centerId) neighborIds.add(target);
-      else if (target === centerId) neighborIds.add(source);
-    });
-
-    const nodeMap = new Map(fullGraph.nodes.map((node) => [String(node.data.id), node]));
-    // A character with no relationships isn't part of the relationship-built
-    // full graph, so fall back to the node from the current view so it can
-    // still be shown on its own.
-    if (!nodeMap.has(centerId)) {
-      const fallback = activePayload.nodes.find((node) => String(node.data.id) === centerId);
-      if (fallback) nodeMap.set(centerId, fallback);
-    }
-
-    const nodes = Array.from(neighborIds)
-      .map((id) => nodeMap.get(id))
-      .filter(Boolean)
-      .map(cloneNode);
-
-    if (!nodes.length) {
+    const response = await fetch(
+      `/api/graph/neighborhood/${encodeURIComponent(centerId)}/?${new URLSearchParams({ radius: 1, limit: 500 })}`,
+      { headers: { Accept: 'application/json' } }
+    );
+    if (!response.ok) {
       setStatus('That character could not be found in the graph.', 'warning');
       return;
     }
+    const neighborhood = await response.json();
 
-    const edges = fullGraph.edges
-      .filter((edge) => neighborIds.has(String(edge.data.source)) && neighborIds.has(String(edge.data.target)))
-      .map(cloneEdge);
+    const nodeMap = new Map(neighborhood.nodes.map((node) => [String(node.data.id), node]));
+    const nodes = neighborhood.nodes.map(cloneNode);
+    const edges = neighborhood.edges.map(cloneEdge);
 
     const centerNode = nodeMap.get(centerId);
     const centerName = centerNode?.data.label || centerNode?.data.name || 'character';
@@ -981,29 +1054,11 @@ if (graphRoot) {
     reopenPopupForCharacter(centerId);
   };
 
-  const findCharacterByInput = (input) => {
-    if (!input) return null;
-    const trimmed = input.trim();
-    if (!trimmed) return null;
-
-    if (/^\d+$/.test(trimmed)) {
-      return characterOptions.find((character) => String(character.id) === trimmed) || null;
-    }
-
-    const normalized = trimmed.toLowerCase();
-    return characterOptions.find((character) => {
-      const nameMatch = character.name?.toLowerCase() === normalized;
-      const displayMatch = character.display_name?.toLowerCase() === normalized;
-      return nameMatch || displayMatch;
-    }) || null;
-  };
-
   // ─── Path search ───────────────────────────────────────────────────────────
+  // The pickers store the selected character's id in their hidden inputs.
   const getCharacterId = (input) => {
-    const match = findCharacterByInput(input);
-    if (match) return String(match.id);
-    if (!input) return '';
-    return nameToId.get(input.trim().toLowerCase()) || '';
+    const trimmed = (input || '').trim();
+    return /^\d+$/.test(trimmed) ? trimmed : '';
   };
 
   const zoomToCharacter = async (characterId) => {
@@ -1109,65 +1164,129 @@ document.querySelectorAll('[data-graph-filter-search]').forEach(searchInput => {
   searchInput.addEventListener('click', e => e.stopPropagation());
 });
 
-// ─── Character path searchable dropdowns ──────────────────────────────────
-['from', 'to'].forEach(side => {
-  const dropdown  = document.getElementById(`path-${side}-dropdown`);
-  const hidden    = document.getElementById(`path-${side}`);
-  const labelEl   = document.getElementById(`path-${side}-label`);
-  const searchEl  = dropdown.querySelector(`[data-character-search="${side}"]`);
-
-  searchEl.addEventListener('click', e => e.stopPropagation());
-
-  searchEl.addEventListener('input', () => {
-    const query = searchEl.value.toLowerCase();
-    dropdown.querySelectorAll(`[data-character-optgroup="${side}"]`).forEach(group => {
-      let anyVisible = false;
-      group.querySelectorAll(`[data-character-select="${side}"]`).forEach(opt => {
-        const haystack = `${opt.dataset.characterName} ${opt.dataset.characterAliases || ''}`.toLowerCase();
-        const match = haystack.includes(query);
-        opt.style.display = match ? '' : 'none';
-        if (match) anyVisible = true;
-      });
-      group.style.display = anyVisible ? '' : 'none';
+  // ─── Character pickers ─────────────────────────────────────────────────────
+  // Pickers ask /api/graph/search/ as the user types instead of shipping the
+  // roster with the page. Answers are kept per query for the session.
+  const CHARACTER_SEARCH_DELAY = 120;
+  const CHARACTER_SEARCH_HINT = 'Type a name or alias.';
+  const characterSearchResults = new Map();
+
+  const searchCharacters = (query) => {
+    const key = query.toLowerCase();
+    if (!characterSearchResults.has(key)) {
+      const request = fetch(`/api/graph/search/?${new URLSearchParams({ q: key })}`, { headers: { Accept: 'application/json' } })
+        .then(async (response) => {
+          const payload = await response.json();
+
+          if (!response.ok) {
+            throw new Error(payload.error || 'Character search failed.');
+          }
+
+          return payload.results;
+        });
+      characterSearchResults.set(key, request);
+      request.catch(() => characterSearchResults.delete(key));
+    }
+    return characterSearchResults.get(key);
+  };
+
+  const showCharacterHint = (resultsEl, text) => {
+    const hint = document.createElement('div');
+    hint.className = 'graph-character-hint';
+    hint.textContent = text;
+    resultsEl.replaceChildren(hint);
+  };
+
+  const renderCharacterResults = (resultsEl, side, results) => {
+    if (!results.length) {
+      showCharacterHint(resultsEl, 'No matching characters.');
+      return;
+    }
+
+    resultsEl.replaceChildren(...results.map((character) => {
+      const option = document.createElement('div');
+      option.className = 'graph-filter-option graph-character-option';
+      option.dataset.characterSelect = side;
+      option.dataset.characterId = String(character.id);
+      option.dataset.characterName = character.display_name;
+      option.textContent = character.display_name;
+      if (character.matched_alias) {
+        const meta = document.createElement('span');
+        meta.className = 'graph-character-option-meta';
+        meta.textContent = character.matched_alias;
+        option.append(meta);
+      }
+      return option;
+    }));
+  };
+
+  const attachCharacterPicker = (dropdown, side, onSelect) => {
+    const searchEl = dropdown.querySelector(`[data-character-search="${side}"]`);
+    const resultsEl = dropdown.querySelector(`[data-character-results="${side}"]`);
+    let timer = null;
+    let latestQuery = '';
+
+    searchEl.addEventListener('click', (event) => event.stopPropagation());
+    searchEl.addEventListener('input', () => {
+      const query = searchEl.value.trim();
+      latestQuery = query;
+      if (timer) clearTimeout(timer);
+      if (!query) {
+        showCharacterHint(resultsEl, CHARACTER_SEARCH_HINT);
+        return;
+      }
+
+      timer = setTimeout(() => {
+        timer = null;
+        searchCharacters(query)
+          .then((results) => {
+            // Drop answers to queries the user has already typed past.
+            if (query === latestQuery) renderCharacterResults(resultsEl, side, results);
+          })
+          .catch((error) => {
+            console.error(error);
+            if (query === latestQuery) showCharacterHint(resultsEl, 'Character search failed.');
+          });
+      }, CHARACTER_SEARCH_DELAY);
     });
-  });
 
-  dropdown.querySelectorAll(`[data-character-select="${side}"]`).forEach(opt => {
-    opt.addEventListener('click', () => {
-      hidden.value = opt.dataset.characterId;
-      labelEl.textContent = opt.dataset.characterName;
-      labelEl.classList.remove('placeholder');
-      searchEl.value = '';
-      // Reset visibility
-      dropdown.querySelectorAll(`[data-character-select="${side}"]`).forEach(o => o.style.display = '');
-      dropdown.querySelectorAll(`[data-character-optgroup="${side}"]`).forEach(g => g.style.display = '');
+    resultsEl.addEventListener('click', (event) => {
+      const option = event.target.closest(`[data-character-select="${side}"]`);
+      if (!option) return;
+      resetCharacterPicker(dropdown, side);
       dropdown.removeAttribute('open');
+      onSelect(option);
+    });
+  };
+
+  const resetCharacterPicker = (dropdown, side) => {
+    dropdown.querySelector(`[data-character-search="${side}"]`).value = '';
+    showCharacterHint(dropdown.querySelector(`[data-character-results="${side}"]`), CHARACTER_SEARCH_HINT);
+  };
+
+  ['from', 'to'].forEach((side) => {
+    attachCharacterPicker(document.getElementById(`path-${side}-dropdown`), side, (option) => {
+      const labelEl = document.getElementById(`path-${side}-label`);
+      document.getElementById(`path-${side}`).value = option.dataset.characterId;
+      labelEl.textContent = option.dataset.characterName;
+      labelEl.classList.remove('placeholder');
     });
   });
-});
 
   const resetPathSelectors = () => {
-  ['from', 'to'].forEach(side => {
-    document.getElementById(`path-${side}`).value = '';
-    document.getElementById(`path-${side}-label`).textContent = 'Select a character';
-    document.getElementById(`path-${side}-label`).classList.add('placeholder');
-    const dd = document.getElementById(`path-${side}-dropdown`);
-    dd.querySelector(`[data-character-search="${side}"]`).value = '';
-    dd.querySelectorAll(`[data-character-select="${side}"]`).forEach(o => o.style.display = '');
-    dd.querySelectorAll(`[data-character-optgroup="${side}"]`).forEach(g => g.style.display = '');
-    dd.open = false;
-  });
+    ['from', 'to'].forEach((side) => {
+      document.getElementById(`path-${side}`).value = '';
+      document.getElementById(`path-${side}-label`).textContent = 'Select a character';
+      document.getElementById(`path-${side}-label`).classList.add('placeholder');
+      const dropdown = document.getElementById(`path-${side}-dropdown`);
+      resetCharacterPicker(dropdown, side);
+      dropdown.open = false;
+    });
   };
 
   const resetCharacterSearch = () => {
-    if (characterSearchInput) characterSearchInput.value = '';
     if (characterSearchDropdown) {
-      characterSearchDropdown.querySelectorAll('[data-character-select="single"]').forEach((option) => {
-        option.style.display = '';
-      });
-      characterSearchDropdown.querySelectorAll('[data-character-optgroup="single"]').forEach((group) => {
-        group.style.display = '';
-      });
+      resetCharacterPicker(characterSearchDropdown, 'single');
       characterSearchDropdown.removeAttribute('open');
     }
   };
@@ -1215,37 +1334,14 @@ document.querySelectorAll('[data-graph-filter-search]').forEach(searchInput => {
     });
   });
 
-  characterSearchInput?.addEventListener('click', (event) => event.stopPropagation());
-  characterSearchInput?.addEventListener('input', () => {
-    const query = characterSearchInput.value.toLowerCase();
-    characterSearchDropdown?.querySelectorAll('[data-character-optgroup="single"]').forEach((group) => {
-      let anyVisible = false;
-      group.querySelectorAll('[data-character-select="single"]').forEach((option) => {
-        const haystack = `${option.dataset.characterName} ${option.dataset.characterAliases || ''}`.toLowerCase();
-        const match = haystack.includes(query);
-        option.style.display = match ? '' : 'none';
-        if (match) anyVisible = true;
-      });
-      group.style.display = anyVisible ? '' : 'none';
-    });
-  });
-
-  characterSearchDropdown?.querySelectorAll('[data-character-select="single"]').forEach((option) => {
-    option.addEventListener('click', () => {
-      if (characterSearchInput) characterSearchInput.value = '';
-      characterSearchDropdown.querySelectorAll('[data-character-select="single"]').forEach((entry) => {
-        entry.style.display = '';
-      });
-      characterSearchDropdown.querySelectorAll('[data-character-optgroup="single"]').forEach((group) => {
-        group.style.display = '';
-      });
-      characterSearchDropdown.removeAttribute('open');
+  if (characterSearchDropdown) {
+    attachCharacterPicker(characterSearchDropdown, 'single', (option) => {
       zoomToCharacter(option.dataset.characterId).catch((error) => {
         console.error(error);
         setStatus('Character search failed.', 'error');
       });
     });
-  });
+  }
 
   clearButton.addEventListener('click', () => {
     resetPathSelectors();
@@ -1,8 +1,9 @@
 /**
  * Marvel watch-order chart.
  *
- * The server sends nodes and edges; rows are computed here so that toggling a
- * track re-lays-out instantly instead of round-tripping. Edges always point
+ * The server sends nodes and edges, with the default view already laid out;
+ * other views are laid out here so that toggling a track re-lays-out instantly
+ * instead of round-tripping. Edges always point
  * from "watch this first" to "watch this after", and come in two kinds:
  * `track` edges chain a lane in order, `prerequisite` edges are the merges
  * between lanes.
@@ -38,7 +39,11 @@ function init(payload) {
 	const authenticated = chart.dataset.authenticated === 'true';
 	const hiddenTracks = new Set();
 	const watched = new Set(readInitialWatched());
-	let activeCollection = '';
+	// A page opened on a collection carries only that collection's entries.
+	const scopedCollection = payload.collection || '';
+	let activeCollection = scopedCollection;
+	// Collection slug -> its slice from the server, once fetched.
+	const collectionSlices = new Map();
 	let visibleEdges = [];
 	let spots = new Map();
 	let drawnPaths = new Set();
@@ -59,6 +64,50 @@ function init(payload) {
 		);
 		const visibleSlugs = new Set(visible.map((entry) => entry.slug));
 
+		// The server lays out the view the page opened on with the same rules and
+		// sends it with the payload, which saves the work on page load, and a
+		// collection's view comes laid out in its slice. Any other view, or a collection whose
+		// slice has not arrived yet, is laid out here, so a toggle never waits on
+		// a round trip.
+		const collectionSlice = collectionSlices.get(activeCollection);
+		let placement;
+		if (!hiddenTracks.size && activeCollection === scopedCollection && payload.layout) {
+			placement = serverPlacement(payload.layout);
+		} else if (!hiddenTracks.size && collectionSlice) {
+			placement = serverPlacement(collectionSlice.layout);
+		} else {
+			placement = computePlacement(visible, visibleSlugs);
+		}
+		visibleEdges = placement.edges;
+		spots = placement.spots;
+
+		tiles.forEach((tile, slug) => {
+			const isVisible = visibleSlugs.has(slug);
+			tile.hidden = !isVisible;
+			if (!isVisible) {
+				return;
+			}
+			const spot = placement.spots.get(slug);
+			tile.style.gridRow = String(spot.row + 1);
+			tile.style.gridColumn = String(spot.column + 1);
+		});
+
+		grid.style.gridTemplateColumns = `repeat(${Math.max(placement.columns, 1)}, var(--tile-width))`;
+		grid.dataset.laidOut = 'true';
+		// Wrap stubs sit just above the first row and just below the last, so the
+		// grid needs breathing room or they get clipped by the container.
+		grid.toggleAttribute('data-wrapped', (payload.items_per_row || 0) > 1);
+
+		// Positions are only final once the browser has reflowed the grid.
+		requestAnimationFrame(draw);
+	}
+
+	/**
+	 * Lay out the visible entries: chain each lane, keep the DAG acyclic, assign
+	 * rows and place them in columns. connections/watch_order_layout.py is the
+	 * server's copy of these rules; change both together.
+	 */
+	function computePlacement(visible, visibleSlugs) {
 		// Lanes are re-indexed over what is still showing, so hiding a track
 		// closes its column instead of leaving a gap.
 		const lanes = [...new Set(visible.map((entry) => entry.lane))].sort((a, b) => a - b);
@@ -231,32 +280,19 @@ function init(payload) {
 		// dropped. Without this the two form a loop, no topological order exists,
 		// and the layout falls back to arbitrary rows with arrows running backwards
 		// up the page.
-		visibleEdges = keepAcyclic(chainEdges, merges, visible).concat(merges);
+		const activeEdges = keepAcyclic(chainEdges, merges, visible).concat(merges);
 
-		const rows = assignRows(visible, visibleEdges);
-		levelSiblings(rows, groups, visibleEdges);
-		const placement = placeInColumns(visible, rows, lanes, laneColumn);
-		spots = placement.spots;
-
-		tiles.forEach((tile, slug) => {
-			const isVisible = visibleSlugs.has(slug);
-			tile.hidden = !isVisible;
-			if (!isVisible) {
-				return;
-			}
-			const spot = placement.spots.get(slug);
-			tile.style.gridRow = String(spot.row + 1);
-			tile.style.gridColumn = String(spot.column + 1);
-		});
-
-		grid.style.gridTemplateColumns = `repeat(${Math.max(placement.columns, 1)}, var(--tile-width))`;
-		grid.dataset.laidOut = 'true';
-		// Wrap stubs sit just above the first row and just below the last, so the
-		// grid needs breathing room or they get clipped by the container.
-		grid.toggleAttribute('data-wrapped', (payload.items_per_row || 0) > 1);
+		const rows = assignRows(visible, activeEdges);
+		levelSiblings(rows, groups, activeEdges);
+		return { ...placeInColumns(visible, rows, lanes, laneColumn), edges: activeEdges };
+	}
 
-		// Positions are only final once the browser has reflowed the grid.
-		requestAnimationFrame(draw);
+	function serverPlacement(serverLayout) {
+		return {
+			spots: new Map(Object.entries(serverLayout.spots)),
+			columns: serverLayout.columns,
+			edges: serverLayout.edges,
+		};
 	}
 
 	/**
@@ -1020,9 +1056,11 @@ function init(payload) {
 
 		popup.querySelector('[data-watch-popup-meta]').textContent = describe(entry);
 
+		// Notes are rendered onto the tiles rather than sent in the payload.
+		const note = tiles.get(slug)?.dataset.watchNote || '';
 		const noteElement = popup.querySelector('[data-watch-popup-note]');
-		noteElement.textContent = entry.note || '';
-		noteElement.hidden = !entry.note;
+		noteElement.textContent = note;
+		noteElement.hidden = !note;
 
 		// The graph reads ?movie=<id> on load and opens filtered to that cast.
 		const graphLink = popup.querySelector('[data-watch-popup-graph]');
@@ -1352,19 +1390,59 @@ function init(payload) {
 			(payload.collections || []).map((collection) => [collection.slug, collection.description])
 		);
 		const note = document.querySelector('[data-watch-collection-note]');
-
-		collectionSelect.addEventListener('change', () => {
-			activeCollection = collectionSelect.value;
+		const describeCollection = () => {
 			if (note) {
 				note.textContent = descriptions.get(activeCollection) || '';
 				note.hidden = !note.textContent;
 			}
+		};
+		describeCollection();
+
+		collectionSelect.addEventListener('change', () => {
+			const url = new URL(window.location.href);
+			if (collectionSelect.value) {
+				url.searchParams.set('collection', collectionSelect.value);
+			} else {
+				url.searchParams.delete('collection');
+			}
+			// A collection's page has no tiles for anything outside it, so
+			// leaving it loads the page for the new selection. The whole chart
+			// has every tile and filters in place, keeping the address in step
+			// so a reload or a shared link opens the lighter collection page.
+			if (scopedCollection) {
+				window.location.assign(url);
+				return;
+			}
+			window.history.replaceState(null, '', url);
+			activeCollection = collectionSelect.value;
+			describeCollection();
 			closePopup();
 			layout();
 			paintProgress();
+			loadCollectionSlice(activeCollection);
 		});
 	}
 
+	/**
+	 * Fetch a collection's slice so selecting it again reuses the server's
+	 * layout. The slice only ever replaces a local layout with the same one, so
+	 * a failed fetch just leaves the chart as it is.
+	 */
+	function loadCollectionSlice(slug) {
+		const current = collectionSlices.get(slug);
+		if (!slug || !chart.dataset.collectionUrl || (current && current.version === payload.version)) {
+			return;
+		}
+		fetch(chart.dataset.collectionUrl.replace('__slug__', encodeURIComponent(slug)))
+			.then((response) => (response.ok ? response.json() : null))
+			.then((collectionSlice) => {
+				if (collectionSlice && collectionSlice.version === payload.version) {
+					collectionSlices.set(slug, collectionSlice);
+				}
+			})
+			.catch(() => {});
+	}
+
 	const resetButton = document.querySelector('[data-watch-reset]');
 	if (resetButton) {
 		resetButton.addEventListener('click', () => {
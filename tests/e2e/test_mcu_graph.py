@@ -61,12 +61,15 @@ def test_ui_path_search_finds_path(page: Page, live_server, characters):
     page.goto(live_server.url + GRAPH_URL)
     expect(page.locator("#mcu-graph canvas").first).to_be_visible(timeout=20000)
 
+    # The pickers fetch matches from /api/graph/search/ as you type.
     page.locator("#path-from-dropdown summary").click()
+    page.locator('[data-character-search="from"]').fill("Start")
     page.locator(
         '.graph-character-option[data-character-select="from"][data-character-name="Start Hero"]'
     ).click()
 
     page.locator("#path-to-dropdown summary").click()
+    page.locator('[data-character-search="to"]').fill("Finish")
     page.locator(
         '.graph-character-option[data-character-select="to"][data-character-name="Finish Hero"]'
     ).click()